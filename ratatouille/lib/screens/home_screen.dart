@@ -26,6 +26,12 @@ class _HomeScreenState extends State<HomeScreen>
   List<Map<String, dynamic>> favorites = [];
 
   bool isLoadingRecipes = false;
+  bool isLoadingMoreRecipes = false;
+  String? nextRecipesUrl; // cursor pagination-ы дараагийн хуудас
+
+  // Картанд хэрэгтэй талбарууд л (_recipeFromJson); next холбоос ч үүнийг хадгална
+  static const _gridFields =
+      'name,image,images,time_required,servings,cuisine,nutrition,average_rating';
   Map<int, double> userRatings = {}; // recipeId -> rating
 
   late final AnimationController _controller;
@@ -40,7 +46,7 @@ class _HomeScreenState extends State<HomeScreen>
     )..forward();
 
     _searchScreen = const SearchScreen();
-    _loadCategories();
+    _loadHome();
     _loadWishlist();
   }
 
@@ -55,33 +61,40 @@ class _HomeScreenState extends State<HomeScreen>
     return prefs.getString('jwt_token');
   }
 
-  // ================== CATEGORIES ==================
-  Future<void> _loadCategories() async {
+  // ================== HOME ==================
+  // Категори, рейтингээр эрэмбэлсэн жорын эхний хуудсыг нэг хүсэлтээр авна.
+  Future<void> _loadHome() async {
+    setState(() => isLoadingRecipes = true);
+
     try {
+      final token = await _getToken();
       final response = await http.get(
-        Uri.parse('http://127.0.0.1:8000/api/categories/'),
+        Uri.parse('http://127.0.0.1:8000/api/home/?fields=$_gridFields'),
+        headers: token != null ? {"Authorization": "Bearer $token"} : {},
       );
 
       if (response.statusCode == 200) {
-        List data = json.decode(response.body);
+        final data = json.decode(response.body);
+        List cats = data['categories'];
         final loadedCategories =
-            data.map<String>((cat) => cat['name'] as String).toList();
+            cats.map<String>((cat) => cat['name'] as String).toList();
 
         final allIndex =
             loadedCategories.indexWhere((c) => c.toLowerCase() == 'бүгд');
 
+        List results = data['recipes']['results'];
         setState(() {
           categories = loadedCategories;
           selectedCategoryIndex = allIndex != -1 ? allIndex : 0;
+          recipes = results.map<Map<String, dynamic>>(_recipeFromJson).toList();
+          nextRecipesUrl = data['recipes']['next'];
         });
-
-        await _loadRecipes(
-            category:
-                allIndex != -1 ? loadedCategories[allIndex] : null);
       }
     } catch (e) {
-      debugPrint('Category error: $e');
+      debugPrint('Home error: $e');
     }
+
+    setState(() => isLoadingRecipes = false);
   }
 
   // ================== RECIPES ==================
@@ -91,28 +104,19 @@ class _HomeScreenState extends State<HomeScreen>
     try {
       String url = 'http://127.0.0.1:8000/api/recipes/';
       if (category != null && category.toLowerCase() != 'бүгд') {
-        url += 'by_category/?category=$category';
+        url += 'by_category/?category=$category&fields=$_gridFields';
       } else {
-        url += '?order=rating';
+        url += '?order=rank&fields=$_gridFields';
       }
 
       final response = await http.get(Uri.parse(url));
 
       if (response.statusCode == 200) {
-        List data = json.decode(response.body);
+        final data = json.decode(response.body);
+        List results = data['results'];
         setState(() {
-          recipes = data.map<Map<String, dynamic>>((r) {
-            return {
-              'id': r['id'],
-              'name': r['name'],
-              'time': r['time_required'].toString(),
-              'servings': r['servings'].toString(),
-              'cuisine': r['cuisine'],
-              'image': r['image'],
-              'nutrition': r['nutrition'],
-              'average_rating': r['average_rating'] ?? 0.0,
-            };
-          }).toList();
+          recipes = results.map<Map<String, dynamic>>(_recipeFromJson).toList();
+          nextRecipesUrl = data['next'];
         });
       }
     } catch (e) {
@@ -122,6 +126,55 @@ class _HomeScreenState extends State<HomeScreen>
     setState(() => isLoadingRecipes = false);
   }
 
+  Future<void> _loadMoreRecipes() async {
+    if (nextRecipesUrl == null || isLoadingMoreRecipes) return;
+    setState(() => isLoadingMoreRecipes = true);
+
+    try {
+      final response = await http.get(Uri.parse(nextRecipesUrl!));
+
+      if (response.statusCode == 200) {
+        final data = json.decode(response.body);
+        List results = data['results'];
+        setState(() {
+          recipes.addAll(results.map<Map<String, dynamic>>(_recipeFromJson));
+          nextRecipesUrl = data['next'];
+        });
+      }
+    } catch (e) {
+      debugPrint('Recipe error: $e');
+    }
+
+    setState(() => isLoadingMoreRecipes = false);
+  }
+
+  Map<String, dynamic> _recipeFromJson(dynamic r) {
+    return {
+      'id': r['id'],
+      'name': r['name'],
+      'time': r['time_required'].toString(),
+      'servings': r['servings'].toString(),
+      'cuisine': r['cuisine'],
+      'image': _pickImage(r),
+      'nutrition': r['nutrition'],
+      'average_rating': r['average_rating'] ?? 0.0,
+    };
+  }
+
+  // Сервер дээр үүсгэсэн жижигрүүлсэн зургуудаас (images: {width: url})
+  // хүссэн өргөнөөс багагүй хамгийн жижгийг сонгоно.
+  String _pickImage(dynamic r, {int width = 640}) {
+    final images = r['images'];
+    if (images is Map && images.isNotEmpty) {
+      final sizes = images.keys.map((k) => int.parse(k.toString())).toList()
+        ..sort();
+      final chosen =
+          sizes.firstWhere((s) => s >= width, orElse: () => sizes.last);
+      return images['$chosen'];
+    }
+    return r['image'];
+  }
+
   // ================== WISHLIST ==================
   Future<void> _loadWishlist() async {
     final token = await _getToken();
@@ -430,16 +483,25 @@ class _HomeScreenState extends State<HomeScreen>
             padding: const EdgeInsets.symmetric(horizontal: 16),
             child: isLoadingRecipes
                 ? const Center(child: CircularProgressIndicator())
-                : GridView.builder(
-                    itemCount: recipes.length,
-                    gridDelegate:
-                        const SliverGridDelegateWithFixedCrossAxisCount(
-                      crossAxisCount: 2,
-                      mainAxisSpacing: 16,
-                      crossAxisSpacing: 16,
-                      childAspectRatio: 0.65,
+                : NotificationListener<ScrollNotification>(
+                    onNotification: (notification) {
+                      if (notification.metrics.pixels >=
+                          notification.metrics.maxScrollExtent - 300) {
+                        _loadMoreRecipes();
+                      }
+                      return false;
+                    },
+                    child: GridView.builder(
+                      itemCount: recipes.length,
+                      gridDelegate:
+                          const SliverGridDelegateWithFixedCrossAxisCount(
+                        crossAxisCount: 2,
+                        mainAxisSpacing: 16,
+                        crossAxisSpacing: 16,
+                        childAspectRatio: 0.65,
+                      ),
+                      itemBuilder: (_, i) => _recipeCard(recipes[i]),
                     ),
-                    itemBuilder: (_, i) => _recipeCard(recipes[i]),
                   ),
           ),
         ),
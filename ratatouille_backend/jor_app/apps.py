@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class JorAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'jor_app'
+
+    def ready(self):
+        from . import db_router, signals  # noqa: F401
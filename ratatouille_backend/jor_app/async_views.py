@@ -0,0 +1,348 @@
+"""
+Async versions of the hot read endpoints, served under ``/api/async/``.
+
+They return the same payloads as their DRF counterparts: the same
+serializers, orderings, keyset pagination and content negotiation.  Only
+serialization is synchronous, and it runs on rows that are already loaded
+(``for_api()`` prefetches everything), so no query can sneak in.
+
+Under ASGI the request waits on the event loop, not on a thread of its
+own, but the database work is no more concurrent than on the sync path:
+the async ORM runs every query through
+``sync_to_async(thread_sensitive=True)``, i.e. on the one thread a process
+shares for all sync work, queries of the sync views included.  Scaling
+still comes from worker processes.
+
+DRF's view machinery is synchronous, so these are plain Django async
+views wrapped in ``async_api_view``, which provides content negotiation,
+method checks, error payloads and simplejwt authentication.
+``conditional_cached`` gives them the response cache and ETags of the sync
+views (jor_app.cache, jor_app.conditional).
+
+``manage.py load_test`` drives the sync and async paths side by side.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import text_search
+from .cache import response_cache
+from .conditional import make_etag, namespace_versions
+from .models import Category, Ingredient, Recipe, User, Wishlist
+from .pagination import RecipeCursorPagination
+from .search_index import ingredient_index
+from .serializer import (
+    CategorySerializer, IngredientSerializer, PantrySearchSerializer, RecipeSerializer, WishlistSerializer,
+)
+from .views import (
+    SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, RecipeViewSet, _optional_int, filter_recipes, order_recipes,
+    sparse_fieldset,
+)
+
+
+# 🔹 Auth
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """simplejwt's JWTAuthentication with the user lookup on the async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        # mirrors JWTAuthentication.get_user
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise exceptions.AuthenticationFailed(
+                "The user's password has been changed.", code="password_changed"
+            )
+        return user
+
+
+authentication = AsyncJWTAuthentication()
+negotiation = DefaultContentNegotiation()
+
+
+# 🔹 Plumbing
+
+def negotiate(request, force=False):
+    """
+    ``(renderer, media_type)`` for the ``Accept`` header / ``?format=``, like
+    ``APIView.perform_content_negotiation``: NotAcceptable, or the first
+    renderer if ``force``.  The browsable API needs a DRF view to render, so
+    it is left out and browsers get the first renderer.
+    """
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    ]
+    try:
+        return negotiation.select_renderer(request, renderers)
+    except exceptions.NotAcceptable:
+        if force:
+            return renderers[0], renderers[0].media_type
+        raise
+
+
+def render(accepted, data, status=200, headers=None):
+    renderer, media_type = accepted
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f"; charset={renderer.charset}"
+    response = HttpResponse(
+        renderer.render(data, media_type), status=status, content_type=content_type, headers=headers
+    )
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def async_api_view(methods=("GET",), auth_required=False):
+    """
+    Turn ``async def view(request, *args)`` into an API view.
+
+    The view receives a DRF ``Request`` (for ``query_params``/``data`` and
+    serializer context) whose ``user`` is set here, and returns ``data``,
+    ``(data, status)``, ``(data, status, headers)`` or a finished
+    ``HttpResponse``.
+    """
+    def decorator(view):
+        @csrf_exempt  # token auth only, like DRF's APIView
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            drf_request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=(),
+            )
+            try:
+                accepted = negotiate(drf_request)
+            except exceptions.NotAcceptable as exc:
+                return render(negotiate(drf_request, force=True), {"detail": exc.detail}, status=exc.status_code)
+            if request.method not in methods:
+                return render(accepted, {"detail": f'Method "{request.method}" not allowed.'}, status=405,
+                              headers={"Allow": ", ".join(methods)})
+            try:
+                result = await authentication.aauthenticate(request)
+                if result is None and auth_required:
+                    raise exceptions.NotAuthenticated()
+                drf_request.user = result[0] if result else AnonymousUser()
+                data = await view(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                headers = {}
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers["WWW-Authenticate"] = authentication.authenticate_header(request)
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+                return render(accepted, detail, status=exc.status_code, headers=headers)
+            except Http404 as exc:
+                return render(accepted, {"detail": str(exc) or "Not found."}, status=404)
+
+            if isinstance(data, HttpResponse):
+                patch_vary_headers(data, ("Accept",))
+                return data
+            data, status, *headers = data if isinstance(data, tuple) else (data, 200)
+            return render(accepted, data, status=status, headers=headers[0] if headers else None)
+        return wrapper
+    return decorator
+
+
+def conditional_cached(namespaces):
+    """
+    ``conditional_get`` + ``cached_response`` for an async GET view.
+    ``namespaces`` is a tuple, or a function of the request for views
+    whose filters and ``?expand=`` read more (``recipe_namespaces``).
+
+    The ETag is made of the namespace versions alone, details included: no
+    ``updated_at`` query, at the price of a new ETag after any write to the
+    namespace.  The cache calls run in a thread of their own
+    (``thread_sensitive=False``), not on the thread that serialises the
+    async ORM's queries, and not on the event loop either.
+    """
+    def lookup(request, names):
+        etag = make_etag(request, ":".join(namespace_versions(names)))
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH", "")
+        if etag in parse_etags(if_none_match) or if_none_match.strip() == "*":
+            return etag, None, None, True
+        if not response_cache.enabled:
+            return etag, None, None, False
+        key = response_cache.make_key(names, request)
+        return etag, key, response_cache.get(key), False
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            names = tuple(namespaces(request) if callable(namespaces) else namespaces)
+            etag, key, data, not_modified = await sync_to_async(lookup, thread_sensitive=False)(request, names)
+            if not_modified:
+                return HttpResponseNotModified(headers={"ETag": etag})
+            if data is None:
+                data = await view(request, *args, **kwargs)
+                if key is not None:
+                    await sync_to_async(response_cache.set, thread_sensitive=False)(key, data, names)
+            return data, 200, {"ETag": etag}
+        return wrapper
+    return decorator
+
+
+async def aget_or_404(queryset, **lookup):
+    obj = await queryset.filter(**lookup).afirst()
+    if obj is None:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    return obj
+
+
+async def paginated(queryset, request):
+    paginator = RecipeCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    data = RecipeSerializer(page, many=True, context={"request": request, **sparse_fieldset(request)}).data
+    return {"next": paginator.get_next_link(), "results": data}
+
+
+def recipe_namespaces(request):
+    """The namespaces a recipe view reads: RecipeViewSet.etag_namespaces + etag_dependencies."""
+    names = ["recipes"]
+    if request.query_params.get("category"):
+        names.append("categories")
+    names += [RecipeViewSet.EXPAND_NAMESPACES[name] for name in sorted(sparse_fieldset(request).get("expand", ()))]
+    return dict.fromkeys(names)
+
+
+def recipe_queryset(request):
+    qs = filter_recipes(Recipe.objects.for_api(**sparse_fieldset(request)), request.query_params)
+    return order_recipes(qs, request.query_params.get("order"))
+
+
+# 🔹 Recipes
+
+@async_api_view()
+@conditional_cached(recipe_namespaces)
+async def recipe_list(request):
+    return await paginated(recipe_queryset(request), request)
+
+
+@async_api_view()
+@conditional_cached(recipe_namespaces)
+async def recipe_detail(request, pk):
+    sparse = sparse_fieldset(request)
+    recipe = await aget_or_404(Recipe.objects.for_api(**sparse), pk=pk)
+    return RecipeSerializer(recipe, context={"request": request, **sparse}).data
+
+
+@async_api_view()
+@conditional_cached(recipe_namespaces)
+async def recipe_by_category(request):
+    return await paginated(recipe_queryset(request), request)
+
+
+@async_api_view()
+@conditional_cached(recipe_namespaces)
+async def recipe_search(request):
+    text = request.query_params.get("q", "").strip()
+    if not text:
+        raise exceptions.ValidationError({"q": "This query parameter is required."})
+    qs = text_search.search(Recipe.objects.for_api(**sparse_fieldset(request)), text)
+    return await paginated(qs, request)
+
+
+@async_api_view(methods=("POST",))
+async def search_recipes(request):
+    body = PantrySearchSerializer(data=request.data)
+    body.is_valid(raise_exception=True)
+    selected_ingredients = body.validated_data.get("ingredients")
+    if not selected_ingredients:
+        return {"recipes": []}
+
+    max_missing = _optional_int(request.data.get("max_missing"), "max_missing")
+    limit = _optional_int(
+        request.data.get("limit"), "limit", minimum=1, maximum=SEARCH_MAX_LIMIT
+    ) or SEARCH_DEFAULT_LIMIT
+
+    # in memory, but the first call in a process builds the index from the DB
+    matches = await sync_to_async(ingredient_index.search)(
+        selected_ingredients, max_missing=max_missing, limit=limit
+    )
+    sparse = sparse_fieldset(request)
+    recipes = await Recipe.objects.for_api(**sparse).ain_bulk([m.recipe_id for m in matches])
+    matches = [m for m in matches if m.recipe_id in recipes]
+
+    results = RecipeSerializer(
+        [recipes[m.recipe_id] for m in matches], many=True, context={"request": request, **sparse}
+    ).data
+    for data, match in zip(results, matches):
+        data["matched_count"] = match.matched
+        data["missing_count"] = match.missing
+    return results
+
+
+# 🔹 Categories / ingredients
+
+@async_api_view()
+@conditional_cached(("categories",))
+async def category_list(request):
+    categories = [c async for c in Category.objects.all()]
+    return CategorySerializer(categories, many=True, context={"request": request}).data
+
+
+@async_api_view()
+@conditional_cached(("categories",))
+async def category_detail(request, pk):
+    category = await aget_or_404(Category.objects.all(), pk=pk)
+    return CategorySerializer(category, context={"request": request}).data
+
+
+@async_api_view()
+@conditional_cached(("ingredients",))
+async def ingredient_list(request):
+    ingredients = [i async for i in Ingredient.objects.all()]
+    return IngredientSerializer(ingredients, many=True).data
+
+
+@async_api_view()
+@conditional_cached(("ingredients",))
+async def ingredient_detail(request, pk):
+    ingredient = await aget_or_404(Ingredient.objects.all(), pk=pk)
+    return IngredientSerializer(ingredient).data
+
+
+# 🔹 Wishlist
+
+@async_api_view(auth_required=True)
+async def my_wishlist(request):
+    if request.query_params.get("ids") in ("1", "true"):
+        return [
+            pk async for pk in Wishlist.objects.filter(user=request.user)
+            .order_by("id").values_list("recipe_id", flat=True)
+        ]
+    sparse = sparse_fieldset(request)
+    items = [w async for w in Wishlist.objects.for_api(**sparse).filter(user=request.user)]
+    return WishlistSerializer(items, many=True, context=sparse).data
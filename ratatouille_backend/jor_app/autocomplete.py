@@ -0,0 +1,157 @@
+"""
+In-memory prefix index for ingredient autocomplete.
+
+Ingredient names are kept case-folded in a sorted list; a prefix query is
+a ``bisect`` to the first candidate followed by a scan of the contiguous
+run of names that share the prefix.  Each entry can be weighted by the
+number of recipes that use the ingredient, so popular ingredients are
+suggested first.
+
+Each worker process holds its own copy.  The process that wrote updates
+names incrementally from the Ingredient signals, adjusts recipe counts on
+recipe-ingredient changes and recounts them lazily (one grouped query)
+when a change cannot be applied exactly.  Every change also bumps the
+shared ``ingredient-autocomplete`` version (``jor_app.cache.SharedVersion``),
+and the other workers rebuild before their next suggestion.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from django.db.models import Count
+
+from .cache import SharedVersion
+from .models import Ingredient, Recipe
+
+VERSION_NAMESPACE = "ingredient-autocomplete"
+
+
+def fold(text):
+    return text.casefold().strip()
+
+
+class IngredientAutocomplete:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = SharedVersion(VERSION_NAMESPACE)
+        self._weights_ready = False
+        self._entries = []   # sorted (folded name, ingredient id)
+        self._names = {}     # ingredient id -> display name
+        self._weights = {}   # ingredient id -> recipe count
+
+    # 🔹 Build / maintenance
+
+    def build(self, version=None):
+        with self._lock:
+            # read before the rows: a change made meanwhile triggers another build
+            version = self._version.current() if version is None else version
+            self._version.built = None
+            rows = list(Ingredient.objects.values_list("id", "name"))
+            self._names = dict(rows)
+            self._entries = sorted((fold(name), pk) for pk, name in rows)
+            self._load_weights()
+            self._version.built = version
+
+    def _load_weights(self):
+        through = Recipe.ingredients.through
+        self._weights = dict(
+            through.objects.order_by().values("ingredient_id")
+            .annotate(n=Count("id")).values_list("ingredient_id", "n")
+        )
+        self._weights_ready = True
+
+    @property
+    def _ready(self):
+        return self._version.built is not None
+
+    def _ensure_current(self):
+        if self._version.current() != self._version.built:
+            with self._lock:
+                version = self._version.current()
+                if version != self._version.built:
+                    self.build(version)
+        if not self._weights_ready:
+            with self._lock:
+                if not self._weights_ready:
+                    self._load_weights()
+
+    def invalidate(self):
+        """Rebuild in every worker before its next suggestion."""
+        with self._lock:
+            self._version.invalidate()
+
+    def invalidate_weights(self):
+        """Recount the recipes per ingredient, here and in every other worker."""
+        with self._lock:
+            self._weights_ready = False
+            self._version.publish()
+
+    def _remove_entry(self, ingredient_id):
+        old = self._names.pop(ingredient_id, None)
+        if old is None:
+            return
+        key = (fold(old), ingredient_id)
+        i = bisect_left(self._entries, key)
+        if i < len(self._entries) and self._entries[i] == key:
+            del self._entries[i]
+
+    def upsert(self, ingredient_id, name):
+        with self._lock:
+            if self._ready:
+                self._remove_entry(ingredient_id)
+                self._names[ingredient_id] = name
+                insort(self._entries, (fold(name), ingredient_id))
+            self._version.publish()
+
+    def remove(self, ingredient_id):
+        with self._lock:
+            if self._ready:
+                self._remove_entry(ingredient_id)
+                self._weights.pop(ingredient_id, None)
+            self._version.publish()
+
+    def adjust_weights(self, ingredient_ids, delta):
+        """Move the counts of ``ingredient_ids``: links that were really added or removed."""
+        with self._lock:
+            if self._ready:
+                for ingredient_id in ingredient_ids:
+                    weight = self._weights.get(ingredient_id, 0) + delta
+                    if weight > 0:
+                        self._weights[ingredient_id] = weight
+                    else:
+                        self._weights.pop(ingredient_id, None)
+            self._version.publish()
+
+    # 🔹 Query
+
+    def suggest(self, prefix, limit=10, weighted=True):
+        """
+        Up to ``limit`` ``(id, name, recipe_count)`` tuples whose name starts
+        with ``prefix``; by recipe count when ``weighted``, else alphabetical.
+        """
+        key = fold(prefix)
+        if not key:
+            return []
+        self._ensure_current()
+
+        with self._lock:
+            entries = self._entries
+            matches = []
+            for i in range(bisect_left(entries, (key,)), len(entries)):
+                folded, ingredient_id = entries[i]
+                if not folded.startswith(key):
+                    break
+                matches.append(ingredient_id)
+                if not weighted and len(matches) == limit:
+                    break
+
+            if weighted:
+                weights = self._weights
+                matches = heapq.nsmallest(
+                    limit, matches,
+                    key=lambda pk: (-weights.get(pk, 0), fold(self._names[pk])),
+                )
+            return [(pk, self._names[pk], self._weights.get(pk, 0)) for pk in matches]
+
+
+ingredient_autocomplete = IngredientAutocomplete()
@@ -0,0 +1,546 @@
+"""
+Reproducible endpoint benchmarks.
+
+``generate_dataset`` builds a synthetic catalogue from a seed: the same
+seed and size always produce the same recipes, ingredients, users,
+ratings and wishlists.  Ingredient use and recipe popularity follow a
+Zipf-like distribution and ratings lean positive, roughly like real
+recipe sites.  Rows are written in batches with ``bulk_create`` so a
+million recipes fit in bounded memory.
+
+``run_benchmarks`` replays a fixed, seeded sequence of requests against
+every public endpoint through the in-process test client (no network, no
+server) and reports latency percentiles, throughput and SQL query counts.
+Results are plain JSON; ``compare_results`` diffs two of them and flags
+regressions.
+
+``render_benchmark`` times the response renderers alone on recipe pages
+of growing size (jor_app.renderers).  ``similar_benchmark`` measures the
+recall and latency of the MinHash/LSH similar-recipes index against the
+exact Jaccard answer (jor_app.similar).
+
+Driven by ``manage.py generate_benchmark_data``,
+``manage.py benchmark_endpoints``, ``manage.py benchmark_renderers`` and
+``manage.py benchmark_similar``.
+"""
+import bisect
+import gzip
+import itertools
+import platform
+import random
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import renderers, similar
+from .cooking_time import parse_minutes
+from .models import Category, Ingredient, Nutrition, Recipe, RecipeMinHash, RecipeRating, User, Wishlist
+from .nutrition import normalize as normalize_nutrition
+from .serializer import RecipeSerializer
+from .signals import bulk_loaded
+
+BENCH_EMAIL_DOMAIN = "bench.local"
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = (
+    "Үндсэн хоол", "Шөл", "Салат", "Өглөөний цай", "Амттан",
+    "Уух зүйл", "Зууш", "Гурилан хоол", "Хүүхдийн хоол", "Цагаан хоол",
+)
+CUISINES = ("Монгол", "Солонгос", "Хятад", "Итали", "Япон", "Орос", "Франц", "Энэтхэг", "")
+BASE_INGREDIENTS = (
+    "мах", "гурил", "сонгино", "төмс", "лууван", "байцаа", "сармис", "давс",
+    "перец", "өндөг", "сүү", "цөцгий", "бяслаг", "будаа", "гоймон", "тос",
+    "элсэн чихэр", "улаан лооль", "өргөст хэмх", "тахиа", "загас", "үхрийн мах",
+    "хонины мах", "гахайн мах", "мөөг", "чинжүү", "ногоон сонгино", "шар буурцаг",
+    "цагаан гаа", "лимон",
+)
+TIMES = ("15 минут", "20 минут", "30 минут", "45 минут", "1 цаг", "1.5 цаг", "2 цаг", "3 цаг")
+NAME_WORDS = (
+    "гэрийн", "амтат", "халуун", "хөнгөн", "шарсан", "чанасан", "жигнэсэн",
+    "ногоотой", "махтай", "бяслагтай", "өвлийн", "зуны", "хурдан", "баярын",
+)
+DISHES = ("бууз", "хуушуур", "цуйван", "банш", "шөл", "салат", "хуурга", "бялуу", "боорцог", "будаа")
+
+# star distribution of a typical recipe site: mostly 4s and 5s
+RATING_WEIGHTS = (0.04, 0.06, 0.15, 0.35, 0.40)
+
+
+# 🔹 Dataset
+
+class ZipfSampler:
+    """Draw indices 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+    def one(self):
+        x = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, x)
+
+    def distinct(self, k):
+        k = min(k, len(self.cumulative))
+        seen = {}
+        while len(seen) < k:
+            seen.setdefault(self.one(), None)
+        return list(seen)
+
+
+def dataset_sizes(recipes, users=None, ingredients=None):
+    return {
+        "recipes": recipes,
+        "users": users or max(20, min(recipes // 5, 200_000)),
+        "ingredients": ingredients or max(len(BASE_INGREDIENTS), min(recipes // 20, 5_000)),
+    }
+
+
+def flush_dataset():
+    """Delete the synthetic users and the recipes they own (ratings and wishlists cascade)."""
+    users = User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}")
+    deleted, _ = Recipe.objects.filter(created_by__in=users).delete()
+    users.delete()
+    return deleted
+
+
+def generate_dataset(recipes, users=None, ingredients=None, seed=42, batch_size=2000, log=None):
+    """
+    Create a synthetic dataset and return the counts that were written.
+
+    Categories and ingredients are matched by name, so they are shared with
+    existing data; users are ``bench-<n>@bench.local`` and own every
+    generated recipe, which is what ``flush_dataset`` removes.
+    """
+    log = log or (lambda message: None)
+    sizes = dataset_sizes(recipes, users, ingredients)
+    rng = random.Random(seed)
+
+    categories = _ensure_named(Category, CATEGORIES)
+    ingredient_names = list(BASE_INGREDIENTS) + [
+        f"орц {i:05d}" for i in range(sizes["ingredients"] - len(BASE_INGREDIENTS))
+    ]
+    ingredient_ids = _ensure_named(Ingredient, ingredient_names)
+    ingredient_ids = [ingredient_ids[name] for name in ingredient_names]
+    category_ids = [categories[name] for name in CATEGORIES]
+    user_ids = _create_users(sizes["users"], batch_size)
+    log(f"{len(category_ids)} categories, {len(ingredient_ids)} ingredients, {len(user_ids)} users")
+
+    ingredient_sampler = ZipfSampler(len(ingredient_ids), 1.05, rng)
+    category_sampler = ZipfSampler(len(category_ids), 0.8, rng)
+    user_sampler = ZipfSampler(len(user_ids), 0.6, rng)
+
+    counts = {"recipes": 0, "ratings": 0, "wishlist": 0}
+    recipe_ids = []
+    through = Recipe.ingredients.through
+    for start in range(0, recipes, batch_size):
+        size = min(batch_size, recipes - start)
+        with transaction.atomic():
+            batch = Recipe.objects.bulk_create([
+                _fake_recipe(rng, start + i, category_ids[category_sampler.one()],
+                             user_ids[user_sampler.one()])
+                for i in range(size)
+            ])
+
+            through.objects.bulk_create([
+                through(recipe_id=recipe.pk, ingredient_id=ingredient_ids[i])
+                for recipe in batch
+                for i in ingredient_sampler.distinct(max(2, int(rng.gauss(7, 2.5))))
+            ])
+            Nutrition.objects.bulk_create([
+                normalize_nutrition(Nutrition(
+                    recipe_id=recipe.pk,
+                    calories=f"{rng.randint(80, 900)} ккал",
+                    protein=f"{rng.randint(1, 60)} г",
+                    fat=f"{rng.randint(1, 50)} г",
+                    carbs=f"{rng.randint(5, 120)} г",
+                ))
+                for recipe in batch
+                if rng.random() < 0.8
+            ])
+
+            ratings, wishlist = [], []
+            for recipe in batch:
+                # popularity is heavy-tailed: most recipes get a few votes, some get hundreds
+                votes = min(len(user_ids), int(rng.paretovariate(1.3)) - 1)
+                for u in rng.sample(range(len(user_ids)), votes):
+                    ratings.append(RecipeRating(
+                        user_id=user_ids[u], recipe_id=recipe.pk,
+                        rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+                    ))
+                    if rng.random() < 0.3:
+                        wishlist.append(Wishlist(user_id=user_ids[u], recipe_id=recipe.pk))
+            RecipeRating.objects.bulk_create(ratings)
+            Wishlist.objects.bulk_create(wishlist)
+            RecipeRating.objects.refresh_aggregates([recipe.pk for recipe in batch])
+
+        recipe_ids.extend(recipe.pk for recipe in batch)
+        counts["recipes"] += size
+        counts["ratings"] += len(ratings)
+        counts["wishlist"] += len(wishlist)
+        log(f"{counts['recipes']}/{recipes} recipes")
+
+    bulk_loaded(recipe_ids)
+    counts.update(users=len(user_ids), ingredients=len(ingredient_ids), categories=len(category_ids))
+    return counts
+
+
+def _ensure_named(model, names):
+    existing = dict(model.objects.filter(name__in=names).values_list("name", "id"))
+    missing = [model(name=name) for name in names if name not in existing]
+    model.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+    if missing:
+        existing.update(model.objects.filter(name__in=names).values_list("name", "id"))
+    return existing
+
+
+def _create_users(count, batch_size):
+    # hashing is deliberately slow; every synthetic user shares one hash
+    password = make_password(BENCH_PASSWORD)
+    emails = [f"bench-{i}@{BENCH_EMAIL_DOMAIN}" for i in range(count)]
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create([
+            User(email=email, username=email.split("@")[0], password=password)
+            for email in emails[start:start + batch_size]
+        ], ignore_conflicts=True)
+    ids = dict(User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").values_list("email", "id"))
+    return [ids[email] for email in emails]
+
+
+def _fake_recipe(rng, n, category_id, user_id):
+    dish = rng.choice(DISHES)
+    time_required = rng.choice(TIMES)
+    return Recipe(
+        name=f"{rng.choice(NAME_WORDS).capitalize()} {dish} №{n}",
+        description=" ".join(rng.choices(NAME_WORDS + DISHES, k=rng.randint(8, 40))),
+        image=f"recipe_images/bench_{n % 50}.jpg",
+        time_required=time_required,
+        time_minutes=parse_minutes(time_required),
+        servings=rng.randint(1, 8),
+        cuisine=rng.choice(CUISINES),
+        category_id=category_id,
+        created_by_id=user_id,
+    )
+
+
+# 🔹 Scenarios
+
+class Scenario:
+    """
+    One endpoint under test.  ``build(ctx, rng)`` returns the
+    ``(method, path, kwargs)`` of the next request.
+    """
+
+    def __init__(self, name, build, auth=False):
+        self.name = name
+        self.build = build
+        self.auth = auth
+
+
+def _random_recipe(ctx, rng):
+    return rng.choice(ctx["recipe_ids"])
+
+
+SCENARIOS = (
+    Scenario("recipes_list", lambda ctx, rng: ("get", "/api/recipes/", {})),
+    Scenario("recipes_list_page2", lambda ctx, rng: ("get", ctx["second_page"], {})),
+    Scenario("recipes_detail", lambda ctx, rng: (
+        "get", f"/api/recipes/{_random_recipe(ctx, rng)}/", {})),
+    Scenario("recipes_by_category", lambda ctx, rng: (
+        "get", "/api/recipes/by_category/", {"data": {"category": rng.choice(ctx["categories"])}})),
+    Scenario("recipes_search", lambda ctx, rng: (
+        "get", "/api/recipes/search/", {"data": {"q": rng.choice(DISHES)}})),
+    Scenario("search_recipes", lambda ctx, rng: (
+        "post", "/api/search_recipes/",
+        {"data": {"ingredients": rng.sample(ctx["ingredients"], rng.randint(2, 6))}, "format": "json"})),
+    Scenario("wishlist_my", lambda ctx, rng: ("get", "/api/wishlist/my/", {}), auth=True),
+    Scenario("rate", lambda ctx, rng: (
+        "post", f"/api/recipes/{_random_recipe(ctx, rng)}/rate/",
+        {"data": {"rating": rng.randint(1, 5)}, "format": "json"}), auth=True),
+)
+
+
+def scenario_names():
+    return [scenario.name for scenario in SCENARIOS]
+
+
+def _context(client):
+    """Ids and names the scenarios draw from, read once up front."""
+    recipe_ids = list(Recipe.objects.order_by("id").values_list("id", flat=True)[:50_000])
+    if not recipe_ids:
+        raise ValueError("No recipes to benchmark; run 'manage.py generate_benchmark_data' first.")
+    user = (
+        User.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}", wishlistUser__isnull=False)
+        .order_by("id").first()
+        or User.objects.order_by("id").first()
+    )
+    first_page = client.get("/api/recipes/").json()
+    return {
+        "recipe_ids": recipe_ids,
+        "categories": list(Category.objects.filter(recipes__isnull=False)
+                           .distinct().values_list("name", flat=True)) or [""],
+        "ingredients": list(Ingredient.objects.order_by("id").values_list("name", flat=True)[:500]),
+        "second_page": first_page.get("next") or "/api/recipes/",
+        "user": user,
+    }
+
+
+# 🔹 Runner
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def _summarize(timings, queries, sizes, errors):
+    timings = sorted(timings)
+    total = sum(timings)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "p50_ms": ms(percentile(timings, 0.50)),
+        "p90_ms": ms(percentile(timings, 0.90)),
+        "p95_ms": ms(percentile(timings, 0.95)),
+        "p99_ms": ms(percentile(timings, 0.99)),
+        "mean_ms": ms(total / len(timings)),
+        "min_ms": ms(timings[0]),
+        "max_ms": ms(timings[-1]),
+        "throughput_rps": round(len(timings) / total, 1) if total else None,
+        "queries": sorted(queries)[len(queries) // 2] if queries else None,
+        "queries_max": max(queries) if queries else None,
+        "response_bytes": sorted(sizes)[len(sizes) // 2] if sizes else None,
+    }
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ("*", "") and not host.startswith(".")]
+    return hosts[0] if hosts else "localhost"
+
+
+def run_benchmarks(iterations=200, warmup=20, seed=42, only=None, use_cache=False, log=None):
+    """
+    Run every scenario (or those named in ``only``) and return the results dict.
+
+    Warm-up requests are not timed; they run under ``CaptureQueriesContext``
+    to record query counts, which keeps the SQL logging overhead out of the
+    timed requests.  With ``use_cache=False`` the response cache is off so
+    the numbers reflect the database path.  ``rate`` writes: it upserts
+    the votes of one user, so run against a benchmark database.
+    """
+    log = log or (lambda message: None)
+    overrides = {} if use_cache else {"RESPONSE_CACHE": {**getattr(settings, "RESPONSE_CACHE", {}), "ENABLED": False}}
+    results = {}
+    with override_settings(**overrides):
+        client = APIClient(HTTP_HOST=_host())
+        ctx = _context(client)
+        token = str(RefreshToken.for_user(ctx["user"]).access_token)
+
+        for scenario in SCENARIOS:
+            if only and scenario.name not in only:
+                continue
+            rng = random.Random(f"{seed}:{scenario.name}")
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if scenario.auth else {}
+
+            queries, sizes, errors = [], [], 0
+            for _ in range(max(warmup, 1)):
+                method, path, kwargs = scenario.build(ctx, rng)
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(client, method)(path, **kwargs, **headers)
+                queries.append(len(captured))
+                sizes.append(len(response.content))
+
+            timings = []
+            for _ in range(iterations):
+                method, path, kwargs = scenario.build(ctx, rng)
+                started = time.perf_counter()
+                response = getattr(client, method)(path, **kwargs, **headers)
+                timings.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+            results[scenario.name] = _summarize(timings, queries, sizes, errors)
+            log(f"{scenario.name}: p50 {results[scenario.name]['p50_ms']} ms, "
+                f"p95 {results[scenario.name]['p95_ms']} ms, {results[scenario.name]['queries']} queries")
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seed": seed,
+            "iterations": iterations,
+            "warmup": warmup,
+            "response_cache": use_cache,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "dataset": {
+                "recipes": Recipe.objects.count(),
+                "ingredients": Ingredient.objects.count(),
+                "users": User.objects.count(),
+                "ratings": RecipeRating.objects.count(),
+                "wishlist": Wishlist.objects.count(),
+            },
+        },
+        "endpoints": results,
+    }
+
+
+# 🔹 Comparison
+
+def compare_results(baseline, current, threshold=0.10, min_delta_ms=0.5):
+    """
+    Compare two ``run_benchmarks`` results endpoint by endpoint.
+
+    A row is a regression when p50 or p95 grew by more than ``threshold``
+    (relative) and ``min_delta_ms`` (absolute, to ignore timer noise), or
+    when the endpoint now runs more queries.
+    """
+    rows = []
+    for name, now in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        row = {"endpoint": name, "regressions": []}
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = before[metric], now[metric]
+            change = (new - old) / old if old else 0.0
+            row[metric] = (old, new, change)
+            if change > threshold and new - old > min_delta_ms:
+                row["regressions"].append(f"{metric} +{change:.0%}")
+        if (now["queries"] or 0) > (before["queries"] or 0):
+            row["regressions"].append(f"queries {before['queries']} -> {now['queries']}")
+        row["queries"] = (before["queries"], now["queries"])
+        rows.append(row)
+    return rows
+
+
+# 🔹 Renderers
+
+def _renderers():
+    candidates = {"drf_json": JSONRenderer(), "orjson": renderers.ORJSONRenderer()}
+    if renderers.msgpack is not None:
+        candidates["msgpack"] = renderers.MessagePackRenderer()
+    return candidates
+
+
+def render_benchmark(sizes=(20, 200, 2000), iterations=50, log=None):
+    """
+    Render recipe pages of each size with every available renderer and
+    report the time per render and the payload size, raw and gzipped.
+
+    The pages are real ``RecipeSerializer`` output of the recipes in the
+    database, repeated when there are fewer rows than the largest size;
+    only the rendering is timed.
+    """
+    log = log or (lambda message: None)
+    request = RequestFactory(HTTP_HOST=_host()).get("/api/recipes/")
+    recipes = list(Recipe.objects.for_api().order_by("-rating", "-id")[: max(sizes)])
+    if not recipes:
+        raise ValueError("No recipes to render; run generate_benchmark_data first")
+    rows = RecipeSerializer(recipes, many=True, context={"request": request}).data
+
+    results = {}
+    for size in sizes:
+        page = {"next": None, "results": list(itertools.islice(itertools.cycle(rows), size))}
+        results[str(size)] = by_renderer = {}
+        for name, renderer in _renderers().items():
+            body = renderer.render(page, renderer.media_type, {})
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                renderer.render(page, renderer.media_type, {})
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            by_renderer[name] = {
+                "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+            }
+            log(f"{size} items, {name}: p50 {by_renderer[name]['p50_ms']} ms, {len(body)} bytes")
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "iterations": iterations,
+            "distinct_recipes": len(recipes),
+            "python": platform.python_version(),
+        },
+        "sizes": results,
+    }
+
+
+# 🔹 Similar recipes
+
+def similar_benchmark(sample=200, limit=10, seed=42, log=None):
+    """
+    Compare ``similar.similar_to`` with ``similar.exact_similar`` on a
+    seeded sample of indexed recipes.
+
+    Recall is tie-aware: an LSH result counts as a hit when its exact
+    Jaccard is at least the ``limit``-th best exact score, so swapping
+    equally similar recipes is not a miss.
+    """
+    log = log or (lambda message: None)
+    ids = list(RecipeMinHash.objects.order_by("recipe_id").values_list("recipe_id", flat=True))
+    if not ids:
+        raise ValueError("The similar-recipes index is empty; run rebuild_similar_index first")
+    sampled = random.Random(seed).sample(ids, min(sample, len(ids)))
+
+    lsh_timings, exact_timings, recalls = [], [], []
+    for recipe_id in sampled:
+        started = time.perf_counter()
+        approximate = similar.similar_to(recipe_id, limit=limit)
+        lsh_timings.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        exact = similar.exact_similar(recipe_id, limit=limit)
+        exact_timings.append(time.perf_counter() - started)
+
+        if not exact:
+            continue
+        sets = similar._ingredient_sets([recipe_id] + [pk for pk, _ in approximate])
+        own = sets.pop(recipe_id)
+        cutoff = exact[-1][1]
+        hits = sum(similar.jaccard(own, sets[pk]) >= cutoff for pk, _ in approximate)
+        recalls.append(min(hits, len(exact)) / len(exact))
+
+    def latency(timings):
+        timings = sorted(timings)
+        return {
+            "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+            "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        }
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seed": seed,
+            "sample": len(sampled),
+            "limit": limit,
+            "recipes": len(ids),
+            "bands": similar.get_config("BANDS"),
+            "rows": similar.get_config("ROWS"),
+            "candidates": similar.get_config("CANDIDATES"),
+            "database": connection.vendor,
+        },
+        "recall": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "lsh": latency(lsh_timings),
+        "exact": latency(exact_timings),
+    }
+    log(f"recall@{limit} {results['recall']}, lsh p50 {results['lsh']['p50_ms']} ms, "
+        f"exact p50 {results['exact']['p50_ms']} ms")
+    return results
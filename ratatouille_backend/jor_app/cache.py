@@ -0,0 +1,192 @@
+"""
+Versioned response cache for the catalogue read endpoints.
+
+Responses are stored under a key made of the endpoint path, the sorted
+query params and the current version of every namespace the endpoint
+reads (``recipes``, ``categories``, ``ingredients``).  A write never
+deletes keys; it bumps the namespace version and the old entries simply
+stop being addressed until the backend expires them.
+
+A response computed on a read replica (jor_app.db_router) is not stored
+while one of its namespaces was bumped less than ``STICKY_SECONDS`` ago:
+the replica may not have the write yet, and the entry would keep serving
+the old data under the new version.
+
+The backend is whatever Django cache alias ``RESPONSE_CACHE["ALIAS"]``
+points at: LocMemCache for a single process, Redis/Memcached when several
+workers must share entries and versions.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from . import db_router
+from .metrics import record_cache_lookup
+
+KEY_PREFIX = "respcache"
+
+
+class ResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local_stats = {"hits": 0, "misses": 0}
+
+    @property
+    def config(self):
+        return getattr(settings, "RESPONSE_CACHE", {})
+
+    @property
+    def enabled(self):
+        return self.config.get("ENABLED", True)
+
+    @property
+    def backend(self):
+        return caches[self.config.get("ALIAS", "default")]
+
+    @property
+    def timeout(self):
+        return self.config.get("TIMEOUT", 300)
+
+    # 🔹 Versions
+
+    def _version_key(self, namespace):
+        return f"{KEY_PREFIX}:ver:{namespace}"
+
+    def _fresh_version(self):
+        # Start from a timestamp so a version key that was evicted or lost on
+        # restart never comes back with a number that addressed older entries.
+        return int(time.time() * 1000)
+
+    def versions(self, namespaces):
+        keys = [self._version_key(ns) for ns in namespaces]
+        found = self.backend.get_many(keys)
+        for key in keys:
+            if key not in found:
+                self.backend.add(key, self._fresh_version(), timeout=None)
+                found[key] = self.backend.get(key)
+        return [found[key] for key in keys]
+
+    def bump(self, *namespaces):
+        """Move ``namespaces`` to new versions; returns them."""
+        versions = []
+        for namespace in namespaces:
+            key = self._version_key(namespace)
+            try:
+                versions.append(self.backend.incr(key))
+            except ValueError:
+                versions.append(self._fresh_version())
+                self.backend.set(key, versions[-1], timeout=None)
+        self.backend.set_many({self._bumped_key(ns): time.time() for ns in namespaces}, timeout=None)
+        return versions
+
+    def _bumped_key(self, namespace):
+        return f"{KEY_PREFIX}:bumped:{namespace}"
+
+    def recently_bumped(self, namespaces, seconds):
+        bumped = self.backend.get_many([self._bumped_key(ns) for ns in namespaces]).values()
+        return any(time.time() - at < seconds for at in bumped)
+
+    # 🔹 Entries
+
+    def make_key(self, namespaces, request):
+        params = sorted(request.query_params.lists())
+        versions = self.versions(namespaces)
+        raw = "|".join([
+            request.scheme,
+            request.get_host(),
+            request.path,
+            repr(params),
+            repr(list(zip(namespaces, versions))),
+        ])
+        return f"{KEY_PREFIX}:resp:" + hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+        data = self.backend.get(key)
+        self._count("hits" if data is not None else "misses")
+        record_cache_lookup(data is not None)
+        return data
+
+    def set(self, key, data, namespaces=()):
+        if (
+            namespaces and db_router.reading_from_replica()
+            and self.recently_bumped(namespaces, db_router.get_config("STICKY_SECONDS"))
+        ):
+            return
+        self.backend.set(key, data, timeout=self.timeout)
+
+    # 🔹 Hit / miss counters
+
+    def _count(self, name):
+        # in process only: a shared counter would cost every hit a backend
+        # round trip; /metrics/ sums the per-view counts of all workers
+        with self._lock:
+            self._local_stats[name] += 1
+
+    def stats(self):
+        """Hits and misses of this process."""
+        with self._lock:
+            return dict(self._local_stats)
+
+
+response_cache = ResponseCache()
+
+
+class SharedVersion:
+    """
+    Tells a per-process structure (jor_app.search_index,
+    jor_app.autocomplete) that another worker changed what it was built
+    from, through the version of ``namespace``.
+
+    Build from the database and record ``current()`` as ``built``; compare
+    with ``current()`` before each use.  A change this process applied to
+    its own copy is announced with ``publish()``; the copy stays current
+    unless some other worker bumped in between.  ``invalidate()`` makes
+    every worker rebuild.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.built = None  # the version the local copy matches, None = not built
+
+    def current(self):
+        return response_cache.versions([self.namespace])[0]
+
+    def publish(self):
+        (version,) = response_cache.bump(self.namespace)
+        if self.built is not None and version == self.built + 1:
+            self.built = version
+        else:
+            self.built = None
+
+    def invalidate(self):
+        self.built = None
+        response_cache.bump(self.namespace)
+
+
+def cached_response(*namespaces):
+    """
+    Cache the ``response.data`` of a GET view method, keyed by request and
+    the versions of ``namespaces``.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not response_cache.enabled or request.method != "GET":
+                return method(self, request, *args, **kwargs)
+
+            key = response_cache.make_key(namespaces, request)
+            data = response_cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                response_cache.set(key, response.data, namespaces)
+            return response
+        return wrapper
+    return decorator
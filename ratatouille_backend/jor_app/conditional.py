@@ -0,0 +1,107 @@
+"""
+Conditional GET (ETag / Last-Modified) for the catalogue endpoints.
+
+Validators never come from the response body, so a matching
+``If-None-Match`` is answered with 304 without touching the serializer:
+
+* detail: the row's ``updated_at`` (one primary-key lookup), plus the
+          namespace versions of ``etag_dependencies``: related rows the
+          response nests, whose writes leave ``updated_at`` alone;
+* list:   the jor_app.cache namespace versions of ``etag_namespaces`` plus
+          ``etag_dependencies``.  Every write bumps them (jor_app.signals),
+          deletions included, and reading them is a cache lookup, so a list
+          costs no query however long it is.  The query string goes into
+          the ETag itself (``make_etag``).
+
+The versions are only as shared as the ``RESPONSE_CACHE`` backend: with
+several workers it must be Redis/Memcached, as for the cached responses.
+
+Lists only honour ``If-None-Match``: a version is not a time, so they send
+no ``Last-Modified``.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import response_cache
+
+
+class ConditionalGetMixin:
+    # jor_app.cache namespaces whose versions change this view's lists
+    etag_namespaces = ()
+    # Extra namespaces of the current request (a filter on or a nested copy of another model)
+    etag_dependencies = ()
+
+    def get_validators(self, request, *args, **kwargs):
+        """Return ``(version, last_modified, is_detail)`` or None to skip."""
+        if self.detail:
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            last_modified = (
+                self.get_queryset().order_by()
+                .filter(**{self.lookup_field: kwargs[lookup]})
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+            if last_modified is None:
+                return None
+            if not self.etag_dependencies:
+                return last_modified.isoformat(), last_modified, True
+            # the nested rows have no time of their own: ETag only
+            version = ":".join([last_modified.isoformat(), *namespace_versions(self.etag_dependencies)])
+            return version, None, True
+
+        namespaces = dict.fromkeys((*self.etag_namespaces, *self.etag_dependencies))
+        return ":".join(namespace_versions(namespaces)), None, False
+
+
+def namespace_versions(namespaces):
+    namespaces = tuple(namespaces)
+    if not namespaces:
+        return []
+    return [f"{ns}={v}" for ns, v in zip(namespaces, response_cache.versions(namespaces))]
+
+
+def make_etag(request, version):
+    raw = "|".join([
+        request.get_full_path(),
+        request.META.get("HTTP_ACCEPT", ""),
+        version,
+    ])
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def conditional_get(method):
+    """Answer GETs with 304 when the client's validators still match."""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return method(self, request, *args, **kwargs)
+
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return method(self, request, *args, **kwargs)
+
+        version, last_modified, is_detail = validators
+        etag = make_etag(request, version)
+        headers = {"ETag": etag}
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(last_modified.timestamp())
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            if etag in parse_etags(if_none_match) or if_none_match.strip() == "*":
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        elif is_detail and last_modified is not None:
+            since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+            if since is not None and int(last_modified.timestamp()) <= since:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+    return wrapper
@@ -0,0 +1,205 @@
+"""
+Read replicas with read-your-writes.
+
+``ReplicaRouter`` sends the reads of safe (GET/HEAD/OPTIONS) API requests
+to a random alias of ``READ_REPLICAS["ALIASES"]``; everything else goes to
+``default``.  Reads stay on the primary:
+
+* outside a request (management commands, shell, migrations);
+* for the whole of an unsafe request, and for the rest of a safe request
+  once it has written, so a request always sees its own writes;
+* for ``STICKY_SECONDS`` after a user's successful write (rate_recipe,
+  wishlist add/remove, me_update, recipe create...), so their next GETs
+  don't land on a replica that hasn't caught up yet.
+
+``ReplicaRouterMiddleware`` makes that decision per request.  The user
+comes from the JWT in the Authorization header, without a query; DRF
+authenticates later, and that lookup is itself a read.  Pins are kept in
+the cache alias ``READ_REPLICAS["CACHE"]``, so every worker sees them; a
+per-process backend (LocMemCache) would only pin the worker that took the
+write, so ``check_pin_cache`` refuses it as soon as replicas are configured.
+
+A replica alias that points at the same database as ``default`` is
+ignored.  Test mirrors (``TEST["MIRROR"]``) are such aliases, so the test
+suite runs on one database.  ``ReadReplicaTests`` route to a second local
+database instead (settings ``DATABASE_TEST_REPLICA``), which never
+receives the primary's writes, like a replica that lags forever.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    "ALIASES": [],
+    "STICKY_SECONDS": 10,
+    "CACHE": "default",
+    "PATHS": ("/api/",),
+}
+
+PIN_PREFIX = "dbpin"
+
+# backends that don't share their entries between worker processes
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_config(name):
+    return getattr(settings, "READ_REPLICAS", {}).get(name, DEFAULTS[name])
+
+
+def _database(alias):
+    config = connections[alias].settings_dict
+    return config["ENGINE"], config["HOST"], config["PORT"], config["NAME"]
+
+
+def replicas():
+    """The configured replica aliases that are really another database."""
+    primary = _database(DEFAULT_DB_ALIAS)
+    return [
+        alias for alias in get_config("ALIASES")
+        if alias in settings.DATABASES and _database(alias) != primary
+    ]
+
+
+# 🔹 Per-request state
+
+class RequestReads:
+    def __init__(self, replica):
+        self.replica = replica
+
+
+_current = ContextVar("replica_reads", default=None)
+
+
+def reading_from_replica():
+    state = _current.get()
+    return state is not None and state.replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reading_from_replica():
+            return DEFAULT_DB_ALIAS
+        aliases = replicas()
+        return random.choice(aliases) if aliases else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.replica = False  # the rest of this request reads its own write
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_config("ALIASES")}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# 🔹 Read-your-writes pins
+
+def _pin_key(user_id):
+    return f"{PIN_PREFIX}:{user_id}"
+
+
+def pin(user_id):
+    caches[get_config("CACHE")].set(_pin_key(user_id), 1, timeout=get_config("STICKY_SECONDS"))
+
+
+def is_pinned(user_id):
+    return caches[get_config("CACHE")].get(_pin_key(user_id)) is not None
+
+
+@checks.register(checks.Tags.caches)
+def check_pin_cache(app_configs=None, **kwargs):
+    if not get_config("ALIASES"):
+        return []
+    alias = get_config("CACHE")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend is None:
+        return [checks.Error(
+            f"READ_REPLICAS['CACHE'] names the cache alias {alias!r}, which is not in CACHES.",
+            id="jor_app.E001",
+        )]
+    if backend in PROCESS_LOCAL_CACHES:
+        return [checks.Error(
+            f"READ_REPLICAS['CACHE'] ({alias!r}) uses {backend.rsplit('.', 1)[-1]}, "
+            "so a read-your-writes pin is only seen by the worker that set it.",
+            hint="Point it at a shared backend (Redis/Memcached), e.g. set REDIS_URL.",
+            id="jor_app.E002",
+        )]
+    return []
+
+
+_authentication = JWTAuthentication()
+
+
+def token_user_id(request):
+    """The user id claim of a valid bearer token, without touching the database."""
+    header = _authentication.get_header(request)
+    raw_token = _authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        return _authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except (InvalidToken, TokenError):
+        return None
+
+
+class ReplicaRouterMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def replica_allowed(self, request, user_id):
+        return (
+            request.method in SAFE_METHODS
+            and request.path.startswith(tuple(get_config("PATHS")))
+            # the pin lookup only costs authenticated GETs a cache read
+            and not (user_id is not None and is_pinned(user_id))
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replicas():  # nothing to route: skip the token check
+            return self.get_response(request)
+        user_id = token_user_id(request)
+        token = _current.set(RequestReads(self.replica_allowed(request, user_id)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.after(request, response, user_id)
+        return response
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+        user_id = token_user_id(request)
+        token = _current.set(RequestReads(self.replica_allowed(request, user_id)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.after(request, response, user_id)
+        return response
+
+    def after(self, request, response, user_id):
+        if request.method not in SAFE_METHODS and user_id is not None and response.status_code < 400:
+            pin(user_id)
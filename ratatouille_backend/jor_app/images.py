@@ -0,0 +1,168 @@
+"""
+Resized, web-optimized derivatives of uploaded images.
+
+For every ``Recipe.image``, ``Category.image`` and ``User.avatar`` a set of
+fixed-width WebP copies is written next to the originals under
+``derivatives/`` with a content-hashed file name, so they can be served
+with far-future cache headers.  The map of generated files is stored on
+the row (``image_variants`` / ``avatar_variants``) as::
+
+    {"source": "<original name>", "widths": {"320": "derivatives/...webp", ...}}
+
+Generation runs on a small background thread pool after the upload's
+transaction commits; ``manage.py generate_image_derivatives`` backfills
+existing media.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "WIDTHS": (160, 320, 640, 1280),
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "ASYNC": True,
+    "WORKERS": 2,
+}
+
+_executor = None
+
+
+def get_config(name):
+    return getattr(settings, "IMAGE_DERIVATIVES", {}).get(name, DEFAULTS[name])
+
+
+# 🔹 (model, image field, variants field)
+def image_fields():
+    from .models import Category, Recipe, User
+    return (
+        (Recipe, "image", "image_variants"),
+        (Category, "image", "image_variants"),
+        (User, "avatar", "avatar_variants"),
+    )
+
+
+def is_current(field_file, variants):
+    return bool(field_file) and (variants or {}).get("source") == field_file.name
+
+
+def generate_derivatives(field_file):
+    """Write the derivatives of ``field_file`` and return its variants map."""
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as fh:
+        content = fh.read()
+
+    digest = hashlib.sha1(content).hexdigest()[:16]
+    fmt = get_config("FORMAT")
+    extension = fmt.lower()
+    folder = field_file.name.rsplit("/", 1)[0] if "/" in field_file.name else "misc"
+
+    with Image.open(BytesIO(content)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+        widths = {}
+        for width in sorted(get_config("WIDTHS")):
+            # never upscale; the smallest width is always produced
+            if width > original.width and widths:
+                break
+            name = f"derivatives/{folder}/{digest}_{width}.{extension}"
+            if not storage.exists(name):
+                resized = original.copy()
+                resized.thumbnail((width, width * 10), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, fmt, quality=get_config("QUALITY"), method=6)
+                saved = storage.save(name, ContentFile(buffer.getvalue()))
+                if saved != name:
+                    # another worker wrote the same content-hashed file first
+                    storage.delete(saved)
+            widths[str(width)] = name
+
+    return {"source": field_file.name, "widths": widths}
+
+
+def refresh_derivatives(model, pk, image_field, variants_field, force=False):
+    """Generate derivatives for one row and store the map without firing signals."""
+    from .cache import response_cache
+    from .models import Category, Recipe, User
+
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+
+    field_file = getattr(instance, image_field)
+    variants = getattr(instance, variants_field)
+    if not field_file:
+        new_variants = {}
+    elif not force and is_current(field_file, variants):
+        return variants
+    else:
+        new_variants = generate_derivatives(field_file)
+
+    updates = {variants_field: new_variants}
+    if model is not User:
+        updates["updated_at"] = timezone.now()
+    model.objects.filter(pk=pk).update(**updates)
+
+    # the variants are part of the payload: refresh ETags and cached responses
+    if model is User:
+        Recipe.objects.filter(created_by_id=pk).update(updated_at=timezone.now())
+        response_cache.bump("recipes")
+    elif model is Category:
+        response_cache.bump("categories")
+    else:
+        response_cache.bump("recipes")
+    return new_variants
+
+
+def _run(model, pk, image_field, variants_field):
+    try:
+        refresh_derivatives(model, pk, image_field, variants_field)
+    except Exception:
+        logger.exception("Image derivatives failed for %s %s", model.__name__, pk)
+
+
+def _run_in_worker(*args):
+    # worker threads get their own DB connection; don't leak it
+    close_old_connections()
+    try:
+        _run(*args)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(instance, image_field, variants_field):
+    """Queue generation for ``instance`` once the current transaction commits."""
+    if not get_config("ENABLED"):
+        return
+    field_file = getattr(instance, image_field)
+    if is_current(field_file, getattr(instance, variants_field)):
+        return
+    if not field_file and not getattr(instance, variants_field):
+        return
+
+    args = (type(instance), instance.pk, image_field, variants_field)
+
+    def submit():
+        if not get_config("ASYNC"):
+            _run(*args)
+            return
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_config("WORKERS"), thread_name_prefix="image-derivatives"
+            )
+        _executor.submit(_run_in_worker, *args)
+
+    transaction.on_commit(submit)
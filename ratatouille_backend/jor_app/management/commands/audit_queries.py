@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.query_audit import audit, scenario_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the SQL of every API endpoint, EXPLAIN it, flag sequential scans and sorts "
+        "over --min-rows rows and propose indexes for jor_app.models (jor_app.query_audit)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-rows", type=int, default=1000,
+                            help="Flag scans and sorts touching more rows than this (default: 1000).")
+        parser.add_argument("--no-analyze", action="store_true",
+                            help="Plain EXPLAIN on PostgreSQL: estimates only, nothing is executed twice.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--only", action="append", choices=scenario_names(),
+                            help="Limit to these endpoints (repeatable).")
+        parser.add_argument("--show-sql", action="store_true", help="Print the SQL of every finding.")
+        parser.add_argument("--output", help="Write the full report to this JSON file.")
+        parser.add_argument("--fail-on-proposals", action="store_true",
+                            help="Exit non-zero when an index is proposed.")
+
+    def handle(self, *args, **options):
+        if options["min_rows"] < 0:
+            raise CommandError("--min-rows can't be negative")
+        try:
+            report = audit(
+                min_rows=options["min_rows"],
+                analyze=not options["no_analyze"],
+                seed=options["seed"],
+                only=options["only"],
+            )
+        except (ValueError, NotImplementedError) as exc:
+            raise CommandError(str(exc))
+
+        self.print_findings(report, options["show_sql"])
+        self.print_proposals(report["proposals"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if report["proposals"] and options["fail_on_proposals"]:
+            raise CommandError(f"{len(report['proposals'])} index(es) proposed")
+
+    def print_findings(self, report, show_sql):
+        meta = report["meta"]
+        self.stdout.write(
+            f"{meta['dataset']['recipes']} recipes, {meta['dataset']['ratings']} ratings on {meta['database']}"
+            f"{' (EXPLAIN ANALYZE)' if meta['analyze'] else ''}, flagging > {meta['min_rows']} rows"
+        )
+        self.stdout.write(f"{'endpoint':<24}{'status':>7}{'queries':>9}{'findings':>10}")
+        for name, row in report["endpoints"].items():
+            line = f"{name:<24}{row['status']:>7}{row['statements']:>9}{len(row['findings']):>10}"
+            self.stdout.write(self.style.WARNING(line) if row["findings"] else line)
+            for finding in row["findings"]:
+                note = (
+                    f" -> {finding['proposal']}" if "proposal" in finding
+                    else f" (has {finding['covered_by']})" if "covered_by" in finding else ""
+                )
+                self.stdout.write(f"    {finding['kind']:<9}{finding['rows']:>10} rows  {finding['plan']}{note}")
+                if show_sql:
+                    self.stdout.write(f"      {finding['sql']}")
+
+    def print_proposals(self, proposals):
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("\nNo indexes to propose."))
+            return
+        self.stdout.write("\nProposed indexes (add to Meta.indexes, then run makemigrations jor_app):")
+        for proposal in proposals:
+            self.stdout.write(
+                f"  # {proposal['model']}: {proposal['rows']} rows, {', '.join(proposal['endpoints'])}\n"
+                f"  models.Index(fields={proposal['fields']!r}, name={proposal['name']!r}),"
+            )
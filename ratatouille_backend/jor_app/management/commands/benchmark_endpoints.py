@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.benchmark import compare_results, run_benchmarks, scenario_names
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency percentiles, throughput and query counts of the public endpoints. "
+        "Write the results as JSON and optionally compare them with a baseline run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200,
+                            help="Timed requests per endpoint (default: 200).")
+        parser.add_argument("--warmup", type=int, default=20,
+                            help="Untimed requests per endpoint, used to count queries (default: 20).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--only", action="append", choices=scenario_names(),
+                            help="Limit to these endpoints (repeatable).")
+        parser.add_argument("--with-cache", action="store_true",
+                            help="Leave the response cache on (default: off, measures the DB path).")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Baseline JSON file from an earlier run.")
+        parser.add_argument("--threshold", type=float, default=0.10,
+                            help="Relative p50/p95 growth counted as a regression (default: 0.10).")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit non-zero when --compare finds a regression.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive")
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)
+
+        try:
+            results = run_benchmarks(
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                seed=options["seed"],
+                only=options["only"],
+                use_cache=options["with_cache"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.print_table(results)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.print_comparison(compare_results(baseline, results, options["threshold"]))
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{regressions} endpoint(s) regressed")
+
+    def print_table(self, results):
+        dataset = results["meta"]["dataset"]
+        self.stdout.write(
+            f"{dataset['recipes']} recipes, {dataset['users']} users, {dataset['ratings']} ratings "
+            f"on {results['meta']['database']}"
+        )
+        self.stdout.write(
+            f"{'endpoint':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'queries':>9}{'bytes':>9}"
+        )
+        for name, row in results["endpoints"].items():
+            self.stdout.write(
+                f"{name:<22}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+                f"{row['throughput_rps']:>9.0f}{row['queries']:>9}{row['response_bytes']:>9}"
+                + (f"  ({row['errors']} errors)" if row["errors"] else "")
+            )
+
+    def print_comparison(self, rows):
+        regressions = 0
+        self.stdout.write(f"\n{'endpoint':<22}{'p50 Δ':>9}{'p95 Δ':>9}{'queries':>10}")
+        for row in rows:
+            line = (
+                f"{row['endpoint']:<22}{row['p50_ms'][2]:>+9.0%}{row['p95_ms'][2]:>+9.0%}"
+                f"{'%s->%s' % row['queries']:>10}"
+            )
+            if row["regressions"]:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f"{line}  REGRESSION: {', '.join(row['regressions'])}"))
+            else:
+                self.stdout.write(line)
+        return regressions
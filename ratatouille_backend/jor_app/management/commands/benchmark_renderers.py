@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.benchmark import render_benchmark
+
+
+class Command(BaseCommand):
+    help = "Compare render time and payload size of the JSON/MessagePack renderers on recipe pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000],
+                            help="Recipes per page (default: 20 200 2000).")
+        parser.add_argument("--iterations", type=int, default=50,
+                            help="Timed renders per page and renderer (default: 50).")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or min(options["sizes"]) < 1:
+            raise CommandError("--iterations and --sizes must be positive")
+        try:
+            results = render_benchmark(sizes=options["sizes"], iterations=options["iterations"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"{'items':>6}  {'renderer':<10}{'p50 ms':>9}{'p95 ms':>9}{'bytes':>10}{'gzip':>9}")
+        for size, by_renderer in results["sizes"].items():
+            for name, row in by_renderer.items():
+                self.stdout.write(
+                    f"{size:>6}  {name:<10}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                    f"{row['bytes']:>10}{row['gzip_bytes']:>9}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.benchmark import similar_benchmark
+
+
+class Command(BaseCommand):
+    help = "Measure recall and latency of the similar-recipes LSH index against exact Jaccard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=200, help="Recipes to query (default: 200).")
+        parser.add_argument("--limit", type=int, default=10, help="Similar recipes per query (default: 10).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        if options["sample"] < 1 or options["limit"] < 1:
+            raise CommandError("--sample and --limit must be positive")
+        try:
+            results = similar_benchmark(sample=options["sample"], limit=options["limit"], seed=options["seed"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        meta = results["meta"]
+        self.stdout.write(
+            f"{meta['sample']} of {meta['recipes']} recipes, {meta['bands']} bands x {meta['rows']} rows "
+            f"on {meta['database']}"
+        )
+        self.stdout.write(f"recall@{meta['limit']}: {results['recall']}")
+        self.stdout.write(f"{'':<8}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+        for name in ("lsh", "exact"):
+            row = results[name]
+            self.stdout.write(f"{name:<8}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['mean_ms']:>9.2f}")
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.benchmark import dataset_sizes, flush_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset (recipes, ingredients, users, ratings, "
+        "wishlists) for 'manage.py benchmark_endpoints'. Use a dedicated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10_000,
+                            help="Number of recipes, 1k-1M (default: 10000).")
+        parser.add_argument("--users", type=int, help="Default: recipes / 5, at least 20.")
+        parser.add_argument("--ingredients", type=int, help="Default: recipes / 20, 30-5000.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--flush", action="store_true",
+                            help="Delete a previously generated dataset first.")
+
+    def handle(self, *args, **options):
+        if options["recipes"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--recipes and --batch-size must be positive")
+
+        started = time.monotonic()
+        if options["flush"]:
+            self.stdout.write(f"Flushed {flush_dataset()} row(s)")
+
+        sizes = dataset_sizes(options["recipes"], options["users"], options["ingredients"])
+        self.stdout.write(
+            f"Generating {sizes['recipes']} recipes / {sizes['users']} users / "
+            f"{sizes['ingredients']} ingredients with seed {options['seed']}"
+        )
+        counts = generate_dataset(
+            options["recipes"],
+            users=options["users"],
+            ingredients=options["ingredients"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        summary = ", ".join(f"{value} {key}" for key, value in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jor_app.images import image_fields, is_current, refresh_derivatives
+
+
+class Command(BaseCommand):
+    help = "Backfill resized WebP derivatives for recipe/category images and user avatars."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", choices=["recipe", "category", "user"], action="append",
+            help="Limit to these models (repeatable). Default: all.",
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Regenerate even when the stored derivatives match the current file.",
+        )
+
+    def handle(self, *args, model=None, force=False, **options):
+        started = time.monotonic()
+        for model_cls, image_field, variants_field in image_fields():
+            if model and model_cls._meta.model_name not in model:
+                continue
+
+            rows = (
+                model_cls.objects.exclude(**{image_field: ""})
+                .exclude(**{f"{image_field}__isnull": True})
+                .only("pk", image_field, variants_field)
+                .order_by("pk")
+            )
+            done = skipped = failed = 0
+            for instance in rows.iterator(chunk_size=500):
+                field_file = getattr(instance, image_field)
+                if not force and is_current(field_file, getattr(instance, variants_field)):
+                    skipped += 1
+                    continue
+                try:
+                    refresh_derivatives(model_cls, instance.pk, image_field, variants_field, force=force)
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{model_cls.__name__} {instance.pk}: {exc}")
+
+            self.stdout.write(
+                f"{model_cls.__name__}: {done} generated, {skipped} up to date, {failed} failed"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.1f}s"))
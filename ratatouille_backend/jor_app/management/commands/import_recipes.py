@@ -0,0 +1,239 @@
+"""
+Bulk import of recipes, their ingredients and nutrition.
+
+Input is streamed one record at a time, so memory is bounded by the batch
+size, not the file size.
+
+NDJSON, one object per line::
+
+    {"name": "Бууз", "description": "...", "image": "recipe_images/buuz.jpg",
+     "time_required": "1 цаг", "servings": 4, "cuisine": "Монгол",
+     "category": "Үндсэн хоол", "ingredients": ["мах", "гурил", "сонгино"],
+     "nutrition": {"calories": "350", "protein": "20", "fat": "15", "carbs": "30"}}
+
+CSV with a header row: the same keys, with ``ingredients`` separated by
+``|`` and nutrition as ``calories``/``protein``/``fat``/``carbs`` columns.
+
+Every batch is one transaction: categories and ingredients are resolved
+with one SELECT each (missing ones are bulk-created), then recipes, the
+recipe-ingredient through rows and nutrition rows are bulk-inserted.
+After each committed batch the number of consumed records is written to a
+checkpoint file; ``--resume`` skips that many records.
+"""
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from jor_app.cooking_time import parse_minutes
+from jor_app.models import Category, Ingredient, Nutrition, Recipe, User
+from jor_app.nutrition import normalize as normalize_nutrition
+from jor_app.signals import bulk_loaded
+
+NUTRITION_FIELDS = ("calories", "protein", "fat", "carbs")
+
+
+def read_ndjson(fh):
+    for line_no, line in enumerate(fh, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise CommandError(f"line {line_no}: invalid JSON ({exc})")
+        if not isinstance(record, dict):
+            raise CommandError(f"line {line_no}: expected a JSON object")
+        ingredients = record.get("ingredients")
+        # a bare string would be imported as one ingredient per character
+        if ingredients is not None and not (
+            isinstance(ingredients, list) and all(isinstance(name, str) for name in ingredients)
+        ):
+            raise CommandError(f"line {line_no}: 'ingredients' must be a list of strings")
+        yield record
+
+
+def read_csv(fh):
+    for row in csv.DictReader(fh):
+        record = dict(row)
+        record["ingredients"] = [
+            name for name in (record.get("ingredients") or "").split("|") if name.strip()
+        ]
+        nutrition = {key: record.pop(key) for key in NUTRITION_FIELDS if key in record}
+        if any(nutrition.values()):
+            record["nutrition"] = nutrition
+        yield record
+
+
+class Command(BaseCommand):
+    help = "Stream recipes from NDJSON/CSV into the database with batched bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or '-' for stdin.")
+        parser.add_argument("--format", choices=["ndjson", "csv"],
+                            help="Input format (default: from the file extension).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--user", help="Email of the user set as created_by.")
+        parser.add_argument("--checkpoint",
+                            help="Checkpoint file (default: <path>.checkpoint).")
+        parser.add_argument("--resume", action="store_true",
+                            help="Skip the records already committed according to the checkpoint.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "ndjson")
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        checkpoint = options["checkpoint"] or (None if path == "-" else f"{path}.checkpoint")
+        if options["resume"] and not checkpoint:
+            raise CommandError("--resume needs --checkpoint when reading stdin")
+
+        self.created_by = None
+        if options["user"]:
+            self.created_by = User.objects.filter(email=options["user"]).first()
+            if self.created_by is None:
+                raise CommandError(f"No user with email {options['user']}")
+
+        self.categories = {}
+        self.ingredients = {}
+
+        skip = self.read_checkpoint(checkpoint) if options["resume"] else 0
+        fh = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            records = read_csv(fh) if fmt == "csv" else read_ndjson(fh)
+            if skip:
+                self.stdout.write(f"Resuming after {skip} record(s)")
+                for _ in islice(records, skip):
+                    pass
+            self.run(records, batch_size, checkpoint, skip)
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+    def run(self, records, batch_size, checkpoint, done):
+        started = time.monotonic()
+        imported = 0
+        new_ids = []
+        try:
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                batch_started = time.monotonic()
+                try:
+                    ids = self.import_batch(batch)
+                except Exception as exc:
+                    raise CommandError(
+                        f"Batch starting at record {done + 1} failed and was rolled back: {exc}. "
+                        f"Fix the input and re-run with --resume."
+                    )
+                new_ids.extend(ids)
+                done += len(batch)
+                imported += len(batch)
+                self.write_checkpoint(checkpoint, done)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{done} records  (+{len(batch)} in {time.monotonic() - batch_started:.2f}s, "
+                    f"{imported / elapsed:.0f} rec/s overall)"
+                )
+        finally:
+            # committed batches stay committed even when a later one fails
+            self.after_import(new_ids)
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} recipe(s) in {elapsed:.1f}s ({rate:.0f} rec/s)"
+        ))
+
+    # 🔹 Batch
+
+    def resolve(self, model, cache, names):
+        """Map names to ids, bulk-creating the ones that don't exist yet."""
+        missing = {name for name in names if name not in cache}
+        if missing:
+            cache.update(model.objects.filter(name__in=missing).values_list("name", "id"))
+            to_create = [model(name=name) for name in missing if name not in cache]
+            if to_create:
+                model.objects.bulk_create(to_create, ignore_conflicts=True)
+                cache.update(
+                    model.objects.filter(name__in=[obj.name for obj in to_create])
+                    .values_list("name", "id")
+                )
+        return cache
+
+    def import_batch(self, batch):
+        for record in batch:
+            record["ingredients"] = [name.strip() for name in record.get("ingredients") or [] if name.strip()]
+            if record.get("category"):
+                record["category"] = record["category"].strip()
+
+        with transaction.atomic():
+            categories = self.resolve(
+                Category, self.categories, {r["category"] for r in batch if r.get("category")}
+            )
+            ingredients = self.resolve(
+                Ingredient, self.ingredients, {n for r in batch for n in r["ingredients"]}
+            )
+
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    name=record["name"],
+                    description=record.get("description") or "",
+                    image=record.get("image") or "",
+                    time_required=record.get("time_required") or "",
+                    time_minutes=parse_minutes(record.get("time_required")),
+                    servings=int(record.get("servings") or 1),
+                    cuisine=record.get("cuisine") or "",
+                    category_id=categories.get(record.get("category")),
+                    created_by=self.created_by,
+                )
+                for record in batch
+            ])
+
+            through = Recipe.ingredients.through
+            through.objects.bulk_create([
+                through(recipe_id=recipe.pk, ingredient_id=ingredients[name])
+                for recipe, record in zip(recipes, batch)
+                for name in dict.fromkeys(record["ingredients"])
+            ], ignore_conflicts=True)
+
+            Nutrition.objects.bulk_create([
+                normalize_nutrition(Nutrition(recipe_id=recipe.pk, **{
+                    key: str(record["nutrition"].get(key) or "") for key in NUTRITION_FIELDS
+                }))
+                for recipe, record in zip(recipes, batch)
+                if record.get("nutrition")
+            ])
+        return [recipe.pk for recipe in recipes]
+
+    def after_import(self, recipe_ids):
+        # bumps the shared index versions: running workers rebuild on their next search
+        bulk_loaded(recipe_ids)
+        if recipe_ids:
+            self.stdout.write("Run 'manage.py generate_image_derivatives' for the new images.")
+
+    # 🔹 Checkpoint
+
+    def read_checkpoint(self, checkpoint):
+        try:
+            with open(checkpoint) as fh:
+                return int(fh.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, checkpoint, done):
+        if not checkpoint:
+            return
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, "w") as fh:
+            fh.write(str(done))
+        os.replace(tmp, checkpoint)
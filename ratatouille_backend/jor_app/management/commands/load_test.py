@@ -0,0 +1,133 @@
+"""
+Closed-loop HTTP load test against a running server.
+
+``--concurrency`` clients each hold a keep-alive connection and send the
+next request as soon as the previous one returns, for ``--duration``
+seconds per path.  Compare the sync (WSGI/DRF) and async (``/api/async/``)
+read paths under the same worker budget, e.g.::
+
+    gunicorn ratatouille_backend.wsgi -w 1 --threads 8 -b 127.0.0.1:8000
+    uvicorn ratatouille_backend.asgi:application --workers 1 --port 8001
+
+    manage.py load_test --url http://127.0.0.1:8000 --path /api/recipes/
+    manage.py load_test --url http://127.0.0.1:8001 --path /api/recipes/ --path /api/async/recipes/
+
+Run it against a database with realistic data
+(``manage.py generate_benchmark_data``) and with the response cache off,
+or the sync path is mostly measuring cache hits.
+"""
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app.benchmark import percentile
+
+DEFAULT_PATHS = (
+    "/api/recipes/",
+    "/api/async/recipes/",
+    "/api/categories/",
+    "/api/async/categories/",
+)
+
+
+class Client(threading.Thread):
+    def __init__(self, target, path, headers, deadline):
+        super().__init__(daemon=True)
+        self.target = target
+        self.path = path
+        self.headers = headers
+        self.deadline = deadline
+        self.timings = []
+        self.errors = 0
+
+    def connect(self):
+        cls = http.client.HTTPSConnection if self.target.scheme == "https" else http.client.HTTPConnection
+        return cls(self.target.hostname, self.target.port, timeout=30)
+
+    def run(self):
+        conn = self.connect()
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                conn.request("GET", self.path, headers=self.headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    self.errors += 1
+                else:
+                    self.timings.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = self.connect()
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = "Drive GET endpoints of a running server with concurrent keep-alive clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL.")
+        parser.add_argument("--path", action="append",
+                            help=f"Path to load, repeatable (default: {', '.join(DEFAULT_PATHS)}).")
+        parser.add_argument("-c", "--concurrency", type=int, default=32)
+        parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds per path.")
+        parser.add_argument("--token", help="JWT access token sent as 'Authorization: Bearer'.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        target = urlsplit(options["url"])
+        if target.scheme not in ("http", "https") or not target.hostname:
+            raise CommandError("--url must be an http(s) URL")
+        if options["concurrency"] < 1 or options["duration"] <= 0:
+            raise CommandError("--concurrency and --duration must be positive")
+
+        headers = {"Accept": "application/json", "Connection": "keep-alive"}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+
+        self.stdout.write(
+            f"{options['concurrency']} clients, {options['duration']:g}s per path against {options['url']}"
+        )
+        self.stdout.write(f"{'path':<32}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+        results = {}
+        for path in options["path"] or DEFAULT_PATHS:
+            row = results[path] = self.load(target, path, headers, options["concurrency"], options["duration"])
+            self.stdout.write(
+                f"{path:<32}{row['throughput_rps']:>9.0f}{row['p50_ms'] or 0:>9.1f}"
+                f"{row['p95_ms'] or 0:>9.1f}{row['p99_ms'] or 0:>9.1f}{row['errors']:>8}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump({
+                    "url": options["url"],
+                    "concurrency": options["concurrency"],
+                    "duration": options["duration"],
+                    "paths": results,
+                }, fh, indent=2)
+
+    def load(self, target, path, headers, concurrency, duration):
+        deadline = time.monotonic() + duration
+        clients = [Client(target, path, headers, deadline) for _ in range(concurrency)]
+        started = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - started
+
+        timings = sorted(t for client in clients for t in client.timings)
+        ms = lambda value: round(value * 1000, 2) if value is not None else None
+        return {
+            "requests": len(timings),
+            "errors": sum(client.errors for client in clients),
+            "throughput_rps": round(len(timings) / elapsed, 1),
+            "p50_ms": ms(percentile(timings, 0.50)),
+            "p95_ms": ms(percentile(timings, 0.95)),
+            "p99_ms": ms(percentile(timings, 0.99)),
+        }
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app import similar
+
+
+class Command(BaseCommand):
+    help = "Recompute the MinHash signatures and LSH buckets of every recipe (jor_app.similar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        count = similar.rebuild(batch_size=options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} recipes"))
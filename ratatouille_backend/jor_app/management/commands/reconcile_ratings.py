@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from jor_app.cache import response_cache
+from jor_app.models import Recipe, RecipeRating
+
+
+class Command(BaseCommand):
+    help = "Repair drift between Recipe.rating/rating_sum/rating_count and the RecipeRating table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report recipes whose stored aggregates are wrong.",
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        actual = {
+            row["recipe"]: (row["s"], row["c"])
+            for row in RecipeRating.objects.order_by().values("recipe")
+            .annotate(s=Sum("rating"), c=Count("id"))
+        }
+
+        drifted = []
+        stored = Recipe.objects.values_list("id", "rating_sum", "rating_count")
+        for recipe_id, rating_sum, rating_count in stored.iterator(chunk_size=5000):
+            if actual.get(recipe_id, (0, 0)) != (rating_sum, rating_count):
+                drifted.append(recipe_id)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Rating aggregates are consistent."))
+            return
+
+        self.stdout.write(f"{len(drifted)} recipe(s) out of sync: {drifted[:20]}")
+        if dry_run:
+            return
+
+        for start in range(0, len(drifted), 1000):
+            RecipeRating.objects.refresh_aggregates(drifted[start:start + 1000])
+        response_cache.bump("recipes")  # queryset.update() sends no signal
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drifted)} recipe(s)."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app import ranking
+from jor_app.cache import response_cache
+from jor_app.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Recompute Recipe.rank_score of every recipe (jor_app.ranking)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        # short statements: rate() locks single rows meanwhile
+        ids = list(Recipe.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(ids), batch_size):
+            ranking.refresh(Recipe.objects.filter(pk__in=ids[start:start + batch_size]))
+        response_cache.bump("recipes")  # queryset.update() sends no signal
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {len(ids)} recipes"))
@@ -0,0 +1,73 @@
+import json
+import resource
+import sys
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jor_app import recommender
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the rating matrix factorisation, write every user's top-N to the "
+        "UserRecommendation serving table and report time and memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, help="Latent factors (default: RECOMMENDATIONS['FACTORS']).")
+        parser.add_argument("--iterations", type=int, help="ALS iterations.")
+        parser.add_argument("--reg", type=float, help="Factor regularisation.")
+        parser.add_argument("--top-n", type=int, help="Recommendations stored per user.")
+        parser.add_argument("--holdout", type=float, default=0.0,
+                            help="Fraction of ratings kept out of training to report holdout RMSE.")
+        parser.add_argument("--seed", type=int)
+        parser.add_argument("--dry-run", action="store_true", help="Train and report; don't write.")
+        parser.add_argument("--output", help="Write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        if recommender.np is None:
+            raise CommandError("NumPy is required: pip install numpy")
+        if not 0 <= options["holdout"] < 1:
+            raise CommandError("--holdout must be in [0, 1)")
+
+        tracemalloc.start()
+        try:
+            report = recommender.run(
+                factors=options["factors"],
+                iterations=options["iterations"],
+                reg=options["reg"],
+                top_n=options["top_n"],
+                holdout=options["holdout"],
+                seed=options["seed"],
+                write=not options["dry_run"],
+                log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        # NumPy reports its buffers to tracemalloc; ru_maxrss is KiB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_traced_mb"] = round(peak / 2**20, 1)
+        report["max_rss_mb"] = round(max_rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+        self.stdout.write(
+            f"{report['users']} users x {report['recipes']} recipes, {report['ratings']} ratings, "
+            f"{report['factors']} factors"
+        )
+        self.stdout.write(", ".join(f"{name} {value:.2f}s" for name, value in report["seconds"].items()))
+        self.stdout.write(f"peak traced {report['peak_traced_mb']} MB, max RSS {report['max_rss_mb']} MB")
+        self.stdout.write(f"train RMSE {report['train_rmse']}")
+        if "holdout_rmse" in report:
+            self.stdout.write(
+                f"holdout RMSE {report['holdout_rmse']} (biases only {report['holdout_rmse_biases_only']})"
+            )
+        if "written" in report:
+            self.stdout.write(self.style.SUCCESS(f"Wrote recommendations for {report['written']} users"))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
@@ -0,0 +1,346 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, under the resolved view
+name (``recipe-list``, ``my_wishlist``...):
+
+* a latency histogram,
+* the number and total time of DB queries,
+* the response size,
+* response-cache hits and misses (reported by ``jor_app.cache``).
+
+Query counting uses a connection ``execute_wrapper`` that is installed
+once per DB connection and adds to the stats of the current request,
+which is found through a ``ContextVar``. That also covers queries the
+async ORM runs in worker threads.
+
+Each process aggregates in memory under a lock.  With several worker
+processes set ``METRICS["DIR"]``: every process periodically writes its
+counters to ``<DIR>/metrics_<pid>.json``, and the scrape endpoint sums
+all files, so whichever worker answers the scrape reports the totals of
+all of them (at most ``FLUSH_INTERVAL`` seconds stale).  Empty the
+directory when the service is (re)deployed, not while it runs, or the
+counters go backwards.
+
+The scrape endpoint answers only a bearer token equal to ``TOKEN`` or a
+client address in ``ALLOWED_IPS`` (addresses or networks; loopback by
+default), and 404 to everyone else.  ``REMOTE_ADDR`` is the peer of the
+app server, so behind a proxy list the scraper's path, not the proxy.
+"""
+import atexit
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DIR": None,
+    "FLUSH_INTERVAL": 5,
+    "BUCKETS": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    "TOKEN": None,
+    "ALLOWED_IPS": ("127.0.0.1", "::1"),
+}
+
+PREFIX = "ratatouille"
+
+
+def get_config(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+# 🔹 Hooks
+
+def count_queries(execute, sql, params, many, context):
+    """DB ``execute_wrapper``; a no-op outside a measured request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+def install_query_counter(connection):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def record_cache_lookup(hit):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+# 🔹 Registry
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+        self._requests = {}   # (view, method, status) -> count
+        self._latency = {}    # (view, method) -> [bucket counts..., +Inf, sum]
+        self._db = {}         # (view, method) -> [queries, seconds]
+        self._bytes = {}      # (view, method) -> bytes
+        self._cache = {}      # (view, result) -> count
+
+    def observe(self, view, method, status, seconds, stats, size):
+        buckets = get_config("BUCKETS")
+        with self._lock:
+            if os.getpid() != self._pid:
+                # forked after import: don't report the parent's counters twice
+                self._reset()
+
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            key = (view, method)
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if seconds <= bound:
+                    latency[i] += 1
+            latency[-2] += 1
+            latency[-1] += seconds
+
+            db = self._db.setdefault(key, [0, 0.0])
+            db[0] += stats.queries
+            db[1] += stats.query_seconds
+            self._bytes[key] = self._bytes.get(key, 0) + size
+            for result, count in (("hit", stats.cache_hits), ("miss", stats.cache_misses)):
+                if count:
+                    self._cache[(view, result)] = self._cache.get((view, result), 0) + count
+
+            due = time.monotonic() - self._last_flush >= get_config("FLUSH_INTERVAL")
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": list(get_config("BUCKETS")),
+                "requests": [[*key, value] for key, value in self._requests.items()],
+                "latency": [[*key, value] for key, value in self._latency.items()],
+                "db": [[*key, value] for key, value in self._db.items()],
+                "bytes": [[*key, value] for key, value in self._bytes.items()],
+                "cache": [[*key, value] for key, value in self._cache.items()],
+            }
+
+    # 🔹 Multi-process
+
+    def flush(self):
+        """Write this process's counters to METRICS["DIR"], if configured."""
+        directory = get_config("DIR")
+        with self._lock:
+            self._last_flush = time.monotonic()
+        if not directory:
+            return
+        data = self.snapshot()
+        path = os.path.join(directory, f"metrics_{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp, "w") as fh:
+                json.dump(data, fh)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # metrics must never break a request
+
+    def collect(self):
+        """Snapshots of every process: this one fresh, the others from METRICS["DIR"]."""
+        directory = get_config("DIR")
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not (name.startswith("metrics_") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue  # being replaced right now; picked up next scrape
+        return snapshots or [self.snapshot()]
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+# 🔹 Exposition
+
+def _merge(snapshots):
+    merged = {"requests": {}, "latency": {}, "db": {}, "bytes": {}, "cache": {}}
+    buckets = snapshots[0]["buckets"]
+    for snapshot in snapshots:
+        if snapshot["buckets"] != buckets:
+            continue  # written with different BUCKETS settings; can't be summed
+        for section, total in merged.items():
+            for *key, value in snapshot[section]:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = total.setdefault(key, [0] * len(value))
+                    total[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    total[key] = total.get(key, 0) + value
+    return buckets, merged
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def scrape_allowed(request):
+    """Whether ``request`` may read the metrics: the ``TOKEN`` or an ``ALLOWED_IPS`` address."""
+    token = get_config("TOKEN")
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].encode(), token.encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(net, strict=False) for net in get_config("ALLOWED_IPS"))
+
+
+def render(snapshots=None):
+    """All metrics in Prometheus text exposition format 0.0.4."""
+    buckets, data = _merge(snapshots or registry.collect())
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+    family("http_requests_total", "counter", "Requests by view, method and status.")
+    for (view, method, status), count in sorted(data["requests"].items()):
+        lines.append(f"{PREFIX}_http_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+    family("http_request_duration_seconds", "histogram", "Request latency by view.")
+    for (view, method), values in sorted(data["latency"].items()):
+        for bound, count in zip(buckets, values):
+            labels = _labels(view=view, method=method, le=_number(float(bound)))
+            lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{labels} {count}")
+        labels = _labels(view=view, method=method, le="+Inf")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_bucket{labels} {values[-2]}")
+        labels = _labels(view=view, method=method)
+        lines.append(f"{PREFIX}_http_request_duration_seconds_sum{labels} {_number(values[-1])}")
+        lines.append(f"{PREFIX}_http_request_duration_seconds_count{labels} {values[-2]}")
+
+    family("db_queries_total", "counter", "DB queries run by view.")
+    for (view, method), (queries, _) in sorted(data["db"].items()):
+        lines.append(f"{PREFIX}_db_queries_total{_labels(view=view, method=method)} {queries}")
+
+    family("db_query_duration_seconds_total", "counter", "Time spent in DB queries by view.")
+    for (view, method), (_, seconds) in sorted(data["db"].items()):
+        lines.append(
+            f"{PREFIX}_db_query_duration_seconds_total{_labels(view=view, method=method)} {_number(float(seconds))}"
+        )
+
+    family("http_response_bytes_total", "counter", "Response body bytes by view.")
+    for (view, method), size in sorted(data["bytes"].items()):
+        lines.append(f"{PREFIX}_http_response_bytes_total{_labels(view=view, method=method)} {size}")
+
+    family("response_cache_lookups_total", "counter", "Response cache lookups by view and result.")
+    for (view, result), count in sorted(data["cache"].items()):
+        lines.append(f"{PREFIX}_response_cache_lookups_total{_labels(view=view, result=result)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+# 🔹 Middleware
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"  # 404s are not labelled by path: unbounded cardinality
+    return match.view_name or match.route or "unnamed"
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_config("ENABLED")
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def record(self, request, response, seconds, stats):
+        if response.streaming:
+            size = int(response.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        registry.observe(view_name(request), request.method, response.status_code, seconds, stats, size)
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    RecipeRating = apps.get_model('jor_app', 'RecipeRating')
+
+    stats = RecipeRating.objects.filter(recipe=models.OuterRef('pk')).order_by().values('recipe')
+    Recipe.objects.update(
+        rating_sum=Coalesce(models.Subquery(stats.annotate(s=models.Sum('rating')).values('s')), 0),
+        rating_count=Coalesce(models.Subquery(stats.annotate(c=models.Count('id')).values('c')), 0),
+        rating=Coalesce(
+            models.Subquery(stats.annotate(a=Cast(models.Avg('rating'), models.FloatField())).values('a')),
+            0.0,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0003_remove_recipe_rating_remove_recipe_rating_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['rating', 'created_at', 'id'], name='recipe_rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['rating', 'id'], name='recipe_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_gin'),
+    django.contrib.postgres.indexes.GinIndex(fields=['name'], name='recipe_name_trgm', opclasses=['gin_trgm_ops']),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN/trigram only exist on PostgreSQL; other backends use the
+    # unindexed fallback in jor_app.text_search.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Recipe, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Recipe, index)
+
+
+def backfill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    Recipe.objects.update(
+        search_vector=SearchVector('name', weight='A', config='simple')
+        + SearchVector('cuisine', weight='B', config='simple')
+        + SearchVector('description', weight='C', config='simple')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0006_image_variants'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='recipe', index=index) for index in SEARCH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_indexes, drop_search_indexes),
+            ],
+        ),
+    ]
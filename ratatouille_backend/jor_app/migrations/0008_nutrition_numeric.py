@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+from jor_app.migrations._frozen_nutrition import normalize
+
+
+def parse_nutrition_text(apps, schema_editor):
+    Nutrition = apps.get_model('jor_app', 'Nutrition')
+    rows = Nutrition.objects.order_by('pk').only('pk', 'calories', 'protein', 'fat', 'carbs')
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(normalize(row))
+        if len(batch) == 2000:
+            Nutrition.objects.bulk_update(batch, ['calories_kcal', 'protein_g', 'fat_g', 'carbs_g'])
+            batch = []
+    Nutrition.objects.bulk_update(batch, ['calories_kcal', 'protein_g', 'fat_g', 'carbs_g'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nutrition',
+            name='calories_kcal',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutrition',
+            name='carbs_g',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutrition',
+            name='fat_g',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='nutrition',
+            name='protein_g',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(parse_nutrition_text, migrations.RunPython.noop),
+    ]
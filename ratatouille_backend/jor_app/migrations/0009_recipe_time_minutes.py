@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+from jor_app.migrations._frozen_cooking_time import parse_minutes
+
+
+def parse_time_required(apps, schema_editor):
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    rows = Recipe.objects.order_by('pk').only('pk', 'time_required')
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        row.time_minutes = parse_minutes(row.time_required)
+        batch.append(row)
+        if len(batch) == 2000:
+            Recipe.objects.bulk_update(batch, ['time_minutes'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['time_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0008_nutrition_numeric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='time_minutes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(parse_time_required, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_minutes', 'id'], name='recipe_time_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+def drop_duplicate_wishlist_rows(apps, schema_editor):
+    # keep the oldest row of every (user, recipe) pair
+    Wishlist = apps.get_model('jor_app', 'Wishlist')
+    keep = (
+        Wishlist.objects.order_by().values('user', 'recipe')
+        .annotate(keep=models.Min('id')).values('keep')
+    )
+    Wishlist.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0009_recipe_time_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_wishlist_rows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='wishlist',
+            unique_together={('user', 'recipe')},
+        ),
+    ]
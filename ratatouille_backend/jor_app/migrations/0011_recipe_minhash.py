@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:42
+
+import hashlib
+import random
+from array import array
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the jor_app.similar hashing this index was built with.
+# BANDS, ROWS and SEED stay settings: the runtime code must read back
+# what this migration wrote.
+DEFAULTS = {'BANDS': 42, 'ROWS': 3, 'SEED': 1}
+PRIME = (1 << 61) - 1
+
+
+def get_config(name):
+    return getattr(settings, 'SIMILAR_RECIPES', {}).get(name, DEFAULTS[name])
+
+
+def signature(ingredient_ids, params):
+    return [min((a * x + b) % PRIME for x in ingredient_ids) for a, b in params]
+
+
+def band_keys(sig, rows):
+    keys = []
+    for band in range(len(sig) // rows):
+        raw = f'{band}:' + ','.join(map(str, sig[band * rows:(band + 1) * rows]))
+        digest = hashlib.blake2b(raw.encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def pack(sig):
+    return array('q', sig).tobytes()
+
+
+def build_index(apps, schema_editor):
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    RecipeMinHash = apps.get_model('jor_app', 'RecipeMinHash')
+    RecipeLSHBucket = apps.get_model('jor_app', 'RecipeLSHBucket')
+
+    sets = {}
+    rows = Recipe.ingredients.through.objects.values_list('recipe_id', 'ingredient_id')
+    for recipe_id, ingredient_id in rows.iterator(chunk_size=5000):
+        sets.setdefault(recipe_id, set()).add(ingredient_id)
+
+    rows = get_config('ROWS')
+    rng = random.Random(get_config('SEED'))
+    params = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(get_config('BANDS') * rows)]
+
+    items = list(sets.items())
+    for start in range(0, len(items), 2000):
+        signatures, buckets = [], []
+        for recipe_id, ingredient_ids in items[start:start + 2000]:
+            sig = signature(ingredient_ids, params)
+            signatures.append(RecipeMinHash(recipe_id=recipe_id, signature=pack(sig)))
+            buckets.extend(RecipeLSHBucket(recipe_id=recipe_id, key=key) for key in band_keys(sig, rows))
+        RecipeMinHash.objects.bulk_create(signatures)
+        RecipeLSHBucket.objects.bulk_create(buckets, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0010_wishlist_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeMinHash',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='minhash', serialize=False, to='jor_app.recipe')),
+                ('signature', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='jor_app.recipe')),
+            ],
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0011_recipe_minhash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendations', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_ids', models.BinaryField()),
+                ('scores', models.BinaryField()),
+                ('trained_at', models.DateTimeField()),
+            ],
+        ),
+    ]
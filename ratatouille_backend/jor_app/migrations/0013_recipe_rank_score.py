@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:57
+
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, Func, Value
+
+# Frozen copy of the jor_app.ranking score this column was backfilled with.
+# The RANKING settings stay settings, like at runtime.
+DEFAULTS = {
+    'PRIOR_MEAN': 3.0,
+    'PRIOR_WEIGHT': 5,
+    'EPOCH': datetime(2025, 1, 1, tzinfo=timezone.utc),
+    'DAYS_PER_STAR': 730,
+}
+
+
+def get_config(name):
+    return getattr(settings, 'RANKING', {}).get(name, DEFAULTS[name])
+
+
+class Epoch(Func):
+    output_field = FloatField()
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)::double precision'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)', **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='UNIX_TIMESTAMP(%(expressions)s)', **extra_context)
+
+
+def backfill(apps, schema_editor):
+    weight, mean = get_config('PRIOR_WEIGHT'), get_config('PRIOR_MEAN')
+    score = ExpressionWrapper(
+        (Value(float(weight * mean)) + F('rating_sum')) / (Value(float(weight)) + F('rating_count'))
+        + (Epoch(F('created_at')) - Value(get_config('EPOCH').timestamp()))
+        / Value(get_config('DAYS_PER_STAR') * 86400.0),
+        output_field=FloatField(),
+    )
+    apps.get_model('jor_app', 'Recipe').objects.update(rank_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0012_user_recommendation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_rating_created_idx',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rank_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['rank_score', 'id'], name='recipe_rank_idx'),
+        ),
+    ]
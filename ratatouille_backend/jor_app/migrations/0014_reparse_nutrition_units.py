@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:02
+
+from django.db import migrations
+
+from jor_app.migrations._frozen_nutrition import normalize
+
+NUMERIC_FIELDS = ['calories_kcal', 'protein_g', 'fat_g', 'carbs_g']
+
+
+def reparse_nutrition_text(apps, schema_editor):
+    # unknown unit words used to be read as the canonical unit ("20 ширхэг" -> 20 g)
+    Nutrition = apps.get_model('jor_app', 'Nutrition')
+    rows = Nutrition.objects.order_by('pk').only('pk', 'calories', 'protein', 'fat', 'carbs')
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(normalize(row))
+        if len(batch) == 2000:
+            Nutrition.objects.bulk_update(batch, NUMERIC_FIELDS)
+            batch = []
+    Nutrition.objects.bulk_update(batch, NUMERIC_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0013_recipe_rank_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_nutrition_text, migrations.RunPython.noop),
+    ]
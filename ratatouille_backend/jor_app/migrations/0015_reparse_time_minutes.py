@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations
+
+from jor_app.migrations._frozen_cooking_time import parse_minutes
+
+
+def reparse_time_required(apps, schema_editor):
+    # totals over MAX_MINUTES and "1.5.5"-style typos are now None
+    Recipe = apps.get_model('jor_app', 'Recipe')
+    rows = Recipe.objects.order_by('pk').only('pk', 'time_required', 'time_minutes')
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        minutes = parse_minutes(row.time_required)
+        if minutes != row.time_minutes:
+            row.time_minutes = minutes
+            batch.append(row)
+        if len(batch) == 2000:
+            Recipe.objects.bulk_update(batch, ['time_minutes'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['time_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0014_reparse_nutrition_units'),
+    ]
+
+    operations = [
+        migrations.RunPython(reparse_time_required, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0015_reparse_time_minutes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['created_at', 'id'], name='recipe_created_idx'),
+        ),
+    ]
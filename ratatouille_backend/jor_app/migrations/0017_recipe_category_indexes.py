@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0016_recipe_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', 'rank_score', 'id'], name='recipe_category_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='recipe_category_created_idx'),
+        ),
+    ]
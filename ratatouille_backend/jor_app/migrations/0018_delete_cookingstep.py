@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jor_app', '0017_recipe_category_indexes'),
+    ]
+
+    # CookingStep was commented out of models.py before the rating work; the
+    # table goes in a migration of its own so it can be reviewed and rolled back
+    operations = [
+        migrations.DeleteModel(
+            name='CookingStep',
+        ),
+    ]
@@ -0,0 +1,86 @@
+"""
+Frozen copy of ``jor_app.cooking_time`` for the data migrations 0009 and
+0015.
+
+Migrations must do the same thing on a fresh database years from now, so
+they don't import live app code.  Never edit this file: a parser change
+gets a new frozen copy and a new data migration.
+"""
+import math
+import re
+
+# unit -> minutes.  Short units must match exactly; longer ones also match
+# as a prefix, for plurals and Mongolian case endings ("цагийн", "минутын").
+UNITS = {
+    "m": 1, "м": 1, "min": 1, "mins": 1, "мин": 1, "минут": 1, "minute": 1,
+    "h": 60, "ц": 60, "hr": 60, "hrs": 60, "цаг": 60, "hour": 60,
+    "d": 1440, "day": 1440, "өдөр": 1440, "өдр": 1440, "хоног": 1440,
+    "s": 1 / 60, "с": 1 / 60, "sec": 1 / 60, "сек": 1 / 60, "second": 1 / 60,
+}
+PREFIX_UNITS = sorted((unit for unit in UNITS if len(unit) >= 3), key=len, reverse=True)
+WORDS = {"хагас": 0.5, "half": 0.5}
+MAX_MINUTES = 30 * 1440
+
+# "1 1/2", "1/2", or a decimal with one separator at most: "1.5.5" is no number at all
+FRACTION = r"(?<![\d.,/])(?:\d+\s+)?\d+/\d+(?![.,/]?\d)"
+DECIMAL = r"(?<![\d.,/])\d+(?:[.,]\d+)?(?![.,/]?\d)"
+NUMBER = rf"{FRACTION}|{DECIMAL}"
+# Mongolian ablative ("-аас": from), the lower end of a range
+ABLATIVE = ("аас", "ээс", "оос", "өөс")
+CLOCK_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+PART_RE = re.compile(
+    rf"(?P<number>{NUMBER}|{'|'.join(WORDS)})(?:\s*[-–]\s*(?P<high>{NUMBER}))?"
+    rf"\s*(?P<unit>[^\W\d_]*)(?P<ablative>-г?(?:{'|'.join(ABLATIVE)}))?"
+)
+
+
+def _number(text):
+    if text in WORDS:
+        return WORDS[text]
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = map(int, fraction.split("/"))
+        if not denominator:
+            return None
+        return int(whole or 0) + numerator / denominator
+    return float(text.replace(",", "."))
+
+
+def _unit_minutes(word):
+    if word in UNITS:
+        return UNITS[word]
+    for prefix in PREFIX_UNITS:
+        if word.startswith(prefix):
+            return UNITS[prefix]
+    return None
+
+
+def parse_minutes(text):
+    """Total minutes in ``text`` as an int up to ``MAX_MINUTES``, or None."""
+    if not text:
+        return None
+    text = str(text).casefold()
+
+    clock = CLOCK_RE.match(text)
+    if clock:
+        return int(clock[1]) * 60 + int(clock[2])
+
+    total = low = None
+    for part in PART_RE.finditer(text):
+        value = _number(part["high"] or part["number"])
+        word = part["unit"]
+        is_from = bool(part["ablative"]) or word.endswith(ABLATIVE)
+        if word.lstrip("г") in ABLATIVE:  # "10аас": a bare number
+            word = ""
+        unit = _unit_minutes(word) if word else 1
+        if value is None or unit is None:
+            continue  # "2 servings", "3 ширхэг": not a duration
+        total = (total or 0) + value * unit
+        if is_from:
+            # what came so far is the lower end; the upper end follows
+            low, total = total, None
+    if total is None:
+        total = low  # "30 минутаас": nothing after the lower end
+    if total is None or total > MAX_MINUTES:
+        return None
+    return math.ceil(total)
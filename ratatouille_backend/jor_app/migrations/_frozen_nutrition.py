@@ -0,0 +1,65 @@
+"""
+Frozen copy of ``jor_app.nutrition`` for the data migrations 0008 and 0014.
+
+Migrations must do the same thing on a fresh database years from now, so
+they don't import live app code.  Never edit this file: a parser change
+gets a new frozen copy and a new data migration.
+"""
+import re
+
+# text field -> (numeric field, kind)
+FIELDS = {
+    "calories": ("calories_kcal", "energy"),
+    "protein": ("protein_g", "mass"),
+    "fat": ("fat_g", "mass"),
+    "carbs": ("carbs_g", "mass"),
+}
+
+# unit -> (kind, factor to the canonical unit)
+UNITS = {
+    "kcal": ("energy", 1), "ккал": ("energy", 1), "кал": ("energy", 1), "cal": ("energy", 1),
+    "calories": ("energy", 1), "калори": ("energy", 1),
+    "kj": ("energy", 1 / 4.184), "кж": ("energy", 1 / 4.184),
+    "g": ("mass", 1), "gr": ("mass", 1), "gram": ("mass", 1), "grams": ("mass", 1),
+    "г": ("mass", 1), "гр": ("mass", 1), "грам": ("mass", 1), "грамм": ("mass", 1),
+    "mg": ("mass", 0.001), "мг": ("mass", 0.001),
+    "mcg": ("mass", 0.000001), "μg": ("mass", 0.000001), "мкг": ("mass", 0.000001),
+    "kg": ("mass", 1000), "кг": ("mass", 1000),
+    "oz": ("mass", 28.3495), "lb": ("mass", 453.592),
+}
+
+QUANTITY_RE = re.compile(
+    r"(?P<low>\d+(?:[.,]\d+)?)(?:\s*[-–]\s*(?P<high>\d+(?:[.,]\d+)?))?\s*(?P<unit>[^\W\d_]+)?"
+)
+
+
+def parse_quantity(text, kind):
+    """
+    The first quantity in ``text`` in the canonical unit of ``kind``
+    ("energy": kcal, "mass": g), or None.  A range ("300-350") gives its
+    midpoint; a unit of the other kind, or a word that is not a unit,
+    gives None.  A bare number is taken to be in the canonical unit.
+    """
+    if not text:
+        return None
+    match = QUANTITY_RE.search(str(text).casefold())
+    if match is None:
+        return None
+    value = float(match["low"].replace(",", "."))
+    if match["high"]:
+        value = (value + float(match["high"].replace(",", "."))) / 2
+
+    unit = match["unit"]
+    if unit:
+        unit_kind, factor = UNITS.get(unit, (None, None))
+        if unit_kind != kind:
+            return None
+        value *= factor
+    return round(value, 2)
+
+
+def normalize(nutrition):
+    """Set the numeric columns of a ``Nutrition`` instance from its text fields."""
+    for text_field, (numeric_field, kind) in FIELDS.items():
+        setattr(nutrition, numeric_field, parse_quantity(getattr(nutrition, text_field), kind))
+    return nutrition
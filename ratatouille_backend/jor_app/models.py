@@ -1,4 +1,11 @@
-from django.db import models
+from array import array
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce, Now
+
+from . import ranking
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 
@@ -23,6 +30,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(max_length=50, unique=True)
     email = models.EmailField(unique=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)  # jor_app.images
     created_at = models.DateTimeField(auto_now_add=True)
 
     is_active = models.BooleanField(default=True)
@@ -40,6 +48,8 @@ class Category(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='category_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # jor_app.images
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -49,22 +59,102 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=50, unique=True)
     number = models.CharField(max_length=100, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='ingredients')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
 # 🔹 Жор
+# RecipeSerializer field -> the Recipe column it reads, for the wide columns
+# worth deferring when a ``?fields=`` request leaves them out
+RECIPE_FIELD_COLUMNS = {
+    "name": "name",
+    "description": "description",
+    "image": "image",
+    "images": "image_variants",
+    "time_required": "time_required",
+    "cuisine": "cuisine",
+}
+
+
+def with_recipe_related(queryset, prefix="", fields=None, expand=()):
+    """
+    Load everything RecipeSerializer reads in a fixed number of queries.
+
+    ``prefix`` is the path to the recipe when serializing through another
+    model, e.g. ``"recipe__"`` for a Wishlist queryset.
+
+    ``fields``/``expand`` are the sparse fieldset of the request (see
+    SparseFieldsMixin): relations that aren't serialized are neither joined
+    nor prefetched, and the wide columns that aren't are deferred.
+    """
+    def wanted(name):
+        return fields is None or name in fields
+
+    related = [name for name in ("created_by", "nutrition") if wanted(name)]
+    if "category" in expand:
+        related.append("category")
+    deferred = ["search_vector"] + [
+        column for name, column in RECIPE_FIELD_COLUMNS.items() if not wanted(name)
+    ]
+
+    queryset = queryset.select_related(
+        *(prefix + name for name in related)
+    ).defer(
+        *(prefix + column for column in deferred)
+    )
+    if wanted("ingredients"):
+        ingredients = Ingredient.objects.all() if "ingredients" in expand else Ingredient.objects.only("id")
+        queryset = queryset.prefetch_related(models.Prefetch(prefix + "ingredients", queryset=ingredients))
+    return queryset
+
+
+class RecipeQuerySet(models.QuerySet):
+    def for_api(self, fields=None, expand=()):
+        return with_recipe_related(self, fields=fields, expand=expand)
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='recipe_images/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # jor_app.images
     time_required = models.CharField(max_length=50)
+    # jor_app.cooking_time: time_required-аас задалсан минут, pre_save-д бөглөнө
+    time_minutes = models.PositiveIntegerField(null=True, blank=True, editable=False)
     servings = models.PositiveIntegerField()
     cuisine = models.CharField(max_length=50, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='recipes')
     ingredients = models.ManyToManyField(Ingredient, related_name='recipes')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='recipes')
     created_at = models.DateTimeField(auto_now_add=True)
+    # ETag/Last-Modified-д ашиглана; рейтинг, nutrition, орц өөрчлөгдөхөд мөн шинэчилнэ
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # RecipeRating-аас тооцсон дундаж; RecipeRating.objects.rate() шинэчилнэ
+    rating = models.FloatField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # jor_app.ranking: итгэлээр жигнэсэн дундаж + шинэ жорын урамшуулал; анхдагч эрэмбэ
+    rank_score = models.FloatField(default=0, editable=False)
+
+    # jor_app.text_search: PostgreSQL дээр post_save шинэчилнэ
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rank_score', 'id'], name='recipe_rank_idx'),
+            models.Index(fields=['rating', 'id'], name='recipe_rating_idx'),
+            models.Index(fields=['created_at', 'id'], name='recipe_created_idx'),  # ?order=new/old
+            # by_category / ?category=: the same orderings within one category
+            models.Index(fields=['category', 'rank_score', 'id'], name='recipe_category_rank_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='recipe_category_created_idx'),
+            models.Index(fields=['time_minutes', 'id'], name='recipe_time_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_gin'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='recipe_name_trgm'),
+        ]
 
     def __str__(self):
         return self.name
@@ -89,21 +179,159 @@ class Nutrition(models.Model):
     fat = models.CharField(max_length=50, blank=True)
     carbs = models.CharField(max_length=50, blank=True)
 
+    # jor_app.nutrition: текстээс задлан pre_save-д бөглөнө (ккал, грамм)
+    calories_kcal = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    protein_g = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    fat_g = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    carbs_g = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+
     def __str__(self):
         return f"{self.recipe.name} Nutrition"
 
+class WishlistQuerySet(models.QuerySet):
+    def for_api(self, fields=None, expand=()):
+        return with_recipe_related(self, prefix="recipe__", fields=fields, expand=expand)
+
+
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete = models.CASCADE, related_name="wishlistUser")
     recipe = models.ForeignKey(Recipe, on_delete= models.CASCADE, related_name="wishlistRecipe")
 
+    objects = WishlistQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("user", "recipe")  # get_or_create-ийн уралдаанд давхар мөр үүсэхгүй
+
 # models.py-д нэмэх
+class RecipeRatingManager(models.Manager):
+    def rate(self, user, recipe_id, value):
+        """
+        Create or change ``user``'s vote and move the recipe's stored
+        aggregates by the difference, in one transaction.
+        """
+        with transaction.atomic():
+            # Recipe мөрийг түгжиж зэрэг ирсэн үнэлгээг дараалуулна
+            recipe = Recipe.objects.select_for_update().get(id=recipe_id)
+            obj = self.filter(user=user, recipe=recipe).first()
+            if obj is None:
+                obj = self.create(user=user, recipe=recipe, rating=value)
+                delta_sum, delta_count = value, 1
+            else:
+                delta_sum, delta_count = value - obj.rating, 0
+                if delta_sum:
+                    obj.rating = value
+                    obj.save(update_fields=["rating"])
+
+            if delta_sum or delta_count:
+                recipe.rating_sum += delta_sum
+                recipe.rating_count += delta_count
+                recipe.rating = recipe.rating_sum / recipe.rating_count
+                recipe.rank_score = ranking.score(recipe.rating_sum, recipe.rating_count, recipe.created_at)
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    rating_sum=recipe.rating_sum,
+                    rating_count=recipe.rating_count,
+                    rating=recipe.rating,
+                    rank_score=recipe.rank_score,
+                    updated_at=Now(),
+                )
+        return obj
+
+    def rate_many(self, user, ratings):
+        """
+        Upsert ``user``'s votes from ``{recipe_id: value}`` with one
+        ``INSERT ... ON CONFLICT (user, recipe) DO UPDATE`` and recompute
+        the aggregates of the touched recipes, in one transaction.
+
+        Returns the ids of the recipes that exist and were rated.
+        """
+        with transaction.atomic():
+            # one query validates the ids and locks the rows against rate();
+            # pk order keeps concurrent batches from deadlocking
+            recipe_ids = list(
+                Recipe.objects.select_for_update().filter(pk__in=ratings)
+                .order_by("pk").values_list("pk", flat=True)
+            )
+            if recipe_ids:
+                self.bulk_create(
+                    [self.model(user=user, recipe_id=pk, rating=ratings[pk]) for pk in recipe_ids],
+                    update_conflicts=True,
+                    unique_fields=["user", "recipe"],
+                    update_fields=["rating"],
+                )
+                self.refresh_aggregates(recipe_ids)
+        return recipe_ids
+
+    def refresh_aggregates(self, recipe_ids=None):
+        """
+        Recompute the stored aggregates and rank scores of ``recipe_ids``
+        (all when None) from scratch.
+        """
+        stats = (
+            self.filter(recipe=models.OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+        )
+        recipes = Recipe.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+        rating_sum = Coalesce(
+            models.Subquery(stats.annotate(s=models.Sum("rating")).values("s")), 0
+        )
+        rating_count = Coalesce(
+            models.Subquery(stats.annotate(c=models.Count("id")).values("c")), 0
+        )
+        return recipes.update(
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating=Coalesce(
+                models.Subquery(
+                    stats.annotate(
+                        a=Cast(models.Avg("rating"), models.FloatField())
+                    ).values("a")
+                ),
+                0.0,
+            ),
+            # SET reads the old columns, so the score repeats the subqueries
+            rank_score=ranking.score_expression(rating_sum, rating_count),
+            updated_at=Now(),
+        )
+
+
 class RecipeRating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ratings")
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="ratings")
     rating = models.PositiveSmallIntegerField()  # 1-5
 
+    objects = RecipeRatingManager()
+
     class Meta:
         unique_together = ("user", "recipe")  # Нэг хэрэглэгч нэг recipe-д зөвхөн 1 rating өгнө
 
     def __str__(self):
         return f"{self.user.username} - {self.recipe.name}: {self.rating}"
+
+
+# jor_app.similar: орцын олонлогийн MinHash, LSH bucket-ууд
+class RecipeMinHash(models.Model):
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name="minhash")
+    signature = models.BinaryField()  # BANDS * ROWS int64 (similar.pack)
+
+
+class RecipeLSHBucket(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="lsh_buckets")
+    key = models.BigIntegerField(db_index=True)  # hash(band, тухайн band-ийн утгууд)
+
+
+# jor_app.recommender-ийн сургасан хувийн санал: хэрэглэгч бүрд нэг мөр
+class UserRecommendation(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="recommendations")
+    recipe_ids = models.BinaryField()  # int64, оноо буурах дарааллаар
+    scores = models.BinaryField()      # float32, таамагласан үнэлгээ (1-5)
+    trained_at = models.DateTimeField()
+
+    def items(self):
+        """``[(recipe_id, score)]``, best first."""
+        recipe_ids, scores = array("q"), array("f")
+        recipe_ids.frombytes(self.recipe_ids)
+        scores.frombytes(self.scores)
+        return list(zip(recipe_ids, scores))
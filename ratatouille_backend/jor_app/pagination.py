@@ -0,0 +1,140 @@
+"""
+Keyset (cursor) pagination.
+
+The page boundary is taken from the ``order_by`` of the queryset the view
+builds, so every ordering the view supports pages correctly as long as it
+ends with a unique column (``id``).  The cursor carries the ordering
+values of the last row sent; the next page is fetched with a
+``WHERE (a, b, id) < (...)`` style filter instead of an OFFSET, so a page
+deep in the feed costs the same as the first one.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        ordering = []
+        for term in queryset.query.order_by:
+            descending = term.startswith("-")
+            ordering.append((term.lstrip("-"), descending))
+        if not ordering or ordering[-1][0] not in ("id", "pk"):
+            raise AssertionError(
+                "KeysetPagination needs a queryset ordered by a unique trailing 'id'."
+            )
+        return ordering
+
+    # 🔹 Cursor encode / decode
+
+    def encode_cursor(self, values):
+        raw = json.dumps(values, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, queryset, ordering, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                self._to_python(queryset.model, name, value)
+                for (name, _), value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            # ValidationError: Field.to_python on a forged value (bad date, an object...)
+            raise NotFound(self.invalid_cursor_message)
+
+    def _to_python(self, model, name, value):
+        if value is None or LOOKUP_SEP in name:
+            return value
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    # 🔹 Keyset filter
+
+    def keyset_filter(self, ordering, values):
+        clauses = []
+        for i, (name, descending) in enumerate(ordering):
+            equal = {ordering[j][0]: values[j] for j in range(i)}
+            lookup = "%s__%s" % (name, "lt" if descending else "gt")
+            clauses.append(Q(**equal, **{lookup: values[i]}))
+        return reduce(or_, clauses)
+
+    def page_queryset(self, queryset, request):
+        """The queryset of the requested page plus one look-ahead row."""
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(queryset, self.ordering, cursor)
+            queryset = queryset.filter(self.keyset_filter(self.ordering, values))
+        return queryset[: self.page_size_value + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[: self.page_size_value]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """``paginate_queryset`` for async views (jor_app.async_views)."""
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def get_next_link(self, base_url=None):
+        """``base_url`` points the link at another endpoint serving the same feed."""
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor(
+            [getattr(last, name) for name, _ in self.ordering]
+        )
+        url = self.request.build_absolute_uri(base_url)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class RecipeCursorPagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 100
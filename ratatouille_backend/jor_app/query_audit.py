@@ -0,0 +1,351 @@
+"""
+Query-plan audit: which endpoint SQL scans or sorts too many rows, and
+which indexes would fix it.
+
+``audit`` replays one request per scenario (the benchmark ``SCENARIOS``
+plus the endpoints below) through the in-process test client, against
+whatever the database holds.  Run it on a ``generate_benchmark_data``
+set of realistic size.  Every statement a request ran is EXPLAINed:
+``EXPLAIN (ANALYZE, FORMAT JSON)`` on PostgreSQL (plain EXPLAIN for
+writes), ``EXPLAIN QUERY PLAN`` on SQLite.  It all happens in one
+transaction that is rolled back, so ``rate`` and the other writes leave
+nothing behind.
+
+Two things are flagged when they touch more than ``min_rows`` rows:
+
+* a sequential scan (on SQLite: ``SCAN t`` without an index), counted as
+  the table's rows times the loops;
+* an explicit sort (``Sort`` / ``USE TEMP B-TREE``), counted as the rows
+  sorted.  SQLite reports no row counts, so there it is the number of
+  rows the statement returns without its LIMIT.
+
+For findings on ``jor_app`` tables an index is proposed from the
+statement itself: the columns that table is compared on with ``=`` /
+``IN``, then its range or ORDER BY columns.  A proposal that an existing
+index already starts with is dropped (the planner chose the scan anyway).
+These are heuristics: read the plan before adding an index to
+``Meta.indexes``.
+
+Driven by ``manage.py audit_queries``.
+"""
+import json
+import random
+import re
+from datetime import datetime, timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connection, models, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .benchmark import SCENARIOS, Scenario, _context, _host, _random_recipe
+from .models import Recipe, RecipeRating, User, Wishlist
+
+AUDIT_SCENARIOS = SCENARIOS + (
+    Scenario("home", lambda ctx, rng: ("get", "/api/home/", {})),
+    Scenario("recipes_list_new", lambda ctx, rng: ("get", "/api/recipes/", {"data": {"order": "new"}})),
+    Scenario("recipes_list_quick", lambda ctx, rng: ("get", "/api/recipes/", {"data": {"order": "quick"}})),
+    Scenario("recipes_list_filtered", lambda ctx, rng: (
+        "get", "/api/recipes/", {"data": {"category": rng.choice(ctx["categories"]), "calories_max": 500}})),
+    Scenario("recipes_similar", lambda ctx, rng: (
+        "get", f"/api/recipes/{_random_recipe(ctx, rng)}/similar/", {})),
+    Scenario("categories_list", lambda ctx, rng: ("get", "/api/categories/", {})),
+    Scenario("ingredients_list", lambda ctx, rng: ("get", "/api/ingredients/", {})),
+    Scenario("wishlist_ids", lambda ctx, rng: ("get", "/api/wishlist/my/", {"data": {"ids": "1"}}), auth=True),
+    Scenario("wishlist_add", lambda ctx, rng: (
+        "post", "/api/wishlist/add/", {"data": {"recipe_id": _random_recipe(ctx, rng)}, "format": "json"}),
+        auth=True),
+    Scenario("ratings_bulk", lambda ctx, rng: (
+        "post", "/api/ratings/bulk/",
+        {"data": {"ratings": [{"recipe_id": _random_recipe(ctx, rng), "rating": rng.randint(1, 5)}
+                              for _ in range(5)]}, "format": "json"}), auth=True),
+    Scenario("recommendations_me", lambda ctx, rng: ("get", "/api/recommendations/me/", {}), auth=True),
+    Scenario("users_me", lambda ctx, rng: ("get", "/api/users/me/", {}), auth=True),
+)
+
+STATEMENT_RE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT)\b", re.IGNORECASE)
+# FROM "jor_app_reciperating" U0 / INNER JOIN "jor_app_category" ON ...
+TABLE_RE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"(?:\s+(?:AS\s+)?"?([A-Z]\d+)\b"?)?')
+COLUMN = r'(?P<qualifier>"\w+"|\b[A-Z]\d+)\."(?P<column>\w+)"'
+# "a"."x" = ("b"."y"): joins and correlated subqueries
+PAIR_RE = re.compile(
+    r'(?P<left>"\w+"|\b[A-Z]\d+)\."(?P<left_column>\w+)"\s*=\s*\(?'
+    r'(?P<right>"\w+"|\b[A-Z]\d+)\."(?P<right_column>\w+)"'
+)
+# LIKE is left out: '%text%' can't use a b-tree index anyway
+COMPARED_RE = re.compile(COLUMN + r"\s*(?P<op>=|IN\b|IS\b|<=|>=|<|>|BETWEEN\b)", re.IGNORECASE)
+ORDER_RE = re.compile(r"\b(?:ORDER|GROUP) BY (.+?)(?=\bLIMIT\b|\bOFFSET\b|\bFOR UPDATE\b|\bHAVING\b|\)|$)",
+                      re.IGNORECASE)
+ORDER_TERM_RE = re.compile(r"^\(?" + COLUMN + r"\)?(?:\s+(?:ASC|DESC))?(?:\s+NULLS (?:FIRST|LAST))?$",
+                           re.IGNORECASE)
+LIMIT_RE = re.compile(r"\s+LIMIT\s+\d+(?:\s+OFFSET\s+\d+)?\s*$", re.IGNORECASE)
+ALIAS_RE = re.compile(r"^[A-Z]\d+$")
+EQUALITY = {"=", "IN", "IS"}
+
+
+def scenario_names():
+    return [scenario.name for scenario in AUDIT_SCENARIOS]
+
+
+# 🔹 Statement analysis
+
+def _aliases(sql):
+    """``{table or alias (lowercased): table}`` of every table the statement reads."""
+    aliases = {}
+    for table, alias in TABLE_RE.findall(sql):
+        aliases[table.lower()] = table
+        if alias:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _qualifier(aliases, qualifier):
+    return aliases.get(qualifier.strip('"').lower())
+
+
+def columns_used(sql):
+    """
+    ``{table: {"equality": [...], "range": [...], "order": [...]}}``: the
+    columns each table is filtered, joined and ordered on, in order of
+    appearance.
+
+    A join column only counts when the other side is filtered (``category_id``
+    of ``... JOIN category ON ... WHERE category.name = %s``) or when it
+    belongs to a subquery table (``U0.recipe_id = recipe.id``): joining an
+    unfiltered table by its primary key needs no new index.
+    """
+    aliases = _aliases(sql)
+    used = {}
+
+    def add(table, kind, column):
+        if table is None:
+            return
+        columns = used.setdefault(table, {"equality": [], "range": [], "order": []})[kind]
+        if column not in columns:
+            columns.append(column)
+
+    pairs = list(PAIR_RE.finditer(sql))
+    filtered = set()
+    for match in COMPARED_RE.finditer(sql):
+        if any(pair.start() <= match.start() < pair.end() for pair in pairs):
+            continue
+        table = _qualifier(aliases, match["qualifier"])
+        filtered.add(table)
+        kind = "equality" if match["op"].upper() in EQUALITY else "range"
+        add(table, kind, match["column"])
+
+    for pair in pairs:
+        left, right = _qualifier(aliases, pair["left"]), _qualifier(aliases, pair["right"])
+        if right in filtered or ALIAS_RE.match(pair["left"]):
+            add(left, "equality", pair["left_column"])
+        if left in filtered or ALIAS_RE.match(pair["right"]):
+            add(right, "equality", pair["right_column"])
+
+    for clause in ORDER_RE.findall(sql):
+        for term in clause.split(","):
+            # an index can only serve the leading plain columns
+            match = ORDER_TERM_RE.match(term.strip())
+            if not match:
+                break
+            add(_qualifier(aliases, match["qualifier"]), "order", match["column"])
+    return used
+
+
+class Explainer:
+    """EXPLAINs statements on ``connection`` and reports the big scans and sorts."""
+
+    def __init__(self, analyze=True):
+        self.analyze = analyze
+        self._table_rows = {}
+
+    def table_rows(self, table):
+        if table not in self._table_rows:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                self._table_rows[table] = cursor.fetchone()[0]
+        return self._table_rows[table]
+
+    def explain(self, sql):
+        """``[(kind, table or None, rows, detail)]`` of the statement's scans and sorts."""
+        aliases = _aliases(sql)
+        if connection.vendor == "postgresql":
+            return self._postgresql(sql, aliases)
+        if connection.vendor == "sqlite":
+            return self._sqlite(sql, aliases)
+        raise NotImplementedError(f"No plan reader for {connection.vendor}")
+
+    def _postgresql(self, sql, aliases):
+        is_select = sql.lstrip()[:6].upper() in ("SELECT", "WITH")
+        options = "ANALYZE, FORMAT JSON" if self.analyze and is_select else "FORMAT JSON"
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN ({options}) {sql}")
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):  # psycopg2 without the json typecaster
+            plan = json.loads(plan)
+
+        found = []
+        stack = [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            children = node.get("Plans", [])
+            stack.extend(children)
+            loops = node.get("Actual Loops", 1)
+            if node["Node Type"] == "Seq Scan":
+                table = node["Relation Name"]
+                found.append(("seq_scan", table, self.table_rows(table) * loops, f"Seq Scan on {table}"))
+            elif node["Node Type"] == "Sort":
+                source = children[0] if children else node
+                rows = source.get("Actual Rows", source["Plan Rows"]) * source.get("Actual Loops", 1)
+                keys = node.get("Sort Key", [])
+                table = next((_qualifier(aliases, key.split(".")[0]) for key in keys if "." in key), None)
+                found.append(("sort", table, rows, f"Sort on {', '.join(keys)}"))
+        return found
+
+    def _sqlite(self, sql, aliases):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+
+        found = []
+        for detail in details:
+            scan = re.match(r"SCAN (\w+)(?: AS (\w+))?$", detail)
+            if scan:
+                table = aliases.get(scan[1].lower(), scan[1])
+                found.append(("seq_scan", table, self.table_rows(table), detail))
+            elif detail.startswith("USE TEMP B-TREE"):
+                order = next(iter(ORDER_RE.findall(sql)), "")
+                column = re.search(COLUMN, order)
+                table = _qualifier(aliases, column["qualifier"]) if column else None
+                found.append(("sort", table, self._result_rows(sql, table), detail))
+        return found
+
+    def _result_rows(self, sql, table):
+        """Rows ``sql`` returns without its LIMIT: what SQLite sorts."""
+        if sql.lstrip()[:6].upper() != "SELECT":
+            return self.table_rows(table) if table else 0
+        try:
+            with connection.cursor() as cursor, transaction.atomic():
+                cursor.execute(f"SELECT COUNT(*) FROM ({LIMIT_RE.sub('', sql)})")
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            return self.table_rows(table) if table else 0
+
+
+# 🔹 Index proposals
+
+def _existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        (name, info["columns"]) for name, info in constraints.items()
+        if (info["index"] or info["unique"] or info["primary_key"]) and info["columns"]
+    ]
+
+
+def _models_by_table():
+    return {model._meta.db_table: model for model in apps.get_app_config("jor_app").get_models()}
+
+
+def propose_index(kind, table, sql):
+    """
+    ``{"model", "fields", "name"}`` for the index that would serve this
+    finding, ``{"covered_by": name}`` when an existing index already
+    does, or None when the statement gives nothing to index on.
+    """
+    model = _models_by_table().get(table)
+    if model is None:
+        return None
+    used = columns_used(sql).get(table)
+    if not used:
+        return None
+
+    tail = used["order"] if kind == "sort" else used["range"]
+    columns = used["equality"] + [column for column in tail if column not in used["equality"]]
+    by_column = {field.column: field.name for field in model._meta.concrete_fields}
+    columns = [column for column in columns if column in by_column]
+    if not columns:
+        return None
+
+    for name, existing in _existing_indexes(table):
+        if existing[:len(columns)] == columns:
+            return {"covered_by": name}
+
+    fields = [by_column[column] for column in columns]
+    index = models.Index(fields=fields, name=f"{model._meta.model_name}_{'_'.join(fields)}_idx")
+    if len(index.name) > index.max_name_length:
+        index.set_name_with_model(model)
+    return {"model": model.__name__, "fields": fields, "name": index.name}
+
+
+# 🔹 Runner
+
+def audit(min_rows=1000, analyze=True, seed=42, only=None, log=None):
+    """
+    Replay every scenario (or those named in ``only``), EXPLAIN its SQL
+    and return the findings and index proposals as a JSON-able dict.
+    """
+    log = log or (lambda message: None)
+    explainer = Explainer(analyze=analyze)
+    endpoints, proposals = {}, {}
+    overrides = {"RESPONSE_CACHE": {**getattr(settings, "RESPONSE_CACHE", {}), "ENABLED": False}}
+
+    with override_settings(**overrides), transaction.atomic():
+        client = APIClient(HTTP_HOST=_host())
+        ctx = _context(client)
+        token = str(RefreshToken.for_user(ctx["user"]).access_token)
+
+        for scenario in AUDIT_SCENARIOS:
+            if only and scenario.name not in only:
+                continue
+            method, path, kwargs = scenario.build(ctx, random.Random(f"{seed}:{scenario.name}"))
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if scenario.auth else {}
+            with CaptureQueriesContext(connection) as captured:
+                response = getattr(client, method)(path, **kwargs, **headers)
+
+            statements = list(dict.fromkeys(
+                query["sql"] for query in captured.captured_queries if STATEMENT_RE.match(query["sql"])
+            ))
+            findings = []
+            for sql in statements:
+                for kind, table, rows, detail in explainer.explain(sql):
+                    if rows <= min_rows:
+                        continue
+                    finding = {"kind": kind, "table": table, "rows": rows, "plan": detail, "sql": sql}
+                    proposal = propose_index(kind, table, sql) if table else None
+                    if proposal and "covered_by" in proposal:
+                        finding["covered_by"] = proposal["covered_by"]
+                    elif proposal:
+                        finding["proposal"] = proposal["name"]
+                        entry = proposals.setdefault(proposal["name"], {**proposal, "endpoints": [], "rows": 0})
+                        if scenario.name not in entry["endpoints"]:
+                            entry["endpoints"].append(scenario.name)
+                        entry["rows"] = max(entry["rows"], rows)
+                    findings.append(finding)
+
+            endpoints[scenario.name] = {
+                "status": response.status_code,
+                "statements": len(statements),
+                "findings": findings,
+            }
+            log(f"{scenario.name}: {len(statements)} statements, {len(findings)} findings")
+
+        transaction.set_rollback(True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "analyze": analyze and connection.vendor == "postgresql",
+            "min_rows": min_rows,
+            "dataset": {
+                "recipes": Recipe.objects.count(),
+                "users": User.objects.count(),
+                "ratings": RecipeRating.objects.count(),
+                "wishlist": Wishlist.objects.count(),
+            },
+        },
+        "endpoints": endpoints,
+        "proposals": sorted(proposals.values(), key=lambda entry: -entry["rows"]),
+    }
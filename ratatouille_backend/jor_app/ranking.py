@@ -0,0 +1,83 @@
+"""
+``Recipe.rank_score``: the stored, indexed score behind the default recipe
+order (``RecipeViewSet.ORDERINGS['rank']``)::
+
+    rank_score = (PRIOR_WEIGHT * PRIOR_MEAN + rating_sum) / (PRIOR_WEIGHT + rating_count)
+                 + days from EPOCH to created_at / DAYS_PER_STAR
+
+The first term is a Bayesian average.  Every recipe starts with
+``PRIOR_WEIGHT`` imaginary votes of ``PRIOR_MEAN``, so one 5-star vote
+barely lifts a recipe, while hundreds of 4.8s are worth almost 4.8.  The
+second term is a recency bonus: a recipe created ``DAYS_PER_STAR`` days
+later ranks like one rated a star higher.  It grows with the creation
+time instead of shrinking with age, so scores never go stale as the
+clock moves.  A score only changes when its recipe's ratings do, and
+``ORDER BY rank_score DESC, id DESC`` is a plain scan of
+``recipe_rank_idx``.
+
+Kept current by ``RecipeRating.objects.rate()`` / ``refresh_aggregates()``
+and the Recipe pre_save hook; ``bulk_loaded`` covers bulk_create.
+``manage.py refresh_ranking`` recomputes every score.  Run it after
+changing the RANKING settings.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Func, Value
+
+DEFAULTS = {
+    "PRIOR_MEAN": 3.0,
+    "PRIOR_WEIGHT": 5,
+    "EPOCH": datetime(2025, 1, 1, tzinfo=timezone.utc),
+    "DAYS_PER_STAR": 730,
+}
+
+
+def get_config(name):
+    return getattr(settings, "RANKING", {}).get(name, DEFAULTS[name])
+
+
+class Epoch(Func):
+    """Seconds since 1970-01-01 UTC of a datetime expression, as a float."""
+
+    output_field = FloatField()
+    template = "EXTRACT(EPOCH FROM %(expressions)s)::double precision"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Django stores UTC text; julianday() parses it
+        return self.as_sql(
+            compiler, connection,
+            template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)", **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def score(rating_sum, rating_count, created_at):
+    """``rank_score`` of one recipe, in Python."""
+    weight, mean = get_config("PRIOR_WEIGHT"), get_config("PRIOR_MEAN")
+    age = (created_at - get_config("EPOCH")).total_seconds()
+    return (weight * mean + rating_sum) / (weight + rating_count) + age / (get_config("DAYS_PER_STAR") * 86400)
+
+
+def score_expression(rating_sum=None, rating_count=None):
+    """
+    ``rank_score`` as an SQL expression: over the row's own columns, or
+    over the given sum and count expressions when the same UPDATE is
+    writing new ones.
+    """
+    weight, mean = get_config("PRIOR_WEIGHT"), get_config("PRIOR_MEAN")
+    epoch = get_config("EPOCH").timestamp()
+    rating_sum = F("rating_sum") if rating_sum is None else rating_sum
+    rating_count = F("rating_count") if rating_count is None else rating_count
+    return ExpressionWrapper(
+        (Value(float(weight * mean)) + rating_sum) / (Value(float(weight)) + rating_count)
+        + (Epoch(F("created_at")) - Value(epoch)) / Value(get_config("DAYS_PER_STAR") * 86400.0),
+        output_field=FloatField(),
+    )
+
+
+def refresh(queryset):
+    """Recompute the scores of the recipes in ``queryset``; returns the row count."""
+    return queryset.update(rank_score=score_expression())
@@ -0,0 +1,292 @@
+"""
+Offline personalised recommendations from ``RecipeRating``.
+
+A biased matrix factorisation of the explicit 1-5 ratings::
+
+    rating(u, i) ~ mean + user_bias[u] + item_bias[i] + U[u] . V[i]
+
+The biases are fitted first, as regularised averages, and the factors
+are then fitted to what remains by alternating least squares.  Each ALS
+half-step solves one small ``FACTORS x FACTORS`` system per user (or
+recipe).  Rows with the same number of ratings are stacked and solved
+together with batched NumPy matmul and ``np.linalg.solve``, at most
+``BLOCK_SIZE`` values at a time.  Memory is therefore bounded by the
+block and the factor matrices, never by users x recipes.  The ratings are
+kept as three flat arrays (coordinate form), sorted once per side.
+
+Scoring works the same way: blocks of users against all recipes, at
+most ``BLOCK_CELLS`` scores at a time.  The recipes a user has already
+rated are skipped.  The top ``TOP_N`` per user are written to
+``UserRecommendation``, one row per user, which ``/api/recommendations/me/``
+reads by primary key.  Rows are upserted block by block, so readers keep
+seeing the previous run until their row is replaced.
+
+Run by ``manage.py train_recommendations``, which also reports time and
+memory.  NumPy is only needed here, not by the API.
+"""
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RecipeRating, UserRecommendation
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+DEFAULTS = {
+    "FACTORS": 32,
+    "ITERATIONS": 10,
+    "REG": 0.5,         # factor regularisation, scaled by each row's rating count
+    "BIAS_REG": 5.0,    # pseudo-count pulling biases towards 0
+    "TOP_N": 50,
+    "BLOCK_SIZE": 1_000_000,  # float64 values per stacked solve (8 MB; solve copies it a few times)
+    "BLOCK_CELLS": 2_000_000,  # user x recipe scores per block (plus argpartition indices)
+    "SEED": 42,
+}
+
+
+def get_config(name):
+    return getattr(settings, "RECOMMENDATIONS", {}).get(name, DEFAULTS[name])
+
+
+# 🔹 Data
+
+def load_ratings(chunk_size=50_000):
+    """``(user_ids, recipe_ids, ratings)`` arrays of every RecipeRating."""
+    rows = RecipeRating.objects.order_by().values_list("user_id", "recipe_id", "rating")
+    count = rows.count()
+    users = np.empty(count, dtype=np.int64)
+    recipes = np.empty(count, dtype=np.int64)
+    ratings = np.empty(count, dtype=np.float32)
+    n = 0
+    for n, (user_id, recipe_id, rating) in enumerate(rows.iterator(chunk_size=chunk_size), 1):
+        users[n - 1], recipes[n - 1], ratings[n - 1] = user_id, recipe_id, rating
+    # rows written since count() are left for the next run
+    return users[:n], recipes[:n], ratings[:n]
+
+
+class Side:
+    """The ratings sorted by one side (users or recipes), with row boundaries."""
+
+    def __init__(self, rows, cols, values, n_rows):
+        order = np.argsort(rows, kind="stable")
+        self.cols = cols[order]
+        self.values = values[order]
+        self.counts = np.bincount(rows, minlength=n_rows)
+        self.ends = np.cumsum(self.counts)
+        self.starts = self.ends - self.counts
+
+
+def solve(side, other, reg, block_size):
+    """
+    Regularised least-squares factors of every row of ``side`` given ``other``.
+
+    Rows with the same number of ratings ``c`` are stacked into a
+    ``(rows, c, k)`` array, so their ``k x k`` systems are built by one
+    batched matmul and solved by one batched ``np.linalg.solve``.  A stack
+    holds at most ``block_size`` float64 values.
+    """
+    k = other.shape[1]
+    out = np.zeros((len(side.counts), k), dtype=np.float32)
+    ridge = reg * np.eye(k)
+    for count in np.unique(side.counts):
+        if count == 0:
+            continue
+        rows = np.flatnonzero(side.counts == count)
+        per_block = max(1, block_size // (k * max(count, k)))
+        for chunk in range(0, len(rows), per_block):
+            block = rows[chunk:chunk + per_block]
+            positions = side.starts[block, None] + np.arange(count)
+            factors = other[side.cols[positions]].astype(np.float64)   # (rows, c, k)
+            gram = factors.transpose(0, 2, 1) @ factors + count * ridge
+            rhs = np.einsum("nck,nc->nk", factors, side.values[positions])
+            out[block] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+    return out
+
+
+# 🔹 Model
+
+class Model:
+    def __init__(self, user_ids, recipe_ids, mean, user_bias, item_bias, user_factors, item_factors, by_user):
+        self.user_ids = user_ids            # index -> User.pk (sorted)
+        self.recipe_ids = recipe_ids        # index -> Recipe.pk (sorted)
+        self.mean = mean
+        self.user_bias = user_bias
+        self.item_bias = item_bias
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.by_user = by_user              # Side: what each user rated
+
+    def predict(self, users, recipes, block=1_000_000):
+        """Predicted ratings for pk pairs; unknown users/recipes get no bias or factors."""
+        out = np.empty(len(users), dtype=np.float32)
+        for start in range(0, len(users), block):
+            u = _index(self.user_ids, users[start:start + block])
+            i = _index(self.recipe_ids, recipes[start:start + block])
+            known = (u >= 0) & (i >= 0)
+            score = np.full(len(u), self.mean, dtype=np.float32)
+            score[u >= 0] += self.user_bias[u[u >= 0]]
+            score[i >= 0] += self.item_bias[i[i >= 0]]
+            score[known] += np.einsum(
+                "ij,ij->i", self.user_factors[u[known]], self.item_factors[i[known]]
+            )
+            out[start:start + block] = score
+        return np.clip(out, 1, 5)
+
+    def top_n(self, n, block_cells):
+        """Yield ``(user_id, recipe_ids, scores)`` blocks of the best unrated recipes per user."""
+        n_users, n_items = len(self.user_ids), len(self.recipe_ids)
+        rows = max(1, block_cells // max(n_items, 1))
+        for first in range(0, n_users, rows):
+            end = min(first + rows, n_users)
+            scores = self.user_factors[first:end] @ self.item_factors.T
+            scores += self.item_bias[None, :]
+
+            low, high = self.by_user.starts[first], self.by_user.ends[end - 1]
+            rated_rows = np.repeat(np.arange(end - first), self.by_user.counts[first:end])
+            scores[rated_rows, self.by_user.cols[low:high]] = -np.inf
+
+            take = min(n, n_items)
+            best = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+            base = self.mean + self.user_bias[first:end, None]
+            for row in range(end - first):
+                keep = np.isfinite(best_scores[row])
+                yield (
+                    int(self.user_ids[first + row]),
+                    self.recipe_ids[best[row][keep]],
+                    np.clip(base[row] + best_scores[row][keep], 1, 5),
+                )
+
+
+def _index(sorted_ids, ids):
+    """Positions of ``ids`` in ``sorted_ids``, -1 where absent."""
+    positions = np.searchsorted(sorted_ids, ids)
+    positions[positions == len(sorted_ids)] = 0
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+def train(users, recipes, ratings, factors=None, iterations=None, reg=None, seed=None, log=None):
+    """Fit a Model to rating triples (pk arrays and values)."""
+    log = log or (lambda message: None)
+    factors = factors or get_config("FACTORS")
+    iterations = get_config("ITERATIONS") if iterations is None else iterations
+    reg = get_config("REG") if reg is None else reg
+    block = get_config("BLOCK_SIZE")
+    bias_reg = get_config("BIAS_REG")
+
+    user_ids, u = np.unique(users, return_inverse=True)
+    recipe_ids, i = np.unique(recipes, return_inverse=True)
+    n_users, n_items = len(user_ids), len(recipe_ids)
+
+    mean = float(ratings.mean())
+    residual = ratings - mean
+    item_bias = (np.bincount(i, residual, n_items) / (bias_reg + np.bincount(i, minlength=n_items))).astype(np.float32)
+    residual = residual - item_bias[i]
+    user_bias = (np.bincount(u, residual, n_users) / (bias_reg + np.bincount(u, minlength=n_users))).astype(np.float32)
+    residual = (residual - user_bias[u]).astype(np.float32)
+
+    by_user = Side(u, i, residual, n_users)
+    by_item = Side(i, u, residual, n_items)
+    rng = np.random.default_rng(seed if seed is not None else get_config("SEED"))
+    item_factors = rng.normal(0, 0.1, (n_items, factors)).astype(np.float32)
+    user_factors = np.zeros((n_users, factors), dtype=np.float32)
+    for iteration in range(iterations):
+        user_factors = solve(by_user, item_factors, reg, block)
+        item_factors = solve(by_item, user_factors, reg, block)
+        log(f"iteration {iteration + 1}/{iterations}")
+
+    return Model(user_ids, recipe_ids, mean, user_bias, item_bias, user_factors, item_factors, by_user)
+
+
+def rmse(model, users, recipes, ratings):
+    if not len(ratings):
+        return None
+    return round(float(np.sqrt(np.mean((model.predict(users, recipes) - ratings) ** 2))), 4)
+
+
+# 🔹 Serving table
+
+def save(model, top_n=None, batch_size=1000):
+    """Write every user's top-N to UserRecommendation; returns the number of users."""
+    trained_at = timezone.now()
+    batch, written = [], 0
+    for user_id, recipe_ids, scores in model.top_n(top_n or get_config("TOP_N"), get_config("BLOCK_CELLS")):
+        batch.append(UserRecommendation(
+            user_id=user_id,
+            recipe_ids=recipe_ids.astype("<i8").tobytes(),
+            scores=scores.astype("<f4").tobytes(),
+            trained_at=trained_at,
+        ))
+        if len(batch) == batch_size:
+            written += _upsert(batch)
+            batch = []
+    written += _upsert(batch)
+    # users whose ratings are all gone since the last run
+    UserRecommendation.objects.filter(trained_at__lt=trained_at).delete()
+    return written
+
+
+def _upsert(rows):
+    UserRecommendation.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=["user"],
+        update_fields=["recipe_ids", "scores", "trained_at"],
+    )
+    return len(rows)
+
+
+# 🔹 Job
+
+def run(factors=None, iterations=None, reg=None, top_n=None, holdout=0.0, seed=None, write=True, log=None):
+    """
+    Load, train, score and (with ``write``) save; returns a report of the
+    dataset, timings and errors.  ``holdout`` keeps that fraction of the
+    ratings out of training to measure RMSE on unseen ratings.
+    """
+    log = log or (lambda message: None)
+    seconds = {}
+
+    started = time.perf_counter()
+    users, recipes, ratings = load_ratings()
+    seconds["load"] = time.perf_counter() - started
+    if not len(ratings):
+        raise ValueError("No ratings to train on")
+
+    test = np.zeros(len(ratings), dtype=bool)
+    if holdout:
+        rng = np.random.default_rng(seed if seed is not None else get_config("SEED"))
+        test = rng.random(len(ratings)) < holdout
+
+    started = time.perf_counter()
+    model = train(users[~test], recipes[~test], ratings[~test], factors, iterations, reg, seed, log)
+    seconds["train"] = time.perf_counter() - started
+
+    report = {
+        "users": len(model.user_ids),
+        "recipes": len(model.recipe_ids),
+        "ratings": int((~test).sum()),
+        "factors": model.user_factors.shape[1],
+        "iterations": get_config("ITERATIONS") if iterations is None else iterations,
+        "train_rmse": rmse(model, users[~test], recipes[~test], ratings[~test]),
+    }
+    if holdout:
+        biases_only = Model(model.user_ids, model.recipe_ids, model.mean, model.user_bias, model.item_bias,
+                            model.user_factors * 0, model.item_factors * 0, model.by_user)
+        report["holdout_ratings"] = int(test.sum())
+        report["holdout_rmse"] = rmse(model, users[test], recipes[test], ratings[test])
+        report["holdout_rmse_biases_only"] = rmse(biases_only, users[test], recipes[test], ratings[test])
+
+    if write:
+        started = time.perf_counter()
+        report["written"] = save(model, top_n)
+        seconds["score_and_write"] = time.perf_counter() - started
+
+    report["seconds"] = {name: round(value, 3) for name, value in seconds.items()}
+    return report
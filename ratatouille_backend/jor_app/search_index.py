@@ -0,0 +1,217 @@
+"""
+In-process inverted index: ingredient -> bitset of recipes.
+
+Each recipe gets a dense slot number; an ingredient's posting list is a
+Python int with bit ``slot`` set for every recipe that uses it.  A pantry
+query ORs the postings of the selected ingredients to get the candidate
+recipes and ranks them by how many of their ingredients are covered.
+
+The index is built lazily from ``Recipe.ingredients`` on first use.  Each
+worker process holds its own copy.  The handlers in ``jor_app.signals``
+update the copy of the process that wrote and bump the shared
+``ingredient-index`` version (``jor_app.cache.SharedVersion``); a worker
+that sees a version it didn't build rebuilds before its next search.
+Imports and the benchmark generator go through ``bulk_loaded``, which
+bumps it too.
+"""
+import threading
+from dataclasses import dataclass
+
+from .cache import SharedVersion
+from .models import Ingredient, Recipe
+
+VERSION_NAMESPACE = "ingredient-index"
+
+
+@dataclass(frozen=True)
+class IngredientMatch:
+    recipe_id: int
+    matched: int
+    missing: int
+
+    @property
+    def coverage(self):
+        total = self.matched + self.missing
+        return self.matched / total if total else 0.0
+
+
+def _iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = SharedVersion(VERSION_NAMESPACE)
+        self._reset()
+
+    def _reset(self):
+        self._name_to_id = {}         # ingredient name -> ingredient id
+        self._postings = {}           # ingredient id -> recipe-slot bitset
+        self._slot_of = {}            # recipe id -> slot
+        self._recipe_at = []          # slot -> recipe id (None when free)
+        self._recipe_ingredients = [] # slot -> frozenset of ingredient ids
+        self._free_slots = []
+
+    # 🔹 Build / maintenance
+
+    def build(self, version=None):
+        through = Recipe.ingredients.through
+        with self._lock:
+            # read before the rows: a change made meanwhile triggers another build
+            version = self._version.current() if version is None else version
+            self._version.built = None
+            self._reset()
+            self._name_to_id = dict(Ingredient.objects.values_list("name", "id"))
+
+            by_recipe = {}
+            for recipe_id, ingredient_id in through.objects.values_list(
+                "recipe_id", "ingredient_id"
+            ).iterator(chunk_size=5000):
+                by_recipe.setdefault(recipe_id, set()).add(ingredient_id)
+
+            for recipe_id, ingredient_ids in by_recipe.items():
+                self._put(recipe_id, ingredient_ids)
+            self._version.built = version
+
+    @property
+    def _ready(self):
+        return self._version.built is not None
+
+    def invalidate(self):
+        """Rebuild in every worker before its next search."""
+        with self._lock:
+            self._version.invalidate()
+
+    def _ensure_current(self):
+        if self._version.current() != self._version.built:
+            with self._lock:
+                version = self._version.current()
+                if version != self._version.built:
+                    self.build(version)
+
+    def _put(self, recipe_id, ingredient_ids):
+        slot = self._slot_of.get(recipe_id)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._recipe_at[slot] = recipe_id
+                self._recipe_ingredients[slot] = frozenset()
+            else:
+                slot = len(self._recipe_at)
+                self._recipe_at.append(recipe_id)
+                self._recipe_ingredients.append(frozenset())
+            self._slot_of[recipe_id] = slot
+
+        bit = 1 << slot
+        old = self._recipe_ingredients[slot]
+        new = frozenset(ingredient_ids)
+        for ingredient_id in old - new:
+            remaining = self._postings.get(ingredient_id, 0) & ~bit
+            if remaining:
+                self._postings[ingredient_id] = remaining
+            else:
+                self._postings.pop(ingredient_id, None)
+        for ingredient_id in new - old:
+            self._postings[ingredient_id] = self._postings.get(ingredient_id, 0) | bit
+        self._recipe_ingredients[slot] = new
+
+    def _drop(self, recipe_id):
+        slot = self._slot_of.pop(recipe_id, None)
+        if slot is None:
+            return
+        self._clear_slot(slot)
+        self._recipe_at[slot] = None
+        self._free_slots.append(slot)
+
+    def _clear_slot(self, slot):
+        bit = 1 << slot
+        for ingredient_id in self._recipe_ingredients[slot]:
+            remaining = self._postings.get(ingredient_id, 0) & ~bit
+            if remaining:
+                self._postings[ingredient_id] = remaining
+            else:
+                self._postings.pop(ingredient_id, None)
+        self._recipe_ingredients[slot] = frozenset()
+
+    def refresh_recipes(self, recipe_ids):
+        """Re-read the ingredients of ``recipe_ids`` from the database."""
+        by_recipe = {recipe_id: set() for recipe_id in recipe_ids}
+        if self._ready:
+            for recipe_id, ingredient_id in Recipe.ingredients.through.objects.filter(
+                recipe_id__in=by_recipe
+            ).values_list("recipe_id", "ingredient_id"):
+                by_recipe[recipe_id].add(ingredient_id)
+        with self._lock:
+            if self._ready:
+                for recipe_id, ingredient_ids in by_recipe.items():
+                    if ingredient_ids:
+                        self._put(recipe_id, ingredient_ids)
+                    else:
+                        self._drop(recipe_id)
+            self._version.publish()
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            if self._ready:
+                self._drop(recipe_id)
+            self._version.publish()
+
+    def set_ingredient_name(self, ingredient_id, name):
+        with self._lock:
+            if self._ready:
+                for old_name, old_id in list(self._name_to_id.items()):
+                    if old_id == ingredient_id:
+                        del self._name_to_id[old_name]
+                self._name_to_id[name] = ingredient_id
+            self._version.publish()
+
+    def remove_ingredient(self, ingredient_id):
+        with self._lock:
+            if self._ready:
+                for name, known_id in list(self._name_to_id.items()):
+                    if known_id == ingredient_id:
+                        del self._name_to_id[name]
+                bits = self._postings.pop(ingredient_id, 0)
+                for slot in _iter_bits(bits):
+                    self._recipe_ingredients[slot] = self._recipe_ingredients[slot] - {ingredient_id}
+            self._version.publish()
+
+    # 🔹 Query
+
+    def search(self, names, max_missing=None, limit=None):
+        """
+        Rank recipes sharing at least one of ``names`` by coverage.
+
+        Recipes with the fewest missing ingredients come first, then the
+        ones that use more of the selected ingredients.  ``max_missing``
+        drops recipes that need more than that many extra ingredients.
+        """
+        self._ensure_current()
+        with self._lock:
+            wanted = {
+                self._name_to_id[name] for name in names if name in self._name_to_id
+            }
+            candidates = 0
+            for ingredient_id in wanted:
+                candidates |= self._postings.get(ingredient_id, 0)
+
+            matches = []
+            for slot in _iter_bits(candidates):
+                ingredients = self._recipe_ingredients[slot]
+                matched = len(ingredients & wanted)
+                missing = len(ingredients) - matched
+                if max_missing is not None and missing > max_missing:
+                    continue
+                matches.append(IngredientMatch(self._recipe_at[slot], matched, missing))
+
+        matches.sort(key=lambda m: (m.missing, -m.matched, -m.recipe_id))
+        if limit is not None:
+            matches = matches[:limit]
+        return matches
+
+
+ingredient_index = IngredientIndex()
@@ -1,6 +1,23 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import *
 
+# largest BigAutoField value: a bigger id is invalid input, not a DataError
+MAX_ID = 2 ** 63 - 1
+
+
+class DerivativeImagesField(serializers.ReadOnlyField):
+    """``{width: url}`` of the jor_app.images derivatives; the client picks a size."""
+
+    def to_representation(self, variants):
+        widths = (variants or {}).get("widths", {})
+        request = self.context.get("request")
+        images = {}
+        for width, name in widths.items():
+            url = default_storage.url(name)
+            images[width] = request.build_absolute_uri(url) if request else url
+        return images
+
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -8,23 +25,30 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    images = DerivativeImagesField(source='image_variants')
+
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'images']
 
 
 class NutritionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Nutrition
-        fields = ['id', 'calories', 'protein', 'fat', 'carbs']
+        fields = [
+            'id', 'calories', 'protein', 'fat', 'carbs',
+            'calories_kcal', 'protein_g', 'fat_g', 'carbs_g',
+        ]
+        read_only_fields = ['calories_kcal', 'protein_g', 'fat_g', 'carbs_g']
 
 
 class UserSerializer(serializers.ModelSerializer):
     avatar = serializers.SerializerMethodField()
+    avatar_images = DerivativeImagesField(source="avatar_variants")
 
     class Meta:
         model = User
-        fields = ["id", "email", "username", "avatar", "created_at"]
+        fields = ["id", "email", "username", "avatar", "avatar_images", "created_at"]
 
     def get_avatar(self, obj):
         request = self.context.get("request")
@@ -33,16 +57,47 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets from the serializer context:
+
+    * ``context["fields"]``: the only fields to render (None: all of them),
+    * ``context["expand"]``: relations in ``expandable`` to render as nested
+      objects instead of primary keys.
+
+    Works for nested serializers too (the context is the root's), so the
+    view sets it once.  Load the queryset with the same ``fields``/``expand``
+    (``for_api(fields=..., expand=...)``).
+    """
+    expandable = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = self.context.get("fields")
+        if wanted:
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        for name in self.context.get("expand", ()):
+            if name in fields:
+                fields[name] = self.expandable[name]()
+        return fields
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable = {
+        'category': lambda: CategorySerializer(read_only=True),
+        'ingredients': lambda: IngredientSerializer(many=True, read_only=True),
+    }
+
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
     ingredients = serializers.PrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(), many=True
     )
     nutrition = NutritionSerializer(required=False)
     created_by = UserSerializer(read_only=True)
+    images = DerivativeImagesField(source='image_variants')
 
     average_rating = serializers.FloatField(
-        source='avg_rating', read_only=True
+        source='rating', read_only=True
     )
 
     class Meta:
@@ -52,7 +107,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             'name',
             'description',
             'image',
+            'images',
             'time_required',
+            'time_minutes',
             'servings',
             'cuisine',
             'category',
@@ -61,7 +118,9 @@ class RecipeSerializer(serializers.ModelSerializer):
             'created_by',
             'created_at',
             'average_rating',
+            'rating_count',
         ]
+        read_only_fields = ['rating_count']
 
 
     def create(self, validated_data):
@@ -76,12 +135,6 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
-    def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings.exists():
-            return round(sum(r.rating for r in ratings) / ratings.count(), 1)
-        return 0
-
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -125,6 +178,35 @@ class WishlistSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+WISHLIST_SYNC_MAX = 1000
+
+
+class WishlistAddSerializer(serializers.Serializer):
+    """Body of POST /api/wishlist/add/."""
+    recipe_id = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+
+
+class WishlistSyncSerializer(serializers.Serializer):
+    """Body of POST /api/wishlist/sync/: the whole wanted list."""
+    recipe_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID), max_length=WISHLIST_SYNC_MAX
+    )
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    """Body of POST /api/search_recipes/ (and its /api/async/ twin)."""
+    ingredients = serializers.ListField(child=serializers.CharField(), required=False)
+
+
+class RatingInputSerializer(serializers.Serializer):
+    """A vote: POST /api/recipes/{id}/rate/ and every item of /api/ratings/bulk/."""
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+
+
+class BulkRatingItemSerializer(RatingInputSerializer):
+    recipe_id = serializers.IntegerField(min_value=1, max_value=MAX_ID)
+
+
 class RecipeRatingSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -0,0 +1,261 @@
+from django.db import transaction
+from django.utils import timezone
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import ingredient_autocomplete
+from . import ranking, similar
+from .cache import response_cache
+from .images import image_fields, schedule_derivatives
+from .metrics import install_query_counter
+from .models import Category, Ingredient, Nutrition, Recipe, RecipeRating, User
+from .cooking_time import parse_minutes
+from .nutrition import normalize as normalize_nutrition
+from .search_index import ingredient_index
+from .text_search import install_sqlite_functions, update_search_vector
+
+
+# 🔹 Орцын индекс шинэчлэх
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif pk_set:
+        recipe_ids = list(pk_set)
+    else:
+        # ingredient.recipes.clear(): the affected recipes are unknown here
+        transaction.on_commit(ingredient_index.invalidate)
+        return
+
+    transaction.on_commit(lambda: ingredient_index.refresh_recipes(recipe_ids))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: ingredient_index.remove_recipe(recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    ingredient_id, name = instance.pk, instance.name
+    transaction.on_commit(lambda: ingredient_index.set_ingredient_name(ingredient_id, name))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    ingredient_id = instance.pk
+    transaction.on_commit(lambda: ingredient_index.remove_ingredient(ingredient_id))
+
+
+# 🔹 Үнэлгээний нэгтгэл
+# Устгасан үнэлгээний жорууд, холболт бүрд: нэг cascade (хэрэглэгч, жор устгах)
+# N үнэлгээнд N signal илгээдэг ч commit-ийн дараа нэг UPDATE хийнэ
+def _deleted_rating_recipes(using):
+    connection = transaction.get_connection(using)
+    if not hasattr(connection, "deleted_rating_recipes"):
+        connection.deleted_rating_recipes = set()
+    return connection.deleted_rating_recipes
+
+
+def refresh_deleted_rating_recipes(using):
+    pending = _deleted_rating_recipes(using)
+    if pending:
+        recipe_ids = list(pending)
+        pending.clear()
+        RecipeRating.objects.refresh_aggregates(recipe_ids)
+
+
+@receiver(post_delete, sender=RecipeRating)
+def rating_deleted(sender, instance, using, **kwargs):
+    # e.g. cascades from a deleted user; rate() handles the normal write path.
+    # Every signal registers the flush, the first one to run does the work:
+    # a rolled-back deletion only leaves ids that get refreshed needlessly.
+    _deleted_rating_recipes(using).add(instance.recipe_id)
+    transaction.on_commit(lambda: refresh_deleted_rating_recipes(using), using=using)
+
+
+# 🔹 Response cache хувилбар ахиулах
+CACHE_NAMESPACES = {
+    Recipe: ("recipes",),
+    Nutrition: ("recipes",),
+    RecipeRating: ("recipes",),
+    User: ("recipes",),  # created_by is nested in every recipe
+    Category: ("categories", "recipes"),
+    Ingredient: ("ingredients", "recipes"),
+}
+
+
+def bump_cache_versions(sender, **kwargs):
+    namespaces = CACHE_NAMESPACES[sender]
+    transaction.on_commit(lambda: response_cache.bump(*namespaces))
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(bump_cache_versions, sender=model, dispatch_uid=f"respcache-save-{model.__name__}")
+    post_delete.connect(bump_cache_versions, sender=model, dispatch_uid=f"respcache-delete-{model.__name__}")
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed_cache(sender, **kwargs):
+    if kwargs["action"] in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(lambda: response_cache.bump("recipes"))
+
+
+# 🔹 Recipe.updated_at-ийг холбоотой өгөгдөл өөрчлөгдөхөд шинэчлэх (ETag)
+def touch_recipes(**filters):
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Nutrition)
+@receiver(post_delete, sender=Nutrition)
+def nutrition_changed(sender, instance, **kwargs):
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_touched(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        touch_recipes(pk=instance.pk)
+    elif pk_set:
+        touch_recipes(pk__in=pk_set)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # created_by (username, avatar) is nested in every recipe of the user
+    if not created:
+        touch_recipes(created_by=instance)
+
+
+# 🔹 Зургийн жижигрүүлсэн хувилбарууд
+def image_saved(sender, instance, **kwargs):
+    for model, image_field, variants_field in image_fields():
+        if model is sender:
+            schedule_derivatives(instance, image_field, variants_field)
+
+
+for model, _, _ in image_fields():
+    post_save.connect(image_saved, sender=model, dispatch_uid=f"image-derivatives-{model.__name__}")
+
+
+# 🔹 Текст хайлтын tsvector
+@receiver(post_save, sender=Recipe)
+def recipe_saved_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"name", "description", "cuisine"} & set(update_fields):
+        return
+    update_search_vector(Recipe.objects.filter(pk=instance.pk))
+
+
+# 🔹 Орцын autocomplete
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved_autocomplete(sender, instance, **kwargs):
+    ingredient_id, name = instance.pk, instance.name
+    transaction.on_commit(lambda: ingredient_autocomplete.upsert(ingredient_id, name))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted_autocomplete(sender, instance, **kwargs):
+    ingredient_id = instance.pk
+    transaction.on_commit(lambda: ingredient_autocomplete.remove(ingredient_id))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed_autocomplete(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse or action == "post_clear":
+        if action in ("post_add", "post_remove", "post_clear"):
+            transaction.on_commit(ingredient_autocomplete.invalidate_weights)
+    elif action == "pre_remove" and pk_set:
+        # remove() reports every id it was given, linked or not; add() only the new ones
+        instance._autocomplete_removed = list(
+            sender.objects.filter(recipe_id=instance.pk, ingredient_id__in=pk_set)
+            .values_list("ingredient_id", flat=True)
+        )
+    elif action == "post_add" and pk_set:
+        ingredient_ids = list(pk_set)
+        transaction.on_commit(lambda: ingredient_autocomplete.adjust_weights(ingredient_ids, 1))
+    elif action == "post_remove" and pk_set:
+        ingredient_ids = instance.__dict__.pop("_autocomplete_removed", [])
+        if ingredient_ids:
+            transaction.on_commit(lambda: ingredient_autocomplete.adjust_weights(ingredient_ids, -1))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted_autocomplete(sender, instance, **kwargs):
+    # the through rows go with the recipe without an m2m_changed signal
+    transaction.on_commit(ingredient_autocomplete.invalidate_weights)
+
+
+# 🔹 Илчлэгийн тоон утга
+@receiver(pre_save, sender=Nutrition)
+def nutrition_normalize(sender, instance, **kwargs):
+    normalize_nutrition(instance)
+
+
+# 🔹 Хоол бэлтгэх хугацаа (минут)
+@receiver(pre_save, sender=Recipe)
+def recipe_time_minutes(sender, instance, **kwargs):
+    instance.time_minutes = parse_minutes(instance.time_required)
+
+
+# 🔹 Анхдагч эрэмбийн оноо (jor_app.ranking)
+@receiver(pre_save, sender=Recipe)
+def recipe_rank_score(sender, instance, **kwargs):
+    # created_at is only filled in after pre_save on the first save
+    created_at = instance.created_at or timezone.now()
+    instance.rank_score = ranking.score(instance.rating_sum, instance.rating_count, created_at)
+
+
+# 🔹 Төстэй жорын MinHash/LSH индекс (jor_app.similar)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed_similar(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # ingredient.recipes.clear(): remember the recipes before the rows go
+        instance._similar_recipe_ids = list(instance.recipes.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        similar.index_recipes([instance.pk])
+    elif pk_set:
+        similar.index_recipes(pk_set)
+    else:
+        similar.index_recipes(getattr(instance, "_similar_recipe_ids", ()))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting_similar(sender, instance, **kwargs):
+    # the through rows cascade without an m2m_changed signal
+    instance._similar_recipe_ids = list(instance.recipes.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted_similar(sender, instance, **kwargs):
+    similar.index_recipes(getattr(instance, "_similar_recipe_ids", ()))
+
+
+# 🔹 bulk_create / queryset.update() skip the hooks above
+def bulk_loaded(recipe_ids):
+    """Do what the hooks would have done for recipes written without signals."""
+    for start in range(0, len(recipe_ids), 5000):
+        update_search_vector(Recipe.objects.filter(pk__in=recipe_ids[start:start + 5000]))
+        ranking.refresh(Recipe.objects.filter(pk__in=recipe_ids[start:start + 5000]))
+    for start in range(0, len(recipe_ids), 2000):
+        similar.index_recipes(recipe_ids[start:start + 2000])
+    ingredient_index.invalidate()
+    ingredient_autocomplete.invalidate()
+    response_cache.bump("recipes", "categories", "ingredients")
+
+
+# 🔹 jor_app.metrics: count queries per request; jor_app.text_search: SQLite casefold
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_counter(connection)
+    install_sqlite_functions(connection)
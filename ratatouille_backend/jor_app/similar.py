@@ -0,0 +1,190 @@
+"""
+"Similar recipes" by ingredient-set Jaccard similarity, served from a
+MinHash/LSH index stored in the database.
+
+Every recipe's ingredient set gets a MinHash signature of ``BANDS * ROWS``
+values (``RecipeMinHash``).  The signature is cut into ``BANDS`` bands of
+``ROWS`` values and each band is hashed to one ``RecipeLSHBucket.key``.
+Two recipes with Jaccard similarity ``J`` share at least one key with
+probability ``1 - (1 - J**ROWS) ** BANDS``.  The defaults (42 bands of 3)
+catch nearly every pair above J = 0.5 and few below 0.1.
+
+A query looks up the recipes sharing keys with the recipe (an indexed
+``key IN (...)`` subquery), keeps the ``CANDIDATES`` with the most shared
+keys and ranks them by the Jaccard estimated from their signatures: two
+queries in all.  The
+``Recipe.ingredients`` table is never joined.
+
+The index is kept current by the handlers in ``jor_app.signals``.
+``manage.py rebuild_similar_index`` rebuilds it.  Run that after changing
+BANDS, ROWS or SEED, because signatures made with different settings
+can't be compared.  ``manage.py benchmark_similar`` measures recall and
+latency against the exact answer (``exact_similar``).
+"""
+import hashlib
+import operator
+import random
+from array import array
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Recipe, RecipeLSHBucket, RecipeMinHash
+
+DEFAULTS = {
+    "BANDS": 42,
+    "ROWS": 3,
+    "SEED": 1,
+    "CANDIDATES": 200,
+}
+
+PRIME = (1 << 61) - 1  # Mersenne prime for the universal hash family
+
+
+def get_config(name):
+    return getattr(settings, "SIMILAR_RECIPES", {}).get(name, DEFAULTS[name])
+
+
+# 🔹 Signatures
+
+@lru_cache(maxsize=None)
+def _hash_params(count, seed):
+    rng = random.Random(seed)
+    return tuple((rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(count))
+
+
+def signature(ingredient_ids):
+    """MinHash of an ingredient id set, or None for an empty set."""
+    ids = list(ingredient_ids)
+    if not ids:
+        return None
+    params = _hash_params(get_config("BANDS") * get_config("ROWS"), get_config("SEED"))
+    return [min((a * x + b) % PRIME for x in ids) for a, b in params]
+
+
+def band_keys(sig):
+    """One signed 64-bit LSH key per band of ``sig``."""
+    rows = get_config("ROWS")
+    keys = []
+    for band in range(len(sig) // rows):
+        raw = f"{band}:" + ",".join(map(str, sig[band * rows:(band + 1) * rows]))
+        digest = hashlib.blake2b(raw.encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def pack(sig):
+    """``RecipeMinHash.signature`` bytes: int64s in native (little-endian) order."""
+    return array("q", sig).tobytes()
+
+
+def unpack(data):
+    sig = array("q")
+    sig.frombytes(data)
+    return sig
+
+
+def estimate_jaccard(a, b):
+    return sum(map(operator.eq, a, b)) / len(a)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# 🔹 Index maintenance
+
+def _ingredient_sets(recipe_ids):
+    sets = {recipe_id: set() for recipe_id in recipe_ids}
+    rows = Recipe.ingredients.through.objects.filter(recipe_id__in=recipe_ids)
+    for recipe_id, ingredient_id in rows.values_list("recipe_id", "ingredient_id"):
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+def index_recipes(recipe_ids):
+    """(Re)compute the signatures and buckets of ``recipe_ids``."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    signatures, buckets = [], []
+    for recipe_id, ingredient_ids in _ingredient_sets(recipe_ids).items():
+        sig = signature(ingredient_ids)
+        if sig is None:
+            continue  # no ingredients: nothing to be similar to
+        signatures.append(RecipeMinHash(recipe_id=recipe_id, signature=pack(sig)))
+        buckets.extend(RecipeLSHBucket(recipe_id=recipe_id, key=key) for key in band_keys(sig))
+
+    with transaction.atomic():
+        RecipeLSHBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeMinHash.objects.filter(recipe_id__in=recipe_ids).delete()
+        # recipes deleted since the ids were collected would fail the FK
+        existing = set(Recipe.objects.filter(pk__in=recipe_ids).values_list("pk", flat=True))
+        RecipeMinHash.objects.bulk_create([s for s in signatures if s.recipe_id in existing])
+        RecipeLSHBucket.objects.bulk_create(
+            [b for b in buckets if b.recipe_id in existing], batch_size=5000
+        )
+
+
+def rebuild(batch_size=2000, log=None):
+    """Recompute the whole index; returns the number of recipes indexed."""
+    log = log or (lambda message: None)
+    RecipeLSHBucket.objects.all().delete()
+    RecipeMinHash.objects.all().delete()
+
+    ids = list(Recipe.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(ids), batch_size):
+        index_recipes(ids[start:start + batch_size])
+        log(f"{min(start + batch_size, len(ids))}/{len(ids)} recipes")
+    return RecipeMinHash.objects.count()
+
+
+# 🔹 Query
+
+def similar_to(recipe_id, limit=10):
+    """``[(recipe_id, estimated_jaccard)]`` of the most similar recipes, best first."""
+    data = RecipeMinHash.objects.filter(recipe_id=recipe_id).values_list("signature", flat=True).first()
+    if data is None:
+        return []
+    sig = unpack(data)
+
+    candidates = (
+        RecipeLSHBucket.objects.filter(key__in=band_keys(sig))
+        .exclude(recipe_id=recipe_id)
+        .values("recipe_id")
+        .annotate(hits=Count("id"))
+        .order_by("-hits", "recipe_id")
+        .values("recipe_id")[: get_config("CANDIDATES")]
+    )
+    scored = [
+        (candidate, round(estimate_jaccard(sig, unpack(other)), 3))
+        for candidate, other in RecipeMinHash.objects.filter(recipe_id__in=candidates)
+        .values_list("recipe_id", "signature")
+    ]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+def exact_similar(recipe_id, limit=10):
+    """
+    The exact answer ``similar_to`` approximates, from ``Recipe.ingredients``:
+    every recipe sharing an ingredient is a candidate.  Used by the benchmark.
+    """
+    through = Recipe.ingredients.through
+    own = set(through.objects.filter(recipe_id=recipe_id).values_list("ingredient_id", flat=True))
+    if not own:
+        return []
+    candidate_ids = (
+        through.objects.filter(ingredient_id__in=own).exclude(recipe_id=recipe_id)
+        .values_list("recipe_id", flat=True)
+    )
+    sets = {}
+    for candidate, ingredient_id in through.objects.filter(
+        recipe_id__in=candidate_ids
+    ).values_list("recipe_id", "ingredient_id").iterator(chunk_size=5000):
+        sets.setdefault(candidate, set()).add(ingredient_id)
+    scored = [(candidate, round(jaccard(own, ingredients), 3)) for candidate, ingredients in sets.items()]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
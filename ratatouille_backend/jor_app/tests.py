@@ -1,3 +1,1552 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import benchmark, db_router, images, metrics, query_audit, ranking, recommender, renderers, similar
+from .autocomplete import IngredientAutocomplete, ingredient_autocomplete
+from .cache import response_cache
+from .cooking_time import parse_minutes
+from .models import *
+from .nutrition import parse_quantity
+from .search_index import IngredientIndex, ingredient_index
+from .signals import bulk_loaded
+from .views import RecipeViewSet, order_recipes
+
+
+def make_recipes(count, category, user, ingredients):
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            name=f"Recipe {i}",
+            image="recipe_images/test.jpg",
+            time_required="30 min",
+            servings=2,
+            category=category,
+            created_by=user,
+        )
+        recipe.ingredients.set(ingredients)
+        Nutrition.objects.create(recipe=recipe, calories="200", protein="10")
+        recipes.append(recipe)
+    return recipes
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class PantrySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("p@example.com", "p", "pw")
+        category = Category.objects.create(name="Breakfast")
+        cls.egg, cls.milk, cls.flour, cls.salt = [
+            Ingredient.objects.create(name=n) for n in ("egg", "milk", "flour", "salt")
+        ]
+        cls.omelette, cls.pancake, cls.custard, cls.bread = make_recipes(4, category, user, [])
+        cls.omelette.ingredients.set([cls.egg, cls.milk])
+        cls.pancake.ingredients.set([cls.egg, cls.milk, cls.flour])
+        cls.custard.ingredients.set([cls.egg, cls.milk, cls.flour, cls.salt])
+        cls.bread.ingredients.set([cls.flour, cls.salt])
+
+    def setUp(self):
+        ingredient_index.invalidate()
+
+    def ids(self, names, index=ingredient_index, **kwargs):
+        return [m.recipe_id for m in index.search(names, **kwargs)]
+
+    def test_ranked_by_missing_then_matched(self):
+        matches = ingredient_index.search(["egg", "milk", "caviar"])
+        self.assertEqual(
+            [(m.recipe_id, m.matched, m.missing) for m in matches],
+            [(self.omelette.id, 2, 0), (self.pancake.id, 2, 1), (self.custard.id, 2, 2)],
+        )
+        self.assertEqual(
+            self.ids(["flour", "salt"]), [self.bread.id, self.custard.id, self.pancake.id]
+        )
+        self.assertEqual(self.ids(["caviar"]), [])
+
+    def test_max_missing_and_limit(self):
+        self.assertEqual(self.ids(["egg", "milk"], max_missing=1), [self.omelette.id, self.pancake.id])
+        self.assertEqual(self.ids(["egg", "milk"], max_missing=0), [self.omelette.id])
+        self.assertEqual(self.ids(["egg", "milk"], limit=2), [self.omelette.id, self.pancake.id])
+        self.assertEqual(self.ids(["egg", "milk"], max_missing=1, limit=1), [self.omelette.id])
+
+    def test_ingredients_must_be_a_list_of_names(self):
+        for path in ("/api/search_recipes/", "/api/async/search_recipes/"):
+            for ingredients in ("egg", [{"x": 1}], [["egg"]], {"egg": 1}):
+                response = self.client.post(path, {"ingredients": ingredients}, content_type="application/json")
+                self.assertEqual(response.status_code, 400, (path, ingredients))
+                self.assertIn("ingredients", response.json())
+            response = self.client.post(path, {"ingredients": ["egg"]}, content_type="application/json")
+            self.assertEqual(len(response.json()), 3)
+
+    def test_other_workers_follow_changes(self):
+        other = IngredientIndex()  # another worker's copy
+        self.assertEqual(self.ids(["egg"], other), [self.omelette.id, self.pancake.id, self.custard.id])
+        self.ids(["egg"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.ingredients.add(self.egg)
+        with self.assertNumQueries(0):  # the writer applied the change to its own copy
+            self.assertIn(self.bread.id, self.ids(["egg"]))
+        self.assertIn(self.bread.id, self.ids(["egg"], other))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.omelette.ingredients.remove(self.milk)
+        self.assertEqual(self.ids(["milk"], other), [self.pancake.id, self.custard.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.name = "sea salt"
+            self.salt.save()
+        self.assertEqual(self.ids(["salt"], other), [])
+        self.assertEqual(self.ids(["sea salt"], other), [self.bread.id, self.custard.id])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids(["sea salt"]), [self.bread.id, self.custard.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.custard.delete()
+        self.assertNotIn(self.custard.id, self.ids(["egg"], other))
+
+    def test_bulk_loads_reach_other_workers(self):
+        other = IngredientIndex()
+        self.assertEqual(self.ids(["salt"], other), [self.bread.id, self.custard.id])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(recipe=self.omelette, ingredient=self.salt),
+        ])
+        bulk_loaded([self.omelette.id])
+        self.assertEqual(self.ids(["salt"], other), [self.bread.id, self.omelette.id, self.custard.id])
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("k@example.com", "k", "pw")
+        cls.soup, salad = Category.objects.create(name="Soup"), Category.objects.create(name="Salad")
+        cls.recipes = make_recipes(11, cls.soup, user, [])
+        Recipe.objects.filter(pk__in=[r.pk for r in cls.recipes[6:]]).update(category=salad)
+        # ties on the leading column of every ordering
+        tied = [r.pk for r in cls.recipes[2:7]]
+        Recipe.objects.filter(pk__in=tied).update(
+            created_at=cls.recipes[2].created_at, rank_score=3.5, rating=4.0, time_minutes=15,
+        )
+
+    def walk(self, url, **params):
+        ids, seen_pages = [], 0
+        response = self.client.get(url, {**params, "page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            self.assertLessEqual(len(body["results"]), 2)
+            ids += [r["id"] for r in body["results"]]
+            seen_pages += 1
+            if body["next"] is None:
+                return ids
+            self.assertLess(seen_pages, 20)
+            response = self.client.get(body["next"])
+
+    def test_every_ordering_walks_to_the_end(self):
+        for order in RecipeViewSet.ORDERINGS:
+            expected = list(order_recipes(Recipe.objects.all(), order).values_list("id", flat=True))
+            ids = self.walk("/api/recipes/", order=order)
+            self.assertEqual(ids, expected, order)
+            self.assertEqual(len(set(ids)), Recipe.objects.count(), order)
+
+    def test_by_category_and_exact_last_page(self):
+        soup = list(
+            order_recipes(Recipe.objects.filter(category=self.soup), "new").values_list("id", flat=True)
+        )
+        self.assertEqual(len(soup), 6)  # three full pages, no empty fourth one
+        self.assertEqual(self.walk("/api/recipes/by_category/", category="Soup", order="new"), soup)
+
+    def test_bad_cursors(self):
+        def encode(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+        for order, cursor in (
+            ("rank", "not base64!"),
+            ("rank", encode({"a": 1})),
+            ("rank", encode([1.0])),
+            ("rank", encode([{"a": 1}, 1])),
+            ("new", encode(["not a date", 1])),
+            ("new", encode(["2025-13-45T00:00:00Z", 1])),
+            ("new", encode([{"a": 1}, 1])),
+            ("new", encode([[2025], 1])),
+            ("quick", encode([15, "x"])),
+        ):
+            response = self.client.get("/api/recipes/", {"order": order, "cursor": cursor})
+            self.assertEqual(response.status_code, 404, (order, cursor))
+            self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class QueryBudgetTests(TestCase):
+    """
+    Every endpoint that emits recipes must run in a constant number of
+    queries, whatever the page size.  Each test renders a small and a large
+    result set and checks both against the same budget.
+
+    Catalogue detail GETs spend one extra query on the conditional-GET
+    validators; lists take theirs from the cache namespace versions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cook@example.com", "cook", "pw")
+        cls.category = Category.objects.create(name="Breakfast")
+        cls.ingredients = [Ingredient.objects.create(name=n) for n in ("egg", "milk", "flour")]
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_index.invalidate()
+
+    def seed(self, count):
+        # run on_commit hooks so the in-process search index sees the rows
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_recipes(count, self.category, self.user, self.ingredients)
+
+    def assertBudget(self, budget, method, url, sizes=(2, 15), **kwargs):
+        created = 0
+        for size in sizes:
+            self.seed(size - created)
+            created = size
+            with self.assertNumQueries(budget):
+                response = getattr(self.client, method)(url, **kwargs)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            results = body["results"] if isinstance(body, dict) else body
+            self.assertEqual(len(results), size)
+
+    def test_recipe_list(self):
+        self.assertBudget(2, "get", "/api/recipes/")
+
+    def test_recipe_list_orders(self):
+        self.seed(3)
+        for order in ("rank", "rating", "new", "old"):
+            with self.assertNumQueries(2):
+                self.client.get("/api/recipes/", {"order": order})
+
+    def test_recipe_detail(self):
+        recipe = self.seed(1)[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/recipes/{recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_by_category(self):
+        self.assertBudget(
+            2, "get", "/api/recipes/by_category/", data={"category": "Breakfast"}
+        )
+
+    def test_search_recipes(self):
+        ingredient_index.build()
+        self.assertBudget(
+            2, "post", "/api/search_recipes/",
+            data={"ingredients": ["egg", "milk"]}, format="json",
+        )
+
+    def test_my_wishlist(self):
+        self.client.force_authenticate(self.user)
+        created = 0
+        for size in (2, 15):
+            for recipe in self.seed(size - created):
+                Wishlist.objects.create(user=self.user, recipe=recipe)
+            created = size
+            with self.assertNumQueries(2):
+                response = self.client.get("/api/wishlist/my/")
+            self.assertEqual(len(response.json()), size)
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("c@example.com", "c", "pw")
+        cls.category = Category.objects.create(name="Soup")
+        cls.recipe = make_recipes(1, cls.category, cls.user, [])[0]
+
+    def setUp(self):
+        response_cache.backend.clear()
+        self.client = APIClient()
+
+    def lookups(self, url, **params):
+        before = response_cache.stats()
+        body = self.client.get(url, params).json()
+        after = response_cache.stats()
+        return body, {name: after[name] - before[name] for name in after}
+
+    def test_hit_after_miss(self):
+        _, counted = self.lookups("/api/categories/")
+        self.assertEqual(counted, {"hits": 0, "misses": 1})
+        with self.assertNumQueries(0):
+            _, counted = self.lookups("/api/categories/")
+        self.assertEqual(counted, {"hits": 1, "misses": 0})
+        _, counted = self.lookups("/api/categories/", page=2)  # other params, other entry
+        self.assertEqual(counted, {"hits": 0, "misses": 1})
+
+    def test_writes_bump_their_namespaces(self):
+        self.lookups("/api/categories/")
+        self.lookups("/api/recipes/")
+        self.lookups("/api/ingredients/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Salad")
+        body, counted = self.lookups("/api/categories/")
+        self.assertEqual(counted["misses"], 1)
+        self.assertEqual([c["name"] for c in body], ["Soup", "Salad"])
+        _, counted = self.lookups("/api/ingredients/")  # not read by the category list
+        self.assertEqual(counted, {"hits": 1, "misses": 0})
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/recipes/{self.recipe.id}/rate/", {"rating": 5}, format="json")
+        body, counted = self.lookups("/api/recipes/")
+        self.assertEqual(counted["misses"], 1)
+        self.assertEqual(body["results"][0]["average_rating"], 5.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.ingredients.add(Ingredient.objects.create(name="leek"))
+        _, counted = self.lookups("/api/ingredients/")
+        self.assertEqual(counted["misses"], 1)
+        body, counted = self.lookups(f"/api/recipes/{self.recipe.id}/")
+        self.assertEqual(counted["misses"], 1)
+        self.assertEqual(len(body["ingredients"]), 1)
+
+    def test_lookups_make_no_backend_writes(self):
+        self.lookups("/api/categories/")
+        backend = response_cache.backend
+        with mock.patch.object(backend, "incr") as incr, mock.patch.object(backend, "add") as add:
+            _, counted = self.lookups("/api/categories/")
+        self.assertEqual(counted["hits"], 1)
+        incr.assert_not_called()
+        add.assert_not_called()
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Dinner")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_matching_etag_skips_serialization(self):
+        etag = self.client.get("/api/categories/")["ETag"]
+        with self.assertNumQueries(0):  # lists: namespace versions only
+            response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        recipe = make_recipes(1, self.category, User.objects.create_user("e@example.com", "e", "pw"), [])[0]
+        etag = self.client.get(f"/api/recipes/{recipe.id}/")["ETag"]
+        with self.assertNumQueries(1):  # detail: the row's updated_at
+            response = self.client.get(f"/api/recipes/{recipe.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_on_write(self):
+        etag = self.client.get("/api/categories/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="Lunch")
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_changes_on_delete(self):
+        Category.objects.create(name="Lunch")
+        etag = self.client.get("/api/categories/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        response = self.client.get("/api/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_follows_query_and_related_writes(self):
+        user = User.objects.create_user("e@example.com", "e", "pw")
+        recipe = make_recipes(1, self.category, user, [])[0]
+        etag = self.client.get("/api/recipes/")["ETag"]
+        self.assertNotEqual(self.client.get("/api/recipes/", {"order": "new"})["ETag"], etag)
+        self.assertEqual(self.client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeRating.objects.rate(user, recipe.id, 5)
+        self.assertEqual(self.client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get("/api/recipes/")["ETag"]
+        call_command("refresh_ranking", stdout=StringIO())
+        self.assertEqual(self.client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+def png(width, height, color=(200, 80, 40)):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"WIDTHS": (160, 320, 640, 1280)})
+class ImageDerivativeTests(TransactionTestCase):
+    """Uploads go through the real thread pool, so the rows must be committed."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.user = User.objects.create_user("i@example.com", "i", "pw")
+        self.category = Category.objects.create(name="Soup")
+        self.ingredient = Ingredient.objects.create(name="leek")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name="soup.png"):
+        # one transaction, so the job starts after the request's last write;
+        # SQLite's shared in-memory test database can't take concurrent writers
+        with transaction.atomic():
+            response = self.client.post("/api/recipes/", {
+                "name": "Soup", "time_required": "30 min", "servings": 2,
+                "category": self.category.id, "ingredients": [self.ingredient.id],
+                "image": SimpleUploadedFile(name, content, content_type="image/png"),
+            }, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.wait_for_workers()
+        return Recipe.objects.get(pk=response.json()["id"])
+
+    def wait_for_workers(self):
+        self.assertIsNotNone(images._executor, "derivatives were not queued on the thread pool")
+        images._executor.shutdown(wait=True)
+        images._executor = None
+
+    def test_upload_generates_hashed_webp_without_upscaling(self):
+        content = png(800, 400)
+        recipe = self.upload(content)
+        digest = hashlib.sha1(content).hexdigest()[:16]
+
+        variants = recipe.image_variants
+        self.assertEqual(variants["source"], recipe.image.name)
+        self.assertEqual(set(variants["widths"]), {"160", "320", "640"})  # 1280 would upscale
+        for width, name in variants["widths"].items():
+            self.assertEqual(name, f"derivatives/recipe_images/{digest}_{width}.webp")
+            with default_storage.open(name) as fh, Image.open(fh) as image:
+                self.assertEqual(image.format, "WEBP")
+                self.assertEqual(image.size, (int(width), int(width) // 2))
+
+        images_map = self.client.get(f"/api/recipes/{recipe.id}/").json()["images"]
+        self.assertEqual(images_map, {
+            width: f"http://testserver{settings.MEDIA_URL}{name}" for width, name in variants["widths"].items()
+        })
+
+        # the same bytes again: same names, no second copy on disk
+        again = self.upload(content, name="other.png")
+        self.assertEqual(again.image_variants["widths"], variants["widths"])
+        folder = os.path.join(settings.MEDIA_ROOT, "derivatives", "recipe_images")
+        self.assertEqual(len(os.listdir(folder)), 3)
+
+    def test_small_image_keeps_its_size(self):
+        recipe = self.upload(png(100, 100))
+        self.assertEqual(set(recipe.image_variants["widths"]), {"160"})
+        with default_storage.open(recipe.image_variants["widths"]["160"]) as fh, Image.open(fh) as image:
+            self.assertEqual(image.size, (100, 100))
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class TextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("t@example.com", "t", "pw")
+        category = Category.objects.create(name="Шөл")
+        cls.buuz, cls.soup, cls.salad, cls.other = make_recipes(4, category, user, [])
+        for recipe, name, cuisine, description in (
+            (cls.buuz, "Бууз", "Монгол", "Уурандаа жигнэсэн махтай бууз"),
+            (cls.soup, "Гурилтай шөл", "Монгол", "Бууз шиг амттай, халуун шөл"),
+            (cls.salad, "Greek salad", "Greek", "Feta, olives and cucumber"),
+            (cls.other, "Цуйван", "Бууз-Монгол", "Гоймонтой хуураг"),
+        ):
+            recipe.name, recipe.cuisine, recipe.description = name, cuisine, description
+            recipe.save()
+
+    def ids(self, text):
+        response = self.client.get("/api/recipes/search/", {"q": text})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [r["id"] for r in response.json()["results"]]
+
+    @skipIf(connection.vendor == "postgresql", "the fallback only runs off PostgreSQL")
+    def test_fallback_folds_cyrillic_case(self):
+        expected = [self.buuz.id, self.other.id, self.soup.id]  # name, cuisine, description
+        for text in ("бууз", "БУУЗ", "Бууз", "бУуЗ"):
+            self.assertEqual(self.ids(text), expected, text)
+        self.assertEqual(self.ids("GREEK"), [self.salad.id])
+        self.assertEqual(self.ids("МОНГОЛ"), [self.other.id, self.soup.id, self.buuz.id])
+        self.assertEqual(self.ids("%"), [])
+        self.assertEqual(self.client.get("/api/recipes/search/", {"q": " "}).status_code, 400)
+
+    @skipUnless(connection.vendor == "postgresql", "full-text and trigram ranking need PostgreSQL")
+    def test_postgres_ranking(self):
+        self.assertEqual(self.ids("бууз")[0], self.buuz.id)
+        self.assertEqual(set(self.ids("БУУЗ")), set(self.ids("бууз")))
+        self.assertIn(self.buuz.id, self.ids("буз"))  # trigram typo tolerance on the name
+        self.assertEqual(self.ids("greek salad"), [self.salad.id])
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("ac@example.com", "ac", "pw")
+        cls.cheese, cls.little, cls.cabbage, cls.salt, cls.salami = [
+            Ingredient.objects.create(name=n) for n in ("Бяслаг", "бяцхан лууван", "Байцаа", "salt", "Salami")
+        ]
+        cls.recipes = make_recipes(3, Category.objects.create(name="Soup"), user, [cls.little])
+        cls.recipes[0].ingredients.add(cls.salt)
+        cls.recipes[1].ingredients.add(cls.salt, cls.salami)
+
+    def setUp(self):
+        ingredient_autocomplete.invalidate()
+
+    def suggest(self, prefix, index=ingredient_autocomplete, **kwargs):
+        return [(name, count) for _, name, count in index.suggest(prefix, **kwargs)]
+
+    def test_prefix_is_case_folded(self):
+        self.assertEqual(self.suggest("БЯ"), [("бяцхан лууван", 3), ("Бяслаг", 0)])
+        self.assertEqual(self.suggest("бяс"), [("Бяслаг", 0)])
+        self.assertEqual(self.suggest("  sal"), [("salt", 2), ("Salami", 1)])
+        self.assertEqual(self.suggest("х"), [])
+        self.assertEqual(self.suggest(""), [])
+
+    def test_weights_order_and_limit(self):
+        self.assertEqual(self.suggest("б", limit=2), [("бяцхан лууван", 3), ("Байцаа", 0)])
+        self.assertEqual(
+            self.suggest("б", weighted=False), [("Байцаа", 0), ("Бяслаг", 0), ("бяцхан лууван", 3)]
+        )
+        response = self.client.get("/api/ingredients/autocomplete/", {"q": "SA", "limit": 1})
+        self.assertEqual(response.json(), [{"id": self.salt.id, "name": "salt", "recipe_count": 2}])
+        self.assertEqual(self.client.get("/api/ingredients/autocomplete/", {"limit": 0}).status_code, 400)
+
+    def test_weights_follow_links_exactly(self):
+        self.suggest("s")
+        recipe = self.recipes[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.ingredients.add(self.salt)
+            recipe.ingredients.add(self.salt)       # already linked: no second count
+            recipe.ingredients.remove(self.salami)  # never linked: must not count down
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("sal"), [("salt", 3), ("Salami", 1)])
+
+        fresh = IngredientAutocomplete()
+        self.assertEqual(self.suggest("sal", fresh), self.suggest("sal"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].ingredients.remove(self.salami, self.cheese)
+        self.assertEqual(self.suggest("sal"), [("salt", 3), ("Salami", 0)])
+
+    def test_other_workers_follow_changes(self):
+        other = IngredientAutocomplete()  # another worker's copy
+        self.assertEqual(self.suggest("бя", other), [("бяцхан лууван", 3), ("Бяслаг", 0)])
+        self.suggest("бя")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheese.name = "Бяслагтай талх"
+            self.cheese.save()
+            Ingredient.objects.create(name="Бялуу")
+        with self.assertNumQueries(0):  # the writer applied both changes to its own copy
+            self.assertEqual(len(self.suggest("бя")), 3)
+        self.assertEqual(
+            self.suggest("бя", other), [("бяцхан лууван", 3), ("Бялуу", 0), ("Бяслагтай талх", 0)]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].ingredients.add(self.cheese)
+        self.assertEqual(self.suggest("бяс", other), [("Бяслагтай талх", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.little.delete()
+        self.assertEqual([name for name, _ in self.suggest("бя", other)], ["Бяслагтай талх", "Бялуу"])
+
+        Ingredient.objects.bulk_create([Ingredient(name="Бялзуухай")])
+        bulk_loaded([])
+        self.assertIn(("Бялзуухай", 0), self.suggest("бя", other))
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class ImportRecipesTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "recipes.ndjson")
+
+    def write(self, records):
+        with open(self.path, "w", encoding="utf-8") as fh:
+            for record in records:
+                fh.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+
+    def record(self, i, **extra):
+        return {
+            "name": f"Бууз {i}", "time_required": "1 цаг", "servings": 4, "category": "Үндсэн хоол",
+            "ingredients": ["мах", "гурил"], "nutrition": {"calories": "350 ккал"}, **extra,
+        }
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command("import_recipes", self.path, "--batch-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def checkpoint(self):
+        with open(f"{self.path}.checkpoint") as fh:
+            return int(fh.read())
+
+    def test_streams_batches(self):
+        other = IngredientIndex()  # a running worker's copy
+        other.build()
+        self.write([self.record(i) for i in range(5)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import()
+
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Ingredient.objects.count(), 2)
+        recipe = Recipe.objects.get(name="Бууз 3")
+        self.assertEqual(recipe.time_minutes, 60)
+        self.assertEqual(recipe.nutrition.calories_kcal, 350)
+        self.assertEqual(self.checkpoint(), 5)
+        self.assertEqual(len(other.search(["мах", "гурил"])), 5)
+
+    def test_rejects_string_ingredients(self):
+        self.write([self.record(0), self.record(1), self.record(2, ingredients="мах")])
+        with self.assertRaisesMessage(CommandError, "line 3: 'ingredients' must be a list of strings"):
+            self.run_import()
+        # the batch before the bad line is already committed
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(self.checkpoint(), 2)
+
+    def test_skips_blank_ingredient_names(self):
+        self.write([self.record(0, ingredients=[" мах ", "  ", ""])])
+        self.run_import()
+        self.assertEqual(list(Ingredient.objects.values_list("name", flat=True)), ["мах"])
+        self.assertEqual(Recipe.objects.get().ingredients.count(), 1)
+
+    def test_resume_after_failed_batch(self):
+        records = [self.record(i) for i in range(5)]
+        records[3]["servings"] = "many"
+        self.write(records)
+        with self.assertRaisesMessage(CommandError, "Batch starting at record 3 failed"):
+            self.run_import()
+        self.assertEqual(Recipe.objects.count(), 2)  # the failed batch rolled back
+        self.assertEqual(self.checkpoint(), 2)
+
+        records[3]["servings"] = 2
+        self.write(records)
+        self.assertIn("Resuming after 2 record(s)", self.run_import("--resume"))
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("name", flat=True)), [f"Бууз {i}" for i in range(5)]
+        )
+        self.assertEqual(self.checkpoint(), 5)
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class BenchmarkTests(TestCase):
+    def snapshot(self):
+        return (
+            list(Recipe.objects.order_by("id").values_list("name", "cuisine", "category__name", "rating_count")),
+            list(Recipe.ingredients.through.objects.order_by("id").values_list("ingredient__name", flat=True)),
+        )
+
+    def test_dataset_is_deterministic(self):
+        counts = benchmark.generate_dataset(300, seed=7, batch_size=100)
+        self.assertEqual(counts["recipes"], 300)
+        self.assertEqual(RecipeRating.objects.count(), counts["ratings"])
+        first = self.snapshot()
+
+        benchmark.flush_dataset()
+        self.assertFalse(Recipe.objects.exists())
+        benchmark.generate_dataset(300, seed=7, batch_size=100)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_run_and_compare(self):
+        benchmark.generate_dataset(100, seed=1)
+        results = benchmark.run_benchmarks(iterations=3, warmup=1)
+        self.assertEqual(set(results["endpoints"]), set(benchmark.scenario_names()))
+        for row in results["endpoints"].values():
+            self.assertEqual(row["errors"], 0)
+            self.assertGreater(row["queries"], 0)
+
+        slower = {"endpoints": {
+            name: {**row, "p95_ms": row["p95_ms"] * 2 + 1, "queries": row["queries"] + 1}
+            for name, row in results["endpoints"].items()
+        }}
+        rows = benchmark.compare_results(results, slower)
+        self.assertTrue(all(row["regressions"] for row in rows))
+        self.assertFalse(any(row["regressions"] for row in benchmark.compare_results(results, results)))
+
+    def test_render_benchmark(self):
+        benchmark.generate_dataset(10, seed=1)
+        results = benchmark.render_benchmark(sizes=(5, 30), iterations=2)
+        self.assertEqual(set(results["sizes"]), {"5", "30"})
+        rows = results["sizes"]["30"]
+        self.assertIn("orjson", rows)
+        self.assertEqual(rows["orjson"]["bytes"], rows["drf_json"]["bytes"])
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry._reset()
+        response_cache.backend.clear()
+        self.client = APIClient()
+
+    def sample(self, text, name, **labels):
+        prefix = f"{metrics.PREFIX}_{name}{metrics._labels(**labels)} "
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        self.fail(f"{prefix!r} not in metrics")
+
+    def test_records_per_view(self):
+        Category.objects.create(name="Soup")
+        for _ in range(2):
+            self.client.get("/api/categories/")
+        text = self.client.get("/metrics/").content.decode()
+
+        self.assertEqual(self.sample(text, "http_requests_total", view="category-list", method="GET", status="200"), 2)
+        self.assertEqual(
+            self.sample(text, "http_request_duration_seconds_count", view="category-list", method="GET"), 2
+        )
+        self.assertGreater(self.sample(text, "db_queries_total", view="category-list", method="GET"), 0)
+        self.assertEqual(self.sample(text, "response_cache_lookups_total", view="category-list", result="hit"), 1)
+
+    def test_aggregates_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS={"DIR": directory}):
+            self.client.get("/api/categories/")
+            other = metrics.registry.snapshot()
+            with open(os.path.join(directory, "metrics_999999.json"), "w") as fh:
+                json.dump(other, fh)
+            text = metrics.render()
+        self.assertEqual(self.sample(text, "http_requests_total", view="category-list", method="GET", status="200"), 2)
+
+    def test_scrape_access(self):
+        with override_settings(METRICS={"TOKEN": "s3cret", "ALLOWED_IPS": ["10.0.0.0/8"]}):
+            self.assertEqual(self.client.get("/metrics/").status_code, 404)  # 127.0.0.1
+            self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="10.1.2.3").status_code, 200)
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 404)
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        with override_settings(METRICS={"ALLOWED_IPS": []}):
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code, 404)
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class AsyncReadPathTests(TestCase):
+    """The /api/async/ views must answer exactly like their DRF counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("async@example.com", "async", "pw")
+        cls.category = Category.objects.create(name="Soup")
+        cls.ingredients = [Ingredient.objects.create(name=n) for n in ("salt", "beef", "onion")]
+        cls.recipes = make_recipes(25, cls.category, cls.user, cls.ingredients)
+        for recipe in cls.recipes[:3]:
+            Wishlist.objects.create(user=cls.user, recipe=recipe)
+
+    def assertSame(self, path, sync_path=None, method="get", **kwargs):
+        sync_response = getattr(self.client, method)(sync_path or path.replace("/api/async/", "/api/"), **kwargs)
+        async_response = getattr(self.client, method)(path, **kwargs)
+        self.assertEqual(async_response.status_code, sync_response.status_code, async_response.content)
+        # only the pagination links may differ, by their path
+        self.assertEqual(
+            json.loads(async_response.content.decode().replace("/api/async/", "/api/")),
+            sync_response.json(),
+        )
+        return async_response
+
+    def test_read_endpoints_match(self):
+        recipe = self.recipes[0]
+        body = self.assertSame("/api/async/recipes/").json()
+        self.assertSame(body["next"].replace("/api/recipes/", "/api/async/recipes/"), body["next"])
+        self.assertSame("/api/async/recipes/", data={"order": "new", "page_size": 5})
+        self.assertSame(f"/api/async/recipes/{recipe.id}/")
+        self.assertSame("/api/async/recipes/999999/")
+        self.assertSame("/api/async/recipes/by_category/", data={"category": "Soup"})
+        self.assertSame("/api/async/recipes/search/", data={"q": "Recipe 1"})
+        self.assertSame("/api/async/categories/")
+        self.assertSame(f"/api/async/categories/{self.category.id}/")
+        self.assertSame("/api/async/ingredients/")
+        ingredient_index.invalidate()
+        self.assertSame(
+            "/api/async/search_recipes/", method="post",
+            data={"ingredients": ["salt", "beef"]}, content_type="application/json",
+        )
+
+    def test_wishlist_uses_jwt(self):
+        self.assertEqual(self.client.get("/api/async/wishlist/my/").status_code, 401)
+        self.assertEqual(
+            self.client.get("/api/async/wishlist/my/", HTTP_AUTHORIZATION="Bearer nonsense").status_code, 401
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        response = self.assertSame("/api/async/wishlist/my/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(len(response.json()), 3)
+        self.assertSame("/api/async/wishlist/my/", data={"ids": 1}, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    @skipIf(renderers.msgpack is None, "msgpack is not installed")
+    def test_accept_header_negotiation(self):
+        for path in (f"/api/async/recipes/{self.recipes[0].id}/", "/api/async/categories/"):
+            sync_response = self.client.get(path.replace("/api/async/", "/api/"), HTTP_ACCEPT="application/msgpack")
+            async_response = self.client.get(path, HTTP_ACCEPT="application/msgpack")
+            self.assertEqual(async_response["Content-Type"], sync_response["Content-Type"])
+            self.assertEqual(async_response.content, sync_response.content)
+            self.assertIn("Accept", async_response["Vary"])
+        self.assertEqual(self.assertSame("/api/async/recipes/", HTTP_ACCEPT="application/xml").status_code, 406)
+        self.assertSame("/api/async/categories/", data={"format": "json"})
+
+    @override_settings(RESPONSE_CACHE={"ENABLED": True})
+    def test_cache_and_etag(self):
+        response_cache.backend.clear()
+        recipe = self.recipes[0]
+        for path, params in (
+            ("/api/async/recipes/", {"page_size": 5}),
+            (f"/api/async/recipes/{recipe.id}/", {"expand": "category"}),
+            ("/api/async/categories/", {}),
+        ):
+            first = self.client.get(path, params)
+            etag = first["ETag"]
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(path, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                cached = self.client.get(path, params)
+            self.assertEqual(cached.json(), first.json())
+            self.assertEqual(cached["ETag"], etag)
+
+        # the nested category changes the recipe's ETag, like the sync view's
+        etag = self.client.get(f"/api/async/recipes/{recipe.id}/", {"expand": "category"})["ETag"]
+        self.category.name = "Шөл"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get(f"/api/async/recipes/{recipe.id}/", {"expand": "category"},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["category"]["name"], "Шөл")
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class NutritionFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("n@example.com", "n", "pw")
+        cls.soup = Category.objects.create(name="Soup")
+        salad = Category.objects.create(name="Salad")
+        cls.light, cls.heavy, cls.salad = make_recipes(3, cls.soup, user, [])
+        cls.salad.category = salad
+        cls.salad.save()
+        for recipe, calories, protein in (
+            (cls.light, "180 ккал", "25г"), (cls.heavy, "2930 kJ", "1,5 гр"), (cls.salad, "90", "4 g"),
+        ):
+            recipe.nutrition.calories, recipe.nutrition.protein = calories, protein
+            recipe.nutrition.save()
+
+    def ids(self, url="/api/recipes/", **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {r["id"] for r in response.json()["results"]}
+
+    def test_text_is_parsed(self):
+        self.heavy.nutrition.refresh_from_db()
+        self.assertAlmostEqual(self.heavy.nutrition.calories_kcal, 700.29)
+        self.assertEqual(self.heavy.nutrition.protein_g, 1.5)
+
+    def test_parse_quantity(self):
+        for text, kind, value in (
+            ("350 ккал", "energy", 350), ("300-350", "energy", 325), ("1 kJ", "energy", 0.24),
+            ("1,5 кг", "mass", 1500), ("250 мг", "mass", 0.25), ("0.5 oz", "mass", 14.17),
+            ("10 mcg", "mass", 0.0), ("12", "mass", 12),
+            ("20 ширхэг", "mass", None), ("20 ширхэг", "energy", None), ("350 ккал", "mass", None),
+            ("", "mass", None), ("олон", "mass", None),
+        ):
+            self.assertEqual(parse_quantity(text, kind), value, text)
+
+    def test_range_filters(self):
+        self.assertEqual(self.ids(calories_max=200), {self.light.id, self.salad.id})
+        self.assertEqual(self.ids(calories_max=200, protein_min=10), {self.light.id})
+        self.assertEqual(self.ids(calories_min=100, calories_max=1000), {self.light.id, self.heavy.id})
+        self.assertEqual(
+            self.ids("/api/recipes/by_category/", category="Soup", calories_max=200), {self.light.id}
+        )
+        self.assertEqual(self.client.get("/api/recipes/", {"fat_max": "a lot"}).status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class CookingTimeTests(TestCase):
+    def test_parse_minutes(self):
+        for text, minutes in (
+            ("30 min", 30), ("45мин", 45), ("1 цаг", 60), ("1,5 ц", 90), ("1 цаг 30 минут", 90),
+            ("1h 30m", 90), ("2 hours", 120), ("1:30", 90), ("хагас цаг", 30), ("2 хоног", 2880),
+            ("20-30 минут", 30), ("4 servings", None), ("", None),
+            ("30 хоног", 43200), ("31 хоног", None), ("99999999999 цаг", None), ("1.5.5 цаг", None),
+            ("1/2 hour", 30), ("1 1/2 цаг", 90), ("1/0 цаг", None), ("2 hrs", 120), ("5 mins", 5),
+            ("10 минутаас 15 минут", 15), ("10-аас 15 минут", 15), ("1 цагаас 1 цаг 30 минут", 90),
+            ("30 минутаас", 30), ("from 10 to 15 minutes", 15),
+        ):
+            self.assertEqual(parse_minutes(text), minutes, text)
+
+    def test_filter_and_order(self):
+        user = User.objects.create_user("t@example.com", "t", "pw")
+        quick, slow, unknown = make_recipes(3, Category.objects.create(name="Soup"), user, [])
+        for recipe, text in ((quick, "20 минут"), (slow, "1.5 цаг"), (unknown, "удаан")):
+            recipe.time_required = text
+            recipe.save()
+
+        results = self.client.get("/api/recipes/", {"time_max": 30}).json()["results"]
+        self.assertEqual([r["id"] for r in results], [quick.id])
+        self.assertEqual(results[0]["time_minutes"], 20)
+
+        results = self.client.get("/api/recipes/", {"order": "quick", "page_size": 1}).json()
+        self.assertEqual([r["id"] for r in results["results"]], [quick.id])
+        results = self.client.get(results["next"]).json()
+        self.assertEqual([r["id"] for r in results["results"]], [slow.id])
+        self.assertIsNone(results["next"])
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("a@example.com", "a", "pw")
+        cls.other = User.objects.create_user("b@example.com", "b", "pw")
+        cls.recipe = make_recipes(1, Category.objects.create(name="Soup"), cls.user, [])[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertAggregates(self, rating_sum, rating_count, rating):
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_sum, self.recipe.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(self.recipe.rating, rating)
+
+    def test_rate_moves_sum_and_count(self):
+        RecipeRating.objects.rate(self.user, self.recipe.id, 4)
+        self.assertAggregates(4, 1, 4.0)
+        RecipeRating.objects.rate(self.other, self.recipe.id, 1)
+        self.assertAggregates(5, 2, 2.5)
+        RecipeRating.objects.rate(self.user, self.recipe.id, 2)  # a changed vote moves the sum only
+        self.assertAggregates(3, 2, 1.5)
+        with self.assertNumQueries(4):  # savepoint pair, lock, read the vote: nothing to write
+            RecipeRating.objects.rate(self.user, self.recipe.id, 2)
+        self.assertAggregates(3, 2, 1.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeRating.objects.get(user=self.other).delete()
+        self.assertAggregates(2, 1, 2.0)
+
+    def test_cascade_refreshes_once(self):
+        recipes = [self.recipe, *make_recipes(2, self.recipe.category, self.user, [])]
+        for recipe in recipes:
+            RecipeRating.objects.rate(self.other, recipe.id, 3)
+        RecipeRating.objects.rate(self.user, self.recipe.id, 5)
+
+        # the callbacks run when the inner block exits, inside the capture
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        refreshes = [q["sql"] for q in queries if q["sql"].startswith("UPDATE") and "rating_sum" in q["sql"]]
+        self.assertEqual(len(refreshes), 1)
+        self.assertAggregates(5, 1, 5.0)
+        recipes[1].refresh_from_db()
+        self.assertEqual(recipes[1].rating_count, 0)
+
+    def test_rate_endpoint(self):
+        response = self.client.post(f"/api/recipes/{self.recipe.id}/rate/", {"rating": 5}, format="json")
+        self.assertEqual(response.json(), {"rating": 5})
+        self.assertAggregates(5, 1, 5.0)
+        self.assertEqual(self.client.post("/api/recipes/999999/rate/", {"rating": 5}, format="json").status_code, 404)
+
+        for body in ('{"rating": "1e3"}', '{"rating": 4.9}', '{"rating": "inf"}', '{"rating": 1e999}',
+                     '{"rating": 0}', '{"rating": 6}', '{"rating": true}', '{"rating": [5]}', '{}'):
+            response = self.client.post(
+                f"/api/recipes/{self.recipe.id}/rate/", body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, body)
+        self.assertAggregates(5, 1, 5.0)
+
+    def test_reconcile_ratings(self):
+        RecipeRating.objects.rate(self.user, self.recipe.id, 4)
+        RecipeRating.objects.rate(self.other, self.recipe.id, 2)
+        Recipe.objects.filter(pk=self.recipe.pk).update(rating_sum=40, rating_count=3, rating=13.3)
+
+        out = StringIO()
+        call_command("reconcile_ratings", "--dry-run", stdout=out)
+        self.assertIn("1 recipe(s) out of sync", out.getvalue())
+        self.assertAggregates(40, 3, 13.3)
+
+        call_command("reconcile_ratings", stdout=StringIO())
+        self.assertAggregates(6, 2, 3.0)
+        self.assertAlmostEqual(self.recipe.rank_score, ranking.score(6, 2, self.recipe.created_at))
+        out = StringIO()
+        call_command("reconcile_ratings", stdout=out)
+        self.assertIn("consistent", out.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class BulkRatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("r@example.com", "r", "pw")
+        cls.other = User.objects.create_user("o@example.com", "o", "pw")
+        cls.recipes = make_recipes(3, Category.objects.create(name="Soup"), cls.user, [])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_upsert_and_aggregates(self):
+        a, b, c = self.recipes
+        RecipeRating.objects.rate(self.other, a.id, 1)
+        RecipeRating.objects.rate(self.user, a.id, 2)
+
+        # lock + validate, upsert, refresh aggregates, read back; plus a savepoint pair
+        with self.assertNumQueries(6):
+            response = self.client.post("/api/ratings/bulk/", {"ratings": [
+                {"recipe_id": a.id, "rating": 5},
+                {"recipe_id": b.id, "rating": 4},
+                {"recipe_id": b.id, "rating": 3},
+                {"recipe_id": 999999, "rating": 3},
+            ]}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(body["missing"], [999999])
+        recipes = {r["id"]: r for r in body["recipes"]}
+        self.assertEqual(recipes[a.id], {"id": a.id, "average_rating": 3.0, "rating_count": 2})
+        self.assertEqual(recipes[b.id], {"id": b.id, "average_rating": 3.0, "rating_count": 1})
+        self.assertEqual(RecipeRating.objects.filter(user=self.user).count(), 2)
+        c.refresh_from_db()
+        self.assertEqual(c.rating_count, 0)
+
+    def test_validation(self):
+        for payload in ({}, {"ratings": []}, {"ratings": [{"recipe_id": 1, "rating": 9}]},
+                        {"ratings": [{"recipe_id": "x", "rating": 3}]}):
+            self.assertEqual(self.client.post("/api/ratings/bulk/", payload, format="json").status_code, 400)
+        self.assertFalse(RecipeRating.objects.exists())
+
+    def test_out_of_range_numbers_are_item_errors(self):
+        a = self.recipes[0]
+        body = (
+            '{"ratings": [{"recipe_id": %d, "rating": 5}, {"recipe_id": %d, "rating": "1e999"},'
+            ' {"recipe_id": %d, "rating": 3}, {"recipe_id": %d, "rating": 4.5}, {"recipe_id": true, "rating": 3},'
+            ' {"recipe_id": %d, "rating": "inf"}]}'
+            % (a.id, a.id, 2 ** 64, a.id, a.id)
+        )
+        response = self.client.post("/api/ratings/bulk/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 400, response.content)
+        errors = response.json()["ratings"]
+        self.assertEqual(sorted(errors), ["1", "2", "3", "4", "5"])
+        self.assertIn("rating", errors["1"])
+        self.assertIn("recipe_id", errors["2"])
+        # a bare 1e999 is already refused by the JSON parser
+        body = '{"ratings": [{"recipe_id": %d, "rating": 1e999}]}' % a.id
+        response = self.client.post("/api/ratings/bulk/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RecipeRating.objects.exists())
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class WishlistSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("w@example.com", "w", "pw")
+        cls.recipes = make_recipes(4, Category.objects.create(name="Soup"), cls.user, [])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ids_mode(self):
+        a, b, *_ = self.recipes
+        Wishlist.objects.create(user=self.user, recipe=b)
+        Wishlist.objects.create(user=self.user, recipe=a)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/wishlist/my/", {"ids": 1})
+        self.assertEqual(response.json(), [b.id, a.id])
+
+    def test_sync_applies_difference(self):
+        a, b, c, d = self.recipes
+        Wishlist.objects.create(user=self.user, recipe=a)
+        Wishlist.objects.create(user=self.user, recipe=b)
+
+        # read current, check new ids, insert, delete; plus a savepoint pair
+        with self.assertNumQueries(6):
+            response = self.client.post(
+                "/api/wishlist/sync/", {"recipe_ids": [b.id, c.id, d.id, 999999]}, format="json"
+            )
+        self.assertEqual(response.json(), {
+            "recipe_ids": [b.id, c.id, d.id], "added": [c.id, d.id], "removed": [a.id], "missing": [999999],
+        })
+        self.assertEqual(
+            set(Wishlist.objects.filter(user=self.user).values_list("recipe_id", flat=True)), {b.id, c.id, d.id}
+        )
+        self.assertEqual(self.client.post("/api/wishlist/sync/", {"recipe_ids": "x"}, format="json").status_code, 400)
+
+    def test_sync_validation(self):
+        a = self.recipes[0]
+        for ids in ("x", [True], [a.id, 2 ** 64], [0], ["1e999"], [a.id] * 1001):
+            response = self.client.post("/api/wishlist/sync/", {"recipe_ids": ids}, format="json")
+            self.assertEqual(response.status_code, 400, ids)
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_add(self):
+        a = self.recipes[0]
+        response = self.client.post("/api/wishlist/add/", {"recipe_id": a.id}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["recipe"]["id"], a.id)
+        self.assertEqual(self.client.post("/api/wishlist/add/", {"recipe_id": 999999}, format="json").status_code, 404)
+        for recipe_id in (None, True, 2 ** 64, "x"):
+            response = self.client.post("/api/wishlist/add/", {"recipe_id": recipe_id}, format="json")
+            self.assertEqual(response.status_code, 400, recipe_id)
+        self.assertEqual(Wishlist.objects.count(), 1)
+
+    def test_unique(self):
+        Wishlist.objects.create(user=self.user, recipe=self.recipes[0])
+        with self.assertRaises(IntegrityError):
+            Wishlist.objects.create(user=self.user, recipe=self.recipes[0])
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class HomeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("h@example.com", "h", "pw")
+        cls.recipes = make_recipes(25, Category.objects.create(name="Soup"), cls.user, [])
+        Wishlist.objects.create(user=cls.user, recipe=cls.recipes[3])
+
+    def setUp(self):
+        response_cache.backend.clear()
+        self.client = APIClient()
+
+    @override_settings(RESPONSE_CACHE={"ENABLED": False})
+    def test_one_round_trip(self):
+        with self.assertNumQueries(3):  # categories, recipe page, its ingredients
+            response = self.client.get("/api/home/")
+        body = response.json()
+        self.assertEqual([c["name"] for c in body["categories"]], ["Soup"])
+        self.assertEqual(body["recipes"], self.client.get("/api/recipes/", {"order": "rank"}).json())
+        self.assertEqual(body["wishlist_ids"], [])
+        self.assertIn("public", response["Cache-Control"])
+
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/home/")
+        self.assertEqual(response.json()["wishlist_ids"], [self.recipes[3].id])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_shared_part_is_cached(self):
+        self.client.get("/api/home/")
+        with self.assertNumQueries(0):
+            self.client.get("/api/home/")
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(1):  # only the wishlist ids
+            response = self.client.get("/api/home/")
+        self.assertEqual(response.json()["wishlist_ids"], [self.recipes[3].id])
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("s@example.com", "s", "pw")
+        cls.category = Category.objects.create(name="Salad")
+        cls.ingredients = [Ingredient.objects.create(name=n) for n in ("kale", "oil")]
+        cls.recipes = make_recipes(3, cls.category, cls.user, cls.ingredients)
+        Wishlist.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        self.client = APIClient()
+        ingredient_index.invalidate()
+
+    def test_fields_trim_output_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/", {"fields": "name,images,average_rating"})
+        self.assertEqual(len(queries), 1)  # the page: no joins, no ingredient prefetch
+        page_sql = queries[-1]["sql"]
+        self.assertNotIn("JOIN", page_sql)
+        self.assertNotIn('"description"', page_sql)
+
+        row = response.json()["results"][0]
+        self.assertEqual(set(row), {"id", "name", "images", "average_rating"})
+
+    def test_expand(self):
+        response = self.client.get(
+            f"/api/recipes/{self.recipes[0].id}/", {"fields": "name", "expand": "category,ingredients"}
+        )
+        body = response.json()
+        self.assertEqual(set(body), {"id", "name", "category", "ingredients"})
+        self.assertEqual(body["category"]["name"], "Salad")
+        self.assertEqual(sorted(i["name"] for i in body["ingredients"]), ["kale", "oil"])
+
+    def test_expanded_relations_invalidate_etags(self):
+        recipe = self.recipes[0]
+        for url in ("/api/recipes/", f"/api/recipes/{recipe.id}/"):
+            for expand, obj in (("category", self.category), ("ingredients", self.ingredients[0])):
+                params = {"fields": "name", "expand": expand}
+                etag = self.client.get(url, params)["ETag"]
+                self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                with self.captureOnCommitCallbacks(execute=True):
+                    obj.name += "!"
+                    obj.save()
+                response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200, (url, expand))
+                self.assertNotIn("Last-Modified", response)
+
+        # without ?expand= the detail only carries the ids
+        params = {"fields": "name,category"}
+        etag = self.client.get(f"/api/recipes/{recipe.id}/", params)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = "Leaves"
+            self.category.save()
+        response = self.client.get(f"/api/recipes/{recipe.id}/", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_default_is_unchanged(self):
+        row = self.client.get("/api/recipes/").json()["results"][0]
+        self.assertIn("description", row)
+        self.assertIsInstance(row["category"], int)
+
+    def test_unknown_names(self):
+        self.assertEqual(self.client.get("/api/recipes/", {"fields": "name,secret"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/recipes/", {"expand": "created_by"}).status_code, 400)
+
+    def test_search_and_wishlist(self):
+        response = self.client.post(
+            "/api/search_recipes/?fields=name", {"ingredients": ["kale"]}, format="json"
+        )
+        self.assertEqual(set(response.json()[0]), {"id", "name", "matched_count", "missing_count"})
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/api/wishlist/my/", {"fields": "name"})
+        self.assertEqual(response.json()[0]["recipe"], {"id": self.recipes[0].id, "name": self.recipes[0].name})
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class RendererTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("r@example.com", "r", "pw")
+        make_recipes(3, Category.objects.create(name="Шөл"), cls.user, [Ingredient.objects.create(name="мах")])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_same_json_as_drf(self):
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    @skipIf(renderers.msgpack is None, "msgpack is not installed")
+    def test_msgpack_negotiation(self):
+        msgpack = renderers.msgpack
+        response = self.client.get("/api/recipes/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get("/api/recipes/").json())
+
+    @skipIf(renderers.msgpack is None, "msgpack is not installed")
+    def test_msgpack_request_body(self):
+        msgpack = renderers.msgpack
+        recipe = Recipe.objects.first()
+        self.client.force_authenticate(self.user)
+        response = self.client.generic(
+            "POST", "/api/ratings/bulk/", msgpack.packb({"ratings": [{"recipe_id": recipe.id, "rating": 4}]}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(RecipeRating.objects.get(user=self.user).rating, 4)
+
+        response = self.client.generic("POST", "/api/ratings/bulk/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class SimilarRecipesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("m@example.com", "m", "pw")
+        category = Category.objects.create(name="Main")
+        i = {n: Ingredient.objects.create(name=n) for n in "abcdefghij"}
+        sets = {"base": "abcde", "twin": "abcde", "close": "abcdf", "far": "fghij"}
+        cls.recipes = {}
+        for name, letters in sets.items():
+            cls.recipes[name] = make_recipes(1, category, user, [i[c] for c in letters])[0]
+        cls.ingredients = i
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, name, **params):
+        response = self.client.get(f"/api/recipes/{self.recipes[name].id}/similar/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row["id"], row["similarity"]) for row in response.json()]
+
+    def test_ranked_by_ingredient_overlap(self):
+        base = self.ids("base")
+        self.assertEqual(base[0], (self.recipes["twin"].id, 1.0))
+        self.assertEqual(base[1][0], self.recipes["close"].id)
+        self.assertNotIn(self.recipes["far"].id, [pk for pk, _ in base])
+        self.assertEqual(len(self.ids("base", limit=1)), 1)
+        self.assertEqual([pk for pk, _ in base], [pk for pk, _ in similar.exact_similar(self.recipes["base"].id)][:2])
+
+    def test_query_budget(self):
+        # recipe exists, signature, candidates + signatures, page, ingredients
+        with self.assertNumQueries(5):
+            self.ids("base")
+
+    def test_index_follows_ingredient_changes(self):
+        far = self.recipes["far"]
+        far.ingredients.set([self.ingredients[c] for c in "abcde"])
+        self.assertEqual(self.ids("base")[0][1], 1.0)
+        self.assertIn(far.id, [pk for pk, _ in self.ids("base")])
+
+        far.ingredients.clear()
+        self.assertFalse(RecipeMinHash.objects.filter(recipe=far).exists())
+        self.assertEqual(self.ids("far"), [])
+
+        self.ingredients["a"].delete()
+        self.assertLess(dict(self.ids("base"))[self.recipes["close"].id], 1.0)
+
+    def test_rebuild(self):
+        RecipeMinHash.objects.all().delete()
+        self.assertEqual(self.ids("base"), [])
+        self.assertEqual(similar.rebuild(), 4)
+        self.assertEqual(RecipeLSHBucket.objects.count(), 4 * similar.get_config("BANDS"))
+        self.assertEqual(self.ids("base")[0], (self.recipes["twin"].id, 1.0))
+
+
+@skipIf(recommender.np is None, "numpy is not installed")
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False},
+                   RECOMMENDATIONS={"FACTORS": 4, "ITERATIONS": 15, "TOP_N": 5})
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user("o@example.com", "o", "pw")
+        cls.soups = make_recipes(6, Category.objects.create(name="Soup"), owner, [])
+        cls.salads = make_recipes(6, Category.objects.create(name="Salad"), owner, [])
+        # two tastes; everyone rates everything except ann, who leaves two of each unrated
+        cls.ann = User.objects.create_user("ann@example.com", "ann", "pw")
+        for n in range(8):
+            user = User.objects.create_user(f"u{n}@example.com", f"u{n}", "pw")
+            likes_soup = n % 2 == 0
+            for recipe in cls.soups:
+                RecipeRating.objects.create(user=user, recipe=recipe, rating=5 if likes_soup else 1)
+            for recipe in cls.salads:
+                RecipeRating.objects.create(user=user, recipe=recipe, rating=1 if likes_soup else 5)
+        for recipe in cls.soups[:4]:
+            RecipeRating.objects.create(user=cls.ann, recipe=recipe, rating=5)
+        for recipe in cls.salads[:4]:
+            RecipeRating.objects.create(user=cls.ann, recipe=recipe, rating=1)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_train_and_serve(self):
+        report = recommender.run(holdout=0.0)
+        self.assertEqual(report["written"], 9)
+        self.assertEqual((report["users"], report["recipes"]), (9, 12))
+
+        self.client.force_authenticate(self.ann)
+        with self.assertNumQueries(3):  # serving row, recipes, their ingredients
+            body = self.client.get("/api/recommendations/me/", {"limit": 2}).json()
+        self.assertEqual(body["source"], "personal")
+        self.assertEqual({r["id"] for r in body["results"]}, {r.id for r in self.soups[4:]})
+        self.assertGreater(body["results"][0]["score"], 4)
+
+        rated = set(RecipeRating.objects.filter(user=self.ann).values_list("recipe_id", flat=True))
+        stored = [pk for pk, _ in UserRecommendation.objects.get(user=self.ann).items()]
+        self.assertEqual(len(stored), 4)  # 12 recipes - 8 rated
+        self.assertFalse(rated & set(stored))
+
+    def test_cold_start_and_stale_rows(self):
+        recommender.run()
+        RecipeRating.objects.filter(user=self.ann).delete()
+        recommender.run()
+        self.assertFalse(UserRecommendation.objects.filter(user=self.ann).exists())
+
+        self.client.force_authenticate(self.ann)
+        body = self.client.get("/api/recommendations/me/").json()
+        self.assertEqual(body["source"], "popular")
+        self.assertIsNone(body["trained_at"])
+        self.assertEqual(len(body["results"]), 12)
+
+    def test_blocked_solve_matches_one_block(self):
+        users, recipes, ratings = recommender.load_ratings()
+        with override_settings(RECOMMENDATIONS={"FACTORS": 4, "BLOCK_SIZE": 50}):
+            small = recommender.train(users, recipes, ratings, iterations=3)
+        with override_settings(RECOMMENDATIONS={"FACTORS": 4, "BLOCK_SIZE": 10**7}):
+            large = recommender.train(users, recipes, ratings, iterations=3)
+        self.assertTrue(recommender.np.allclose(small.user_factors, large.user_factors, atol=1e-5))
+
+
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False})
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f"r{n}@example.com", f"r{n}", "pw") for n in range(20)]
+        cls.lone, cls.popular = make_recipes(2, Category.objects.create(name="Soup"), cls.users[0], [])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def ids(self, **params):
+        return [row["id"] for row in self.client.get("/api/recipes/", params).json()["results"]]
+
+    def test_confidence_beats_a_single_vote(self):
+        RecipeRating.objects.rate(self.users[0], self.lone.id, 5)
+        for n, user in enumerate(self.users):  # 16 x 5 + 4 x 4 = 4.8 average
+            RecipeRating.objects.rate(user, self.popular.id, 5 if n < 16 else 4)
+
+        self.assertEqual(self.ids(order="rating"), [self.lone.id, self.popular.id])
+        self.assertEqual(self.ids(), [self.popular.id, self.lone.id])
+
+    def test_score_follows_every_write_path(self):
+        def assertScored(recipe):
+            recipe.refresh_from_db()
+            expected = ranking.score(recipe.rating_sum, recipe.rating_count, recipe.created_at)
+            self.assertAlmostEqual(recipe.rank_score, expected, places=6)
+
+        assertScored(self.lone)  # pre_save, no votes
+        RecipeRating.objects.rate(self.users[1], self.lone.id, 2)
+        assertScored(self.lone)
+        RecipeRating.objects.rate_many(self.users[2], {self.lone.id: 4, self.popular.id: 5})
+        assertScored(self.lone)
+        assertScored(self.popular)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeRating.objects.filter(user=self.users[2]).delete()
+        assertScored(self.popular)
+        self.assertEqual(self.popular.rating_count, 0)
+
+    def test_newer_recipe_gets_a_head_start(self):
+        Recipe.objects.filter(pk=self.lone.pk).update(
+            created_at=self.lone.created_at - timedelta(days=ranking.get_config("DAYS_PER_STAR"))
+        )
+        RecipeRating.objects.refresh_aggregates()
+        self.lone.refresh_from_db()
+        self.popular.refresh_from_db()
+        self.assertAlmostEqual(self.popular.rank_score - self.lone.rank_score, 1.0, places=3)
+
+    @skipIf(connection.vendor != "sqlite", "plan text is SQLite's")
+    def test_default_order_is_an_index_scan(self):
+        plan = Recipe.objects.order_by(*RecipeViewSet.DEFAULT_ORDERING)[:20].explain()
+        self.assertIn("recipe_rank_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+@override_settings(IMAGE_DERIVATIVES={"ENABLED": False})
+class QueryAuditTests(TestCase):
+    def test_columns_used(self):
+        sql = (
+            'SELECT "jor_app_recipe"."id" FROM "jor_app_recipe" '
+            'INNER JOIN "jor_app_category" ON ("jor_app_recipe"."category_id" = "jor_app_category"."id") '
+            'LEFT OUTER JOIN "jor_app_user" ON ("jor_app_recipe"."created_by_id" = "jor_app_user"."id") '
+            'WHERE ("jor_app_category"."name" = \'Soup\' AND "jor_app_recipe"."time_minutes" <= 30 '
+            'AND "jor_app_recipe"."name" LIKE \'%x%\' AND EXISTS(SELECT 1 FROM "jor_app_reciperating" U0 '
+            'WHERE U0."recipe_id" = ("jor_app_recipe"."id"))) '
+            'ORDER BY "jor_app_recipe"."rank_score" DESC, "jor_app_recipe"."id" DESC LIMIT 21'
+        )
+        used = query_audit.columns_used(sql)
+        self.assertEqual(used["jor_app_recipe"], {
+            "equality": ["category_id"], "range": ["time_minutes"], "order": ["rank_score", "id"],
+        })
+        self.assertEqual(used["jor_app_category"]["equality"], ["name", "id"])
+        self.assertEqual(used["jor_app_reciperating"]["equality"], ["recipe_id"])
+
+    def test_audit_rolls_back_and_finds_no_sorts(self):
+        benchmark.generate_dataset(60, seed=1)
+        ratings = RecipeRating.objects.count()
+        report = query_audit.audit(min_rows=0, only=["recipes_list_new", "rate", "recipes_by_category"])
+
+        self.assertEqual(RecipeRating.objects.count(), ratings)
+        self.assertEqual([row["status"] for row in report["endpoints"].values()], [200, 200, 200])
+        # the default order, ?order=new and by_category are all indexed
+        self.assertEqual(report["proposals"], [])
+        for row in report["endpoints"].values():
+            self.assertNotIn("sort", [finding["kind"] for finding in row["findings"]])
+
+    def test_proposes_missing_index(self):
+        sql = (
+            'SELECT "jor_app_recipe"."id" FROM "jor_app_recipe" WHERE "jor_app_recipe"."cuisine" = \'x\' '
+            'ORDER BY "jor_app_recipe"."servings" ASC, "jor_app_recipe"."id" ASC LIMIT 21'
+        )
+        proposal = query_audit.propose_index("sort", "jor_app_recipe", sql)
+        self.assertEqual(proposal["fields"], ["cuisine", "servings", "id"])
+
+
+@skipUnless("test_replica" in settings.DATABASES, "needs a second local database (DATABASE_TEST_REPLICA)")
+@override_settings(RESPONSE_CACHE={"ENABLED": False}, IMAGE_DERIVATIVES={"ENABLED": False},
+                   READ_REPLICAS={"ALIASES": ["test_replica"], "STICKY_SECONDS": 60})
+class ReadReplicaTests(TestCase):
+    """'test_replica' never receives the primary's writes: a replica that lags forever."""
+
+    databases = "__all__"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("rr@example.com", "rr", "pw")
+        cls.user.save(using="test_replica")  # so JWT authentication works on both
+        cls.recipe = make_recipes(1, Category.objects.create(name="Primary"), cls.user, [])[0]
+        Category.objects.using("test_replica").create(name="Replica")
+
+    def setUp(self):
+        caches[db_router.get_config("CACHE")].clear()
+        self.client = APIClient()
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def categories(self, **headers):
+        return [c["name"] for c in self.client.get("/api/categories/", **headers).json()]
+
+    def rate(self, value):
+        return self.client.post(f"/api/recipes/{self.recipe.id}/rate/", {"rating": value}, format="json", **self.auth)
+
+    def test_safe_api_reads_go_to_the_replica(self):
+        self.assertEqual(self.categories(), ["Replica"])
+        self.assertEqual(self.categories(**self.auth), ["Replica"])
+        # outside a request everything stays on the primary
+        self.assertEqual(list(Category.objects.values_list("name", flat=True)), ["Primary"])
+        self.assertEqual(db_router.ReplicaRouter().db_for_read(Category), "default")
+
+    def test_writer_reads_own_writes(self):
+        self.assertEqual(self.rate(4).status_code, 200)
+        self.assertEqual(self.categories(**self.auth), ["Primary"])
+        response = self.client.get(f"/api/recipes/{self.recipe.id}/", **self.auth)
+        self.assertEqual(response.json()["rating_count"], 1)
+        # everyone else keeps reading the replica
+        self.assertEqual(self.categories(), ["Replica"])
+
+    def test_pin_window(self):
+        with override_settings(READ_REPLICAS={"ALIASES": ["test_replica"], "STICKY_SECONDS": 0}):
+            self.assertEqual(self.rate(4).status_code, 200)
+            self.assertEqual(self.categories(**self.auth), ["Replica"])
+
+    def test_failed_write_does_not_pin(self):
+        self.assertEqual(self.rate(9).status_code, 400)
+        self.assertEqual(self.categories(**self.auth), ["Replica"])
+
+    @override_settings(RESPONSE_CACHE={"ENABLED": True})
+    def test_fresh_versions_are_not_cached_from_the_replica(self):
+        response_cache.bump("categories")
+        self.assertEqual(self.categories(), ["Replica"])
+        Category.objects.using("test_replica").create(name="Later")
+        self.assertEqual(self.categories(), ["Replica", "Later"])
+
+    def test_pins_need_a_shared_cache(self):
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        redis = {**locmem, "shared": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://localhost",
+        }}
+        for caches_setting, cache_alias, errors in (
+            (locmem, "default", ["jor_app.E002"]),
+            (locmem, "shared", ["jor_app.E001"]),
+            (redis, "shared", []),
+        ):
+            with override_settings(CACHES=caches_setting,
+                                   READ_REPLICAS={"ALIASES": ["test_replica"], "CACHE": cache_alias}):
+                self.assertEqual([e.id for e in db_router.check_pin_cache()], errors)
+        with override_settings(CACHES=locmem, READ_REPLICAS={"ALIASES": []}):
+            self.assertEqual(db_router.check_pin_cache(), [])
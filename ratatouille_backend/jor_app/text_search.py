@@ -0,0 +1,113 @@
+"""
+Text search over Recipe.name / description / cuisine.
+
+PostgreSQL: ``Recipe.search_vector`` is a stored ``tsvector`` (weights
+name=A, cuisine=B, description=C) kept current by a post_save hook and
+indexed with GIN.  A query matches when the tsvector matches the
+websearch-style query or when ``name`` is trigram-similar to it (typo
+tolerance, GIN ``gin_trgm_ops`` index).  Results are ordered by
+``ts_rank + trigram similarity``.
+
+Other databases (SQLite in tests): documented fallback, no index use.  A
+recipe matches when any of the three columns contains the query and is
+scored 3/2/1 for a match in name/cuisine/description.  Ranking is coarser
+and there is no typo tolerance, but the endpoint contract (ordering by
+``score`` then ``id``, cursor pagination) is the same.  Both sides are
+case-folded (``Fold``): SQLite's own LOWER() and LIKE only fold ASCII, and
+most recipes here are written in Cyrillic.
+"""
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, TextField, Value, When
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = "simple"  # no Mongolian stemmer ships with PostgreSQL
+
+RECIPE_SEARCH_VECTOR = (
+    SearchVector("name", weight="A", config=SEARCH_CONFIG)
+    + SearchVector("cuisine", weight="B", config=SEARCH_CONFIG)
+    + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+)
+
+
+SQLITE_FOLD = "jor_casefold"
+
+
+class Fold(Func):
+    """
+    Case-folded text: LOWER() where the database folds Unicode itself, a
+    Python ``str.casefold`` registered on every SQLite connection otherwise.
+    """
+
+    function = "LOWER"
+    output_field = TextField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function=SQLITE_FOLD, **extra_context)
+
+
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+def install_sqlite_functions(connection):
+    """Register ``Fold``'s function; called for every new connection (jor_app.signals)."""
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(SQLITE_FOLD, 1, _casefold, deterministic=True)
+
+
+def fold(text, vendor):
+    """``text`` folded the way ``Fold`` folds the columns on ``vendor``."""
+    return text.casefold() if vendor == "sqlite" else text.lower()
+
+
+def is_postgres(using):
+    return connections[using].vendor == "postgresql"
+
+
+def update_search_vector(queryset):
+    """Recompute the stored tsvector for every row of ``queryset``."""
+    if is_postgres(queryset.db):
+        queryset.update(search_vector=RECIPE_SEARCH_VECTOR)
+
+
+def search(queryset, text):
+    """Filter ``queryset`` to recipes matching ``text``, ordered by ``-score, -id``."""
+    if is_postgres(queryset.db):
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.filter(Q(search_vector=query) | Q(name__trigram_similar=text))
+            .annotate(
+                score=Cast(
+                    SearchRank(F("search_vector"), query) + TrigramSimilarity("name", text),
+                    FloatField(),
+                )
+            )
+            .order_by("-score", "-id")
+        )
+
+    needle = fold(text, connections[queryset.db].vendor)
+    return (
+        queryset.alias(
+            folded_name=Fold("name"), folded_cuisine=Fold("cuisine"), folded_description=Fold("description")
+        )
+        .filter(
+            Q(folded_name__contains=needle)
+            | Q(folded_cuisine__contains=needle)
+            | Q(folded_description__contains=needle)
+        )
+        .annotate(
+            score=Case(
+                When(folded_name__contains=needle, then=Value(3)),
+                When(folded_cuisine__contains=needle, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-score", "-id")
+    )
@@ -1,13 +1,24 @@
-from django.db.models import Avg
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import generics, permissions
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.utils.urls import replace_query_param
 
 from .models import *
 from .serializer import *
+from .autocomplete import ingredient_autocomplete
+from .cache import cached_response, response_cache
+from . import metrics
+from .conditional import ConditionalGetMixin, conditional_get
+from .pagination import RecipeCursorPagination
+from .search_index import ingredient_index
+from . import similar, text_search
 
 class RecipeCreateView(generics.CreateAPIView):
     queryset = Recipe.objects.all()
@@ -18,32 +29,129 @@ class RecipeCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
         
+# 🔹 Recipe filters
+# ?calories_max=500&protein_min=20&time_max=30 ... -> indexed numeric columns
+# (jor_app.nutrition, jor_app.cooking_time)
+RANGE_FILTERS = {
+    'time': 'time_minutes',
+    'calories': 'nutrition__calories_kcal',
+    'protein': 'nutrition__protein_g',
+    'fat': 'nutrition__fat_g',
+    'carbs': 'nutrition__carbs_g',
+}
+
+
+def _optional_float(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Must be a number."})
+
+
+def filter_recipes(qs, params):
+    """Apply the ``category`` and range query params of the recipe list."""
+    category = params.get("category")
+    if category:
+        qs = qs.filter(category__name=category)
+
+    lookups = {}
+    for name, field in RANGE_FILTERS.items():
+        for suffix, op in (('min', 'gte'), ('max', 'lte')):
+            value = _optional_float(params.get(f"{name}_{suffix}"), f"{name}_{suffix}")
+            if value is not None:
+                lookups[f"{field}__{op}"] = value
+    return qs.filter(**lookups) if lookups else qs
+
+
+def order_recipes(qs, order):
+    """Order by the ``order`` query param (see RecipeViewSet.ORDERINGS)."""
+    ordering = RecipeViewSet.ORDERINGS.get(order, RecipeViewSet.DEFAULT_ORDERING)
+    if ordering[0] == 'time_minutes':
+        # keyset pagination can't page over NULLs: unparsed times drop out of this order
+        qs = qs.filter(time_minutes__isnull=False)
+    return qs.order_by(*ordering)
+
+
+# 🔹 Sparse fieldsets
+# ?fields=id,name,images,average_rating&expand=category -> RecipeSerializer
+# context and the for_api() arguments (see SparseFieldsMixin)
+def _names(value):
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+def sparse_fieldset(request):
+    fields = _names(request.query_params.get('fields'))
+    expand = _names(request.query_params.get('expand'))
+
+    unknown = fields - set(RecipeSerializer.Meta.fields)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."})
+    unknown = expand - set(RecipeSerializer.expandable)
+    if unknown:
+        raise ValidationError({'expand': f"Can't expand: {', '.join(sorted(unknown))}."})
+
+    if fields:
+        fields |= expand | {'id'}
+    return {'fields': fields or None, 'expand': expand}
+
+
 # 🔹 Recipe ViewSet
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().annotate(
-        avg_rating=Avg('ratings__rating')
-    ).order_by('-avg_rating', '-created_at')
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.all()
 
     serializer_class = RecipeSerializer
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = RecipeCursorPagination
+
+    # ``order`` query param -> keyset ordering; each must end with a unique column
+    ORDERINGS = {
+        'rank': ('-rank_score', '-id'),  # jor_app.ranking
+        'rating': ('-rating', '-id'),
+        'new': ('-created_at', '-id'),
+        'old': ('created_at', 'id'),
+        'quick': ('time_minutes', 'id'),
+    }
+    DEFAULT_ORDERING = ORDERINGS['rank']
+
+    FILTERED_ACTIONS = ('list', 'by_category')
+    SPARSE_ACTIONS = ('list', 'retrieve', 'search', 'by_category', 'similar')
+
+    SIMILAR_DEFAULT_LIMIT = 10
+    SIMILAR_MAX_LIMIT = 50
+
+    def get_sparse_fieldset(self):
+        if self.action in self.SPARSE_ACTIONS:
+            return sparse_fieldset(self.request)
+        return {}
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **self.get_sparse_fieldset()}
 
     def get_queryset(self):
-        qs = Recipe.objects.all().annotate(
-            avg_rating=Avg('ratings__rating')
-        )
+        qs = Recipe.objects.for_api(**self.get_sparse_fieldset())
+
+        if self.action in self.FILTERED_ACTIONS:
+            qs = filter_recipes(qs, self.request.query_params)
 
-        order = self.request.query_params.get('order')
+        return order_recipes(qs, self.request.query_params.get('order'))
 
-        if order == 'rating':
-            qs = qs.order_by('-avg_rating')
-        elif order == 'new':
-            qs = qs.order_by('-created_at')
-        elif order == 'old':
-            qs = qs.order_by('created_at')
-        else:
-            qs = qs.order_by('-avg_rating', '-created_at')
+    etag_namespaces = ('recipes',)
 
-        return qs
+    # ?expand= relation -> the namespace of the rows it nests
+    EXPAND_NAMESPACES = {'category': 'categories', 'ingredients': 'ingredients'}
+
+    @property
+    def etag_dependencies(self):
+        dependencies = []
+        # ?category= filters on Category.name
+        if self.action in self.FILTERED_ACTIONS and self.request.query_params.get('category'):
+            dependencies.append('categories')
+        # a rename of a nested category/ingredient leaves Recipe.updated_at alone
+        for name in sorted(self.get_sparse_fieldset().get('expand', ())):
+            dependencies.append(self.EXPAND_NAMESPACES[name])
+        return tuple(dict.fromkeys(dependencies))
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -53,38 +161,195 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @conditional_get
+    @cached_response('recipes')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    @cached_response('recipes')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
+    @cached_response('recipes')
+    def search(self, request):
+        """
+        GET /api/recipes/search/?q=... — нэр, тайлбар, хоолны төрлөөр хайх.
+
+        Ranked by full-text rank + trigram similarity on PostgreSQL; see
+        jor_app.text_search for the SQLite fallback.  Cursor-paginated.
+        """
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "This query parameter is required."})
+
+        qs = text_search.search(Recipe.objects.for_api(**self.get_sparse_fieldset()), text)
+        page = self.paginate_queryset(qs)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response('recipes', 'categories')
     def by_category(self, request):
-        category = request.query_params.get("category")
-        qs = self.queryset
-        if category:
-            qs = qs.filter(category__name=category)
-        serializer = self.get_serializer(qs, many=True)
-        return Response(serializer.data)
+        qs = self.get_queryset()
+        page = self.paginate_queryset(qs)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+    @action(detail=True, methods=['get'])
+    @cached_response('recipes')
+    def similar(self, request, pk=None):
+        """
+        GET /api/recipes/{id}/similar/ — орцоороо хамгийн төстэй жорууд.
+
+        jor_app.similar-ийн MinHash/LSH индексээс; ``similarity`` нь
+        орцын олонлогийн Jaccard-ийн үнэлгээ.  ``?limit=`` (анхдагч 10).
+        """
+        limit = _optional_int(
+            request.query_params.get('limit'), 'limit', minimum=1, maximum=self.SIMILAR_MAX_LIMIT
+        ) or self.SIMILAR_DEFAULT_LIMIT
+        recipe = generics.get_object_or_404(Recipe.objects.only('id'), pk=pk)
+
+        scored = similar.similar_to(recipe.pk, limit=limit)
+        recipes = Recipe.objects.for_api(**self.get_sparse_fieldset()).in_bulk([pk for pk, _ in scored])
+        scored = [(pk, score) for pk, score in scored if pk in recipes]
+
+        results = self.get_serializer([recipes[pk] for pk, _ in scored], many=True).data
+        for data, (_, score) in zip(results, scored):
+            data['similarity'] = score
+        return Response(results)
+
+
+# 🔹 Home feed
+HOME_ORDER = 'rank'
+HOME_MAX_AGE = 60
+
+
+def _home_feed(request):
+    """Categories and the first ranked recipe page: identical for every caller."""
+    categories = CategorySerializer(
+        Category.objects.all(), many=True, context={'request': request}
+    ).data
+
+    sparse = sparse_fieldset(request)
+    paginator = RecipeCursorPagination()
+    page = paginator.paginate_queryset(order_recipes(Recipe.objects.for_api(**sparse), HOME_ORDER), request)
+    results = RecipeSerializer(page, many=True, context={'request': request, **sparse}).data
+
+    base_url = replace_query_param('/api/recipes/', 'order', HOME_ORDER)
+    for param in ('fields', 'expand'):  # the next page keeps the same fieldset
+        if request.query_params.get(param):
+            base_url = replace_query_param(base_url, param, request.query_params[param])
+    next_link = paginator.get_next_link(base_url=base_url)
+    return {
+        "categories": categories,
+        "recipes": {"next": next_link, "results": results},
+    }
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def home(request):
+    """
+    GET /api/home/ — нүүр дэлгэцэд хэрэгтэй бүгдийг нэг хүсэлтээр:
+    категориуд, рейтингээр эрэмбэлсэн жорын эхний хуудас, хэрэглэгчийн
+    wishlist-ийн recipe id-ууд.
+
+    Хэрэглэгчээс хамаарахгүй хэсэг нь response cache-д хадгалагдана;
+    нэвтрээгүй хариуг HTTP cache ч хадгалж болно.
+    """
+    if response_cache.enabled:
+        key = response_cache.make_key(('recipes', 'categories'), request)
+        data = response_cache.get(key)
+        if data is None:
+            data = _home_feed(request)
+            response_cache.set(key, data, ('recipes', 'categories'))
+    else:
+        data = _home_feed(request)
+
+    if request.user.is_authenticated:
+        wishlist_ids = list(
+            Wishlist.objects.filter(user=request.user).order_by("id").values_list("recipe_id", flat=True)
+        )
+        response = Response({**data, "wishlist_ids": wishlist_ids})
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        response = Response({**data, "wishlist_ids": []})
+        patch_cache_control(response, public=True, max_age=HOME_MAX_AGE)
+    patch_vary_headers(response, ['Authorization'])
+    return response
 
 
 # 🔹 Category ViewSet
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    etag_namespaces = ('categories',)
+
+    @conditional_get
+    @cached_response('categories')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    @cached_response('categories')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 # 🔹 Search Recipes API
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+
+def _optional_int(value, name, minimum=0, maximum=None):
+    if value in (None, ""):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Must be an integer."})
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValidationError({name: "Out of range."})
+    return value
+
+
 @api_view(['POST'])
 def search_recipes(request):
     """
-    Хэрэглэгчийн орцуудыг авч тухайн орцуудыг агуулсан recipe-г буцаах
+    Хэрэглэгчийн орцуудыг авч тухайн орцуудыг агуулсан recipe-г буцаах.
+
+    Үр дүнг дутуу орцын тоогоор эрэмбэлнэ; ``max_missing`` болон ``limit``
+    сонголттой.
     """
-    selected_ingredients = request.data.get('ingredients', [])
+    body = PantrySearchSerializer(data=request.data)
+    body.is_valid(raise_exception=True)
+    selected_ingredients = body.validated_data.get('ingredients')
     if not selected_ingredients:
         return Response({"recipes": []})
 
-    recipes = Recipe.objects.filter(
-        ingredients__name__in=selected_ingredients
-    ).distinct()
+    max_missing = _optional_int(request.data.get('max_missing'), 'max_missing')
+    limit = _optional_int(
+        request.data.get('limit'), 'limit', minimum=1, maximum=SEARCH_MAX_LIMIT
+    ) or SEARCH_DEFAULT_LIMIT
 
-    serializer = RecipeSerializer(recipes, many=True, context={'request': request})
-    print(serializer.data)
-    return Response(serializer.data)
+    matches = ingredient_index.search(
+        selected_ingredients, max_missing=max_missing, limit=limit
+    )
+    sparse = sparse_fieldset(request)
+    recipes = Recipe.objects.for_api(**sparse).in_bulk([m.recipe_id for m in matches])
+    matches = [m for m in matches if m.recipe_id in recipes]
+
+    serializer = RecipeSerializer(
+        [recipes[m.recipe_id] for m in matches], many=True, context={'request': request, **sparse}
+    )
+    results = serializer.data
+    for data, match in zip(results, matches):
+        data['matched_count'] = match.matched
+        data['missing_count'] = match.missing
+    return Response(results)
 
 # 🔹 User ViewSet
 class UserViewSet(viewsets.ModelViewSet):
@@ -125,63 +390,110 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(UserSerializer(request.user, context={"request": request}).data)
 
 # 🔹 Ingredient ViewSet
-class IngredientViewSet(viewsets.ModelViewSet):
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    etag_namespaces = ('ingredients',)
+
+    @conditional_get
+    @cached_response('ingredients')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    @cached_response('ingredients')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    # GET /api/ingredients/autocomplete/?q=бяс&limit=10&weighted=1
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        limit = _optional_int(
+            request.query_params.get('limit'), 'limit', minimum=1, maximum=AUTOCOMPLETE_MAX_LIMIT
+        ) or AUTOCOMPLETE_DEFAULT_LIMIT
+        weighted = request.query_params.get('weighted', '1') not in ('0', 'false')
+
+        suggestions = ingredient_autocomplete.suggest(
+            request.query_params.get('q', ''), limit=limit, weighted=weighted
+        )
+        return Response([
+            {"id": pk, "name": name, "recipe_count": count}
+            for pk, name, count in suggestions
+        ])
 
     # 🔹 Wishlist ViewSet
 class WishlistViewSet(viewsets.ModelViewSet):
-    queryset = Wishlist.objects.all()
+    queryset = Wishlist.objects.for_api()
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
 
+# 🔹 Nutrition ViewSet
+class NutritionViewSet(viewsets.ModelViewSet):
+    queryset = Nutrition.objects.all()
+    serializer_class = NutritionSerializer
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_wishlist(request):
-    wishlist = Wishlist.objects.filter(user=request.user)
-    serializer = WishlistSerializer(wishlist, many=True, context={'request': request})
+    user = request.user
+    if request.query_params.get("ids") in ("1", "true"):
+        # ?ids=1 — зүрхэн тэмдэг зурахад хангалттай: recipe id-ийн жагсаалт
+        return Response(list(
+            Wishlist.objects.filter(user=user).order_by("id").values_list("recipe_id", flat=True)
+        ))
+    # ?fields=/?expand= нь wishlist доторх recipe-д хамаарна
+    sparse = sparse_fieldset(request)
+    wishlist = Wishlist.objects.for_api(**sparse).filter(user=user)
+    serializer = WishlistSerializer(wishlist, many=True, context=sparse)
     return Response(serializer.data)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def add_wishlist(request):
-    recipe_id = request.data.get("recipe_id")
-    recipe = Recipe.objects.get(id=recipe_id)
-    item, _ = Wishlist.objects.get_or_create(user=request.user, recipe=recipe)
-    return Response(WishlistSerializer(item).data, status=201)
-
-
-@api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
-def remove_wishlist(request, pk):
-    Wishlist.objects.filter(id=pk, user=request.user).delete()
-    return Response(status=204)
-
-
+def sync_wishlist(request):
+    """
+    POST /api/wishlist/sync/  {"recipe_ids": [...]} — хүссэн бүрэн жагсаалт.
 
-# 🔹 Nutrition ViewSet
-class NutritionViewSet(viewsets.ModelViewSet):
-    queryset = Nutrition.objects.all()
-    serializer_class = NutritionSerializer
+    Одоогийн жагсаалттай зөрүүг нэг bulk insert, нэг bulk delete-ээр
+    хэрэгжүүлнэ.  Байхгүй жорын id-г "missing"-д буцаана.
+    """
+    body = WishlistSyncSerializer(data=request.data)
+    body.is_valid(raise_exception=True)  # [true], "1e999", хэт том id -> 400
+    desired = set(body.validated_data["recipe_ids"])
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def my_wishlist(request):
     user = request.user
-    wishlist = Wishlist.objects.filter(user=user)
-    serializer = WishlistSerializer(wishlist, many=True)
-    return Response(serializer.data)
+    with transaction.atomic():
+        current = set(Wishlist.objects.filter(user=user).values_list("recipe_id", flat=True))
+        to_add = desired - current
+        if to_add:
+            to_add = set(Recipe.objects.filter(pk__in=to_add).values_list("pk", flat=True))
+            Wishlist.objects.bulk_create(
+                [Wishlist(user=user, recipe_id=pk) for pk in to_add], ignore_conflicts=True
+            )
+        to_remove = current - desired
+        if to_remove:
+            Wishlist.objects.filter(user=user, recipe_id__in=to_remove).delete()
+
+    return Response({
+        "recipe_ids": sorted((current - to_remove) | to_add),
+        "added": sorted(to_add),
+        "removed": sorted(to_remove),
+        "missing": sorted(desired - current - to_add),
+    })
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def add_wishlist(request):
     user = request.user
-    recipe_id = request.data.get("recipe_id")
-    if not recipe_id:
+    body = WishlistAddSerializer(data=request.data)
+    if not body.is_valid():
         return Response({"error": "recipe_id is required"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    recipe = Recipe.objects.get(id=recipe_id)
+
+    recipe = generics.get_object_or_404(Recipe, id=body.validated_data["recipe_id"])
     wishlist_item, created = Wishlist.objects.get_or_create(user=user, recipe=recipe)
     serializer = WishlistSerializer(wishlist_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -200,14 +512,105 @@ def remove_wishlist(request, pk):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def rate_recipe(request, recipe_id):
-    rating = request.data.get("rating")
-    recipe = Recipe.objects.get(id=recipe_id)
+    body = RatingInputSerializer(data=request.data)
+    if not body.is_valid():
+        return Response({"error": "rating must be an integer between 1 and 5"}, status=status.HTTP_400_BAD_REQUEST)
 
-    obj, _ = RecipeRating.objects.update_or_create(
-        user=request.user,
-        recipe=recipe,
-        defaults={"rating": rating}
-    )
+    try:
+        obj = RecipeRating.objects.rate(request.user, recipe_id, body.validated_data["rating"])
+    except Recipe.DoesNotExist:
+        return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
     return Response({"rating": obj.rating})
 
+
+RATE_BULK_MAX = 500
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rate_recipes_bulk(request):
+    """
+    POST /api/ratings/bulk/  {"ratings": [{"recipe_id": 1, "rating": 5}, ...]}
+
+    Бүх үнэлгээг нэг upsert-ээр бичиж, жорын дундажийг мөн transaction-д
+    шинэчилнэ.  Давхардсан recipe_id-аас сүүлийнх нь хүчинтэй.
+    """
+    items = request.data.get("ratings") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValidationError({"ratings": "A non-empty list is required."})
+    if len(items) > RATE_BULK_MAX:
+        raise ValidationError({"ratings": f"At most {RATE_BULK_MAX} ratings per request."})
+
+    ratings, errors = {}, {}
+    for i, item in enumerate(items):
+        # IntegerField: "inf", 1e999, 4.5 эсвэл хэт том id нь 500 биш, тухайн мөрийн алдаа
+        item = BulkRatingItemSerializer(data=item)
+        if not item.is_valid():
+            errors[i] = item.errors
+            continue
+        ratings[item.validated_data["recipe_id"]] = item.validated_data["rating"]
+    if errors:
+        raise ValidationError({"ratings": errors})
+
+    saved = RecipeRating.objects.rate_many(request.user, ratings)
+    if saved:
+        # bulk_create sends no post_save for the cache-version hook
+        response_cache.bump("recipes")
+    aggregates = Recipe.objects.filter(pk__in=saved).values("id", "rating", "rating_count")
+    return Response({
+        "recipes": [
+            {"id": row["id"], "average_rating": row["rating"], "rating_count": row["rating_count"]}
+            for row in aggregates
+        ],
+        "missing": sorted(set(ratings) - set(saved)),
+    })
+
+
+# 🔹 Хувийн санал (jor_app.recommender-ийн сургасан хүснэгтээс)
+RECOMMENDATIONS_DEFAULT_LIMIT = 20
+RECOMMENDATIONS_MAX_LIMIT = 100
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_recommendations(request):
+    """
+    GET /api/recommendations/me/ — хэрэглэгчийн үнэлгээнээс сургасан санал.
+
+    ``manage.py train_recommendations``-ийн бичсэн мөрийг primary key-ээр
+    уншина.  Үнэлгээ өгөөгүй (сургалтад ороогүй) хэрэглэгчид анхдагч
+    эрэмбийн (jor_app.ranking) эхний жорууд ("source": "popular").  ``score`` нь
+    таамагласан үнэлгээ.
+    """
+    limit = _optional_int(
+        request.query_params.get('limit'), 'limit', minimum=1, maximum=RECOMMENDATIONS_MAX_LIMIT
+    ) or RECOMMENDATIONS_DEFAULT_LIMIT
+    sparse = sparse_fieldset(request)
+
+    stored = UserRecommendation.objects.filter(user=request.user).first()
+    if stored is not None:
+        scored = [(pk, round(score, 2)) for pk, score in stored.items()[:limit]]
+    else:
+        top = order_recipes(Recipe.objects.all(), 'rank').values_list('id', flat=True)[:limit]
+        scored = [(pk, None) for pk in top]
+
+    recipes = Recipe.objects.for_api(**sparse).in_bulk([pk for pk, _ in scored])
+    scored = [(pk, score) for pk, score in scored if pk in recipes]
+    results = RecipeSerializer(
+        [recipes[pk] for pk, _ in scored], many=True, context={'request': request, **sparse}
+    ).data
+    for data, (_, score) in zip(results, scored):
+        data['score'] = score
+    return Response({
+        "source": "personal" if stored is not None else "popular",
+        "trained_at": stored.trained_at if stored is not None else None,
+        "results": results,
+    })
+
+
+# 🔹 Prometheus scrape endpoint (jor_app.metrics): METRICS['TOKEN'] эсвэл ALLOWED_IPS
+def metrics_view(request):
+    if not metrics.scrape_allowed(request):
+        raise Http404
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 from datetime import timedelta
+from importlib.util import find_spec
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'jor_app',
     'rest_framework',
@@ -54,8 +56,23 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",
     ),
+    # jor_app.renderers: orjson; JSON эхэндээ тул анхдагч хэвээр
+    "DEFAULT_RENDERER_CLASSES": [
+        "jor_app.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "jor_app.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# Accept: application/msgpack — msgpack суусан үед л
+if find_spec("msgpack"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"].insert(1, "jor_app.renderers.MessagePackRenderer")
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"].insert(1, "jor_app.renderers.MessagePackParser")
+
 
 DJOSER = {
     "LOGIN_FIELD": "email",
@@ -73,6 +90,8 @@ SIMPLE_JWT = {
 
 
 MIDDLEWARE = [
+    'jor_app.metrics.MetricsMiddleware',
+    'jor_app.db_router.ReplicaRouterMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -121,6 +140,102 @@ DATABASES = {
     }
 }
 
+# Read replicas (jor_app.db_router): DATABASE_REPLICA_HOSTS=host[:port],...
+# adds 'replica1', 'replica2'... : the 'default' database on those servers.
+# Tests run them as mirrors of 'default'.
+for n, address in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{n}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# A second local database that plays the replica in jor_app.tests.ReadReplicaTests
+# (DATABASE_TEST_REPLICA=ratatouille_replica); nothing is routed to it otherwise.
+if os.environ.get('DATABASE_TEST_REPLICA'):
+    DATABASES['test_replica'] = {**DATABASES['default'], 'NAME': os.environ['DATABASE_TEST_REPLICA']}
+
+DATABASE_ROUTERS = ['jor_app.db_router.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMemCache is per process; point RESPONSE_CACHE at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+RESPONSE_CACHE = {
+    'ALIAS': 'shared' if 'shared' in CACHES else 'default',
+    'TIMEOUT': 300,
+}
+
+# jor_app.db_router: API GETs read from these aliases; a user's reads stay on
+# 'default' for STICKY_SECONDS (longer than the replication lag) after a write.
+# The pins must be seen by every worker: with replicas, CACHE has to be a
+# shared backend (REDIS_URL), or the system check jor_app.E002 fails.
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias.startswith('replica')],
+    'STICKY_SECONDS': 10,
+    'CACHE': RESPONSE_CACHE['ALIAS'],
+}
+
+
+# jor_app.metrics: per-view request metrics, scraped from /metrics/.
+# With several worker processes every worker writes its counters to DIR
+# and the scrape sums them; empty DIR on deploy.
+METRICS = {
+    'ENABLED': True,
+    'DIR': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,
+    # /metrics/ answers 'Authorization: Bearer <TOKEN>' or these client addresses only
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+
+# jor_app.similar: MinHash/LSH "similar recipes" index.  BANDS * ROWS hash
+# values per recipe; rerun manage.py rebuild_similar_index after changing
+# BANDS, ROWS or SEED.
+SIMILAR_RECIPES = {
+    'BANDS': 42,
+    'ROWS': 3,
+    'SEED': 1,
+    'CANDIDATES': 200,
+}
+
+
+# jor_app.recommender: rating matrix factorisation trained offline by
+# manage.py train_recommendations (needs numpy); TOP_N per user is stored.
+RECOMMENDATIONS = {
+    'FACTORS': 32,
+    'ITERATIONS': 10,
+    'REG': 0.5,
+    'TOP_N': 50,
+}
+
+
+# jor_app.ranking: Recipe.rank_score, the default recipe order.  A Bayesian
+# average (PRIOR_WEIGHT votes of PRIOR_MEAN) plus a star per DAYS_PER_STAR
+# days of recency; rerun manage.py refresh_ranking after changing these.
+RANKING = {
+    'PRIOR_MEAN': 3.0,
+    'PRIOR_WEIGHT': 5,
+    'DAYS_PER_STAR': 730,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -160,6 +275,14 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# jor_app.images: resized WebP copies of uploads, generated off the request path
+IMAGE_DERIVATIVES = {
+    'WIDTHS': (160, 320, 640, 1280),
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'ASYNC': True,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from jor_app.views import *
+from jor_app import async_views
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -16,15 +17,33 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
 
+    path('api/home/', home),
     path('api/search_recipes/', search_recipes),
     path('api/wishlist/my/', my_wishlist),
     path('api/wishlist/add/', add_wishlist),
     path('api/wishlist/remove/<int:pk>/', remove_wishlist),
+    path('api/wishlist/sync/', sync_wishlist),
     path('api/recipes/<int:recipe_id>/rate/', rate_recipe),
+    path('api/ratings/bulk/', rate_recipes_bulk),
+    path('api/recommendations/me/', my_recommendations),
 
 
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
+
+    # async read path (ASGI); same payloads as the endpoints above
+    path('api/async/recipes/', async_views.recipe_list),
+    path('api/async/recipes/search/', async_views.recipe_search),
+    path('api/async/recipes/by_category/', async_views.recipe_by_category),
+    path('api/async/recipes/<int:pk>/', async_views.recipe_detail),
+    path('api/async/categories/', async_views.category_list),
+    path('api/async/categories/<int:pk>/', async_views.category_detail),
+    path('api/async/ingredients/', async_views.ingredient_list),
+    path('api/async/ingredients/<int:pk>/', async_views.ingredient_detail),
+    path('api/async/search_recipes/', async_views.search_recipes),
+    path('api/async/wishlist/my/', async_views.my_wishlist),
+
+    path('metrics/', metrics_view),
 ]
 
 if settings.DEBUG: